@@ -0,0 +1,60 @@
+from collections.abc import Mapping
+import bisect
+import dataclasses
+from typing import Any
+
+import exceptions
+import input_parser
+
+# `alarm_command_<n>` is the command for the n-th (1-based) threshold in
+# `alarm_thresholds`.
+COMMAND_KEY_PREFIX = 'alarm_command_'
+
+
+@dataclasses.dataclass(frozen=True)
+class Alarms:
+    """Alarm thresholds, in seconds relative to the deadline.
+
+    e.g. -300 fires 5 minutes before the timer runs out and 600 fires 10
+    minutes after it did.
+    """
+
+    # sorted.
+    offsets: tuple[float, ...] = (0,)
+    # aligned with offsets. None falls back to `alarm_command`.
+    commands: tuple[str | None, ...] = (None,)
+
+    def crossed(self, old_overtime: float, new_overtime: float) -> range:
+        """Indexes of the thresholds in (old_overtime, new_overtime]."""
+        return range(
+            bisect.bisect_right(self.offsets, old_overtime),
+            bisect.bisect_right(self.offsets, new_overtime),
+        )
+
+
+def parse_offset(text: str) -> int:
+    input_type, [seconds] = input_parser.parse_input(text)
+    match input_type:
+        case input_parser.InputType.TIME_REDUCTION:
+            return -seconds
+        case input_parser.InputType.TIME_SET | input_parser.InputType.TIME_ADDITION:
+            return seconds
+    raise exceptions.BadTimePattern(f'{text} is not a time pattern')
+
+
+def load_alarms(mapping: Mapping[str, Any]) -> Alarms:
+    raw = mapping.get('alarm_thresholds')
+    if not raw:
+        return Alarms()
+    thresholds = []
+    for position, text in enumerate(raw.split(','), start=1):
+        try:
+            offset = parse_offset(text)
+        except ValueError:
+            raise exceptions.BadTimePattern(f"bad alarm threshold '{text}'")
+        command = mapping.get(f'{COMMAND_KEY_PREFIX}{position}')
+        thresholds.append((offset, command))
+    # a stable sort keeps thresholds sharing an offset in configuration order.
+    thresholds.sort(key=lambda threshold: threshold[0])
+    offsets, commands = zip(*thresholds)
+    return Alarms(offsets=offsets, commands=commands)
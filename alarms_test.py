@@ -0,0 +1,44 @@
+import unittest
+
+import alarms
+import exceptions
+
+
+class AlarmsTest(unittest.TestCase):
+    def test_default_alarm_is_at_the_deadline(self):
+        default = alarms.load_alarms({})
+
+        self.assertEqual((0,), default.offsets)
+        self.assertEqual(range(0, 1), default.crossed(-1, 0))
+        self.assertEqual(range(1, 1), default.crossed(0, 1))
+
+    def test_load_alarms_sorts_thresholds_with_their_commands(self):
+        loaded = alarms.load_alarms(
+            {
+                'alarm_thresholds': '0,-5m,+10m,-1:00,5m',
+                'alarm_command_2': 'warn',
+                'alarm_command_3': 'nag',
+            }
+        )
+
+        self.assertEqual((-300, -60, 0, 300, 600), loaded.offsets)
+        self.assertEqual(('warn', None, None, None, 'nag'), loaded.commands)
+
+    def test_bad_threshold(self):
+        with self.assertRaises(exceptions.BadValue):
+            alarms.load_alarms({'alarm_thresholds': '5m,,10m'})
+        with self.assertRaises(exceptions.BadValue):
+            alarms.load_alarms({'alarm_thresholds': 'soon'})
+
+    def test_crossed(self):
+        loaded = alarms.Alarms(offsets=(-300, -60, 0, 300, 600), commands=(None,) * 5)
+
+        self.assertEqual([0], list(loaded.crossed(-301, -299)))
+        self.assertEqual([], list(loaded.crossed(-300, -61)))
+        self.assertEqual([1, 2, 3], list(loaded.crossed(-61, 300)))
+        # a long gap between ticks fires everything in between, in order.
+        self.assertEqual([0, 1, 2, 3, 4], list(loaded.crossed(-3600, 3600)))
+
+
+if __name__ == '__main__':
+    unittest.main()
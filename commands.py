@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Shell-free launching of `alarm_command` and `read_input_command`.
+
+With `command_mode=exec`, commands are split into arguments once (with
+shell-like quoting) instead of being handed to `/bin/sh` on every launch,
+and placeholders are filled in per argument. Pipes, redirections and
+other shell syntax are then not available.
+
+Running this module compares the launch latency of both modes:
+
+    ./commands.py --repeat 200 -- notify-send 'Timer is up!'
+"""
+import functools
+import os
+import subprocess
+import time
+
+import exceptions
+import failures
+
+
+@functools.lru_cache(maxsize=64)
+def split(command: str) -> tuple[str, ...]:
+    # only `command_mode=exec` splits commands.
+    import shlex
+
+    try:
+        argv = tuple(shlex.split(command))
+    except ValueError as e:
+        error = exceptions.BadValue(f"can't split '{command}': {e}")
+        error.failure_key = failures.hash_key(command)
+        raise error
+    if not argv:
+        raise exceptions.BadValue('empty command')
+    return argv
+
+
+def spawn(argv: list[str]) -> int:
+    """Launches `argv` and forgets about it, like a shell's `&`.
+
+    Its stdin and stdout are /dev/null, so it can neither steal nor corrupt
+    what i3blocks reads.
+    """
+    devnull = [
+        (os.POSIX_SPAWN_OPEN, fd, os.devnull, os.O_RDWR, 0) for fd in (0, 1)
+    ]
+    return os.posix_spawnp(argv[0], argv, os.environ, file_actions=devnull)
+
+
+def launch(command: str | list[str]):
+    """Launches a shell command line, or `argv` without a shell."""
+    if isinstance(command, str):
+        return subprocess.Popen(command, shell=True)
+    return spawn(command)
+
+
+def reap(launched: list) -> list:
+    """Collects the commands `launch` returned that exited since.
+
+    Other children (e.g. `hooks` workers) are left to whoever started them.
+
+    Returns:
+        Those still running.
+    """
+    running = []
+    for process in launched:
+        if isinstance(process, subprocess.Popen):
+            if process.poll() is None:
+                running.append(process)
+            continue
+        try:
+            pid, _ = os.waitpid(process, os.WNOHANG)
+        except ChildProcessError:
+            continue
+        if pid == 0:
+            running.append(process)
+    return running
+
+
+def read_output(command: str | list[str], input: str | None = None) -> str:
+    return subprocess.check_output(
+        command, shell=isinstance(command, str), input=input, encoding='utf-8'
+    )
+
+
+def _time_launches(launch_and_wait, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        launch_and_wait()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+    import shlex
+    import statistics
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('command', nargs='*', default=['true'])
+    args = parser.parse_args(argv)
+
+    line = shlex.join(args.command)
+    modes = {
+        'shell (Popen, /bin/sh -c)': lambda: launch(line).wait(),
+        'exec (posix_spawnp)': lambda: os.waitpid(launch(args.command), 0),
+        'exec (Popen, no shell)': lambda: subprocess.Popen(args.command).wait(),
+    }
+    print(f'{args.repeat} launches of {line!r}, until exit:')
+    for name, launch_and_wait in modes.items():
+        samples = _time_launches(launch_and_wait, args.repeat)
+        print(
+            f'  {name:28} median {statistics.median(samples) * 1000:7.3f}ms '
+            f'mean {statistics.fmean(samples) * 1000:7.3f}ms'
+        )
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
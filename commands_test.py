@@ -0,0 +1,93 @@
+import os
+import unittest
+
+import commands
+import exceptions
+import state
+import state_mutations
+import timer
+
+
+class CommandsTest(unittest.TestCase):
+    def test_split(self):
+        self.assertEqual(
+            ('notify-send', '{timer_name} is up', '--urgency=low'),
+            commands.split("notify-send '{timer_name} is up' --urgency=low"),
+        )
+        # split once.
+        self.assertIs(
+            commands.split('rofi -dmenu -p {timer_name}'),
+            commands.split('rofi -dmenu -p {timer_name}'),
+        )
+
+    def test_bad_split(self):
+        for command in ("notify-send 'unbalanced", ''):
+            with self.subTest(command), self.assertRaises(exceptions.BadValue):
+                commands.split(command)
+
+    def test_placeholders_are_filled_per_argument(self):
+        loaded = state.load_state(
+            {'command_mode': 'exec', 'timer_name': "tea; rm -rf '~'"}, now=0
+        )
+
+        self.assertEqual(
+            ['notify-send', "tea; rm -rf '~' is up"],
+            loaded.build_command("notify-send '{timer_name} is up'"),
+        )
+        self.assertEqual(
+            "notify-send 'tea; rm -rf '~' is up'",
+            state.load_state({'timer_name': "tea; rm -rf '~'"}, now=0).build_command(
+                "notify-send '{timer_name} is up'"
+            ),
+        )
+
+    def test_spawn(self):
+        pid = commands.spawn(['sh', '-c', 'exit 3'])
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(3, os.waitstatus_to_exitcode(status))
+
+    def test_read_output(self):
+        self.assertEqual('a b\n', commands.read_output(['echo', 'a b']))
+        self.assertEqual('menu', commands.read_output(['cat'], input='menu'))
+        self.assertEqual('a\n', commands.read_output('echo a | cat'))
+
+
+class ExecModeTest(unittest.TestCase):
+    def setUp(self):
+        self.call_alarm = state_mutations._ALARM_CALLER
+        self.alarms = []
+        state_mutations._ALARM_CALLER = self.alarms.append
+
+    def tearDown(self):
+        state_mutations._ALARM_CALLER = self.call_alarm
+
+    def test_alarms(self):
+        env = {
+            'command_mode': 'exec',
+            'alarm_command': "notify-send '{timer_name} is up'",
+            'timer_name': 'tea',
+            'start_time': '60',
+            'elapsed_time': '59',
+            'timer_state': 'running',
+            'old_timestamp': '1000',
+        }
+
+        timer.run(env, clock=lambda: 1002)
+
+        self.assertEqual([['notify-send', 'tea is up']], self.alarms)
+
+    def test_missing_read_input_command(self):
+        env = {
+            'command_mode': 'exec',
+            'read_input_command': 'no-such-command-for-sure',
+            'button': '2',
+        }
+
+        output = timer.run(env, clock=lambda: 1000)
+
+        self.assertIn("can't run read_input_command", output['error_message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+"""In-process timer engine, for status bars written in Python.
+
+py3status modules, qtile widgets or asyncio bars can drive any number of
+timers without spawning `timer.py` every second:
+
+    review = engine.Timer.from_config({'timer_name': 'review', 'start_time': 900})
+    review.click(engine.Button.LEFT)
+    ...
+    review.tick()
+    text = review.render()['full_text']
+
+A `Timer` takes the same configuration keys as the blocket and keeps its
+state in memory. Its clock and side effects (alarms, reading input,
+recording run durations, lifecycle hooks) belong to the instance, never
+to module globals, and no method blocks. The exceptions are middle
+clicks, which wait for `read_input_command` like the blocket does; hosts
+should pass the input to `apply_input` instead. The i3blocks transports
+(`metrics_file`, `refresh_signal`, `output_sinks`) are left to the host.
+
+Clicks and inputs first account for the time passed since the last call,
+so hosts may tick at whatever rate they redraw.
+
+Timers are not thread-safe: drive each one from a single thread or event
+loop.
+"""
+from collections.abc import Mapping
+import dataclasses
+import logging
+from typing import Any, Callable
+
+import commands
+import state as state_lib
+import state_mutations
+
+Button = state_lib.Button
+
+
+class Timer:
+    def __init__(
+        self,
+        state: state_lib.State,
+        clock: Callable[[], float] = state_lib.now,
+        call_alarm: Callable[[str | list[str]], Any] | None = None,
+        read_input: Callable[[str | list[str]], str] | None = None,
+        read_menu: Callable[[str | list[str], str], str] | None = None,
+        record_estimate: Callable[[str, str, float], Any] | None = None,
+        emit_hook: Callable[[state_lib.State, str, dict], Any] | None = None,
+    ):
+        """
+        Args:
+            clock: source of timestamps for calls that are given none.
+            call_alarm: launches a built alarm command, without waiting
+                for it (default: as the blocket does, reaped by `tick`).
+            read_input: returns the output of `read_input_command`.
+            read_menu: the same, given the preset menu for its stdin.
+            record_estimate: records a run of a timer name, see
+                `estimates.record`.
+            emit_hook: handles a lifecycle event (default: sends it to
+                `hook_command`, see `hooks`).
+        """
+        self.clock = clock
+        # alarms launched by default, to reap once they exit.
+        self._launched = []
+        callers = state_mutations.Callers(
+            call_alarm=call_alarm or self._launch,
+            read_input=read_input or commands.read_output,
+            read_menu=read_menu
+            or (lambda command, menu: commands.read_output(command, input=menu)),
+            record_estimate=record_estimate or _record_estimate,
+            emit_hook=emit_hook or _emit_hook,
+        )
+        if state.old_timestamp is None:
+            # the clock starts when the timer is created.
+            state = dataclasses.replace(state, old_timestamp=state.new_timestamp)
+        self._state = dataclasses.replace(state, callers=callers)
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Mapping[str, Any],
+        clock: Callable[[], float] = state_lib.now,
+        **callers,
+    ) -> 'Timer':
+        """A timer configured like a blocket, e.g. `{'start_time': 300}`.
+
+        Values may be strings, as in the blocket configuration, or numbers
+        and booleans. Runtime keys (e.g. a previous `render()`) restore a
+        timer where it was.
+
+        Raises:
+            TimerException: on invalid configuration.
+        """
+        return cls(state_lib.load_state(config, clock()), clock, **callers)
+
+    @property
+    def state(self) -> state_lib.State:
+        return self._state
+
+    def tick(self, now: float | None = None):
+        """Accounts for the time passed until `now`, firing due alarms."""
+        self._reap()
+        self._update(state_mutations.handle_increments, now)
+
+    def click(
+        self, button: Button | int, now: float | None = None, x: float | None = None
+    ):
+        """Applies a click, `x` being where it landed (for click zones).
+
+        Args:
+            button: a `Button`, or its i3blocks number.
+            x: a fraction of the rendered width, e.g. from
+                `zones.position(relative_x, width)`.
+        """
+        if not isinstance(button, Button):
+            button = Button(str(button))
+        self._update(
+            lambda state: state_mutations.handle_clicks(
+                dataclasses.replace(_caught_up(state), click_x=x), button
+            ),
+            now,
+        )
+
+    def apply_input(self, text: str, now: float | None = None):
+        """Applies `text` as if typed at the middle click input."""
+        self._update(
+            lambda state: state_mutations.handle_input(_caught_up(state), text), now
+        )
+
+    def render(self) -> dict[str, Any]:
+        """The blocket's JSON output, `full_text` and all, as a dict."""
+        try:
+            self._state, serialized = state_mutations.retry_text_format(self._state)
+        except Exception as e:
+            logging.exception(e)
+            self._state = state_mutations.add_error(self._state, e, self.clock())
+            serialized = self._state.serializable()
+        self._state = dataclasses.replace(
+            self._state, zones=serialized.get('zones', '')
+        )
+        return serialized
+
+    def _update(
+        self,
+        mutation: Callable[[state_lib.State], state_lib.State],
+        now: float | None,
+    ):
+        now = self.clock() if now is None else now
+        state = dataclasses.replace(self._state, new_timestamp=now)
+        try:
+            self._state = mutation(state)
+        except Exception as e:
+            logging.exception(e)
+            self._state = state_mutations.add_error(state, e, now)
+
+    def _launch(self, command: str | list[str]):
+        self._launched.append(commands.launch(command))
+
+    def _reap(self):
+        self._launched = commands.reap(self._launched)
+
+
+def _record_estimate(path: str, name: str, duration: float):
+    # features are only imported when used, like in the blocket.
+    import estimates
+
+    estimates.record(path, name, duration)
+
+
+def _emit_hook(state: state_lib.State, event: str, fields: dict[str, Any]):
+    import hooks
+
+    hooks.emit(state, event, fields)
+
+
+def _caught_up(state: state_lib.State) -> state_lib.State:
+    now = state.new_timestamp
+    state = state_mutations.handle_increments(state)
+    return dataclasses.replace(state, new_timestamp=now)
@@ -0,0 +1,157 @@
+import asyncio
+import unittest
+
+import engine
+import failures
+import state
+import state_mutations
+
+
+class TimerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = [1000.0]
+        self.alarms = []
+        self.timer = engine.Timer.from_config(
+            {
+                'timer_name': 'tea',
+                'start_time': 180,
+                'text_format': '{timer_name} {remaining_time:clock}',
+                'alarm_command': 'notify-send {timer_name}',
+                'running_label': '',
+                'stopped_label': '',
+                'paused_label': '',
+            },
+            clock=lambda: self.now[0],
+            call_alarm=self.alarms.append,
+        )
+
+    def test_tick_click_render(self):
+        self.assertEqual('tea 03:00', self.timer.render()['full_text'])
+
+        self.timer.click(engine.Button.LEFT)
+        for _ in range(3):
+            self.now[0] += 60
+            self.timer.tick()
+
+        self.assertEqual('tea 00:00', self.timer.render()['full_text'])
+        self.assertEqual(['notify-send tea'], self.alarms)
+
+    def test_explicit_timestamps(self):
+        self.timer.click(1, now=0)
+        self.timer.tick(now=0)
+        self.timer.tick(now=30)
+
+        self.assertEqual(30, self.timer.state.elapsed_time)
+
+    def test_apply_input(self):
+        self.timer.apply_input('timer_name=coffee')
+        self.timer.apply_input('+2m')
+
+        self.assertEqual('coffee 05:00', self.timer.render()['full_text'])
+        self.timer.click(engine.Button.BACK)
+        self.assertEqual('coffee 03:00', self.timer.render()['full_text'])
+
+    def test_errors_are_rendered(self):
+        self.timer.apply_input('not an input')
+
+        output = self.timer.render()
+        self.assertIn('error_message', output)
+        self.assertEqual('tea 03:00', self.timer.state.full_text())
+
+    def test_failed_text_format_is_retried(self):
+        cache = failures.Failures().record(
+            failures.hash_key('{timer_name}'), 'oops', now=1000
+        )
+        timer = engine.Timer.from_config(
+            {'text_format': '{timer_name}', 'failures': cache.encode()},
+            clock=lambda: self.now[0],
+        )
+        self.assertEqual('oops(5.0)', timer.render()['full_text'])
+
+        self.now[0] += 5
+        timer.tick()
+
+        output = timer.render()
+        self.assertEqual('timer', output['full_text'])
+        self.assertNotIn('failures', output)
+        self.assertEqual(failures.Failures(), timer.state.failures)
+
+    def test_middle_click_uses_the_instance_reader(self):
+        timer = engine.Timer.from_config(
+            {'read_input_command': 'rofi -dmenu', 'stopped_label': ''},
+            read_input=lambda command: '10m',
+        )
+        swapped = state_mutations._INPUT_READ_CALLER
+        state_mutations._INPUT_READ_CALLER = lambda command: self.fail(command)
+        try:
+            timer.click(engine.Button.MIDDLE)
+        finally:
+            state_mutations._INPUT_READ_CALLER = swapped
+
+        self.assertEqual('10m', timer.render()['full_text'])
+
+    def test_click_zones(self):
+        timer = engine.Timer.from_config(
+            {'text_format': '{#reset}x{/}{elapsed_time:clock}', 'stopped_label': ''}
+        )
+        timer.render()
+
+        timer.click(engine.Button.LEFT, x=0.9)
+        self.assertEqual(state.TimerState.RUNNING, timer.state.timer_state)
+        timer.click(engine.Button.LEFT, x=0.1)
+        self.assertEqual(state.TimerState.STOPPED, timer.state.timer_state)
+
+    def test_restores_from_a_render(self):
+        self.timer.click(engine.Button.LEFT)
+        self.now[0] += 60
+        self.timer.tick()
+
+        restored = engine.Timer.from_config(
+            self.timer.render(), clock=lambda: self.now[0]
+        )
+
+        self.assertEqual('tea 02:00', restored.render()['full_text'])
+        self.assertEqual(state.TimerState.RUNNING, restored.state.timer_state)
+
+    def test_default_alarms_are_reaped(self):
+        timer = engine.Timer.from_config(
+            {'start_time': 1, 'alarm_command': 'true'}, clock=lambda: self.now[0]
+        )
+        timer.click(engine.Button.LEFT)
+        timer.tick()
+        self.now[0] += 2
+        timer.tick()
+        launched = list(timer._launched)
+        self.assertEqual(1, len(launched))
+
+        launched[0].wait()
+        timer.tick()
+        self.assertEqual([], timer._launched)
+
+    def test_many_timers_on_an_event_loop(self):
+        timers = [
+            engine.Timer.from_config(
+                {'timer_name': f't{i}', 'start_time': i, 'text_format': '{timer_name}'},
+                clock=lambda: self.now[0],
+            )
+            for i in range(50)
+        ]
+
+        async def _bar():
+            for timer in timers:
+                timer.click(engine.Button.LEFT)
+            for _ in range(3):
+                self.now[0] += 1
+                for timer in timers:
+                    timer.tick()
+                await asyncio.sleep(0)
+            return [timer.render()['full_text'] for timer in timers]
+
+        texts = asyncio.run(_bar())
+
+        self.assertEqual([f't{i}' for i in range(50)], texts)
+        self.assertTrue(all(timer.state.elapsed_time == 3 for timer in timers))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,190 @@
+"""How long runs of each `timer_name` usually take.
+
+The duration of every run (the elapsed time when it is reset, or when a
+new time is set, once that can no longer be undone) feeds a P² estimator
+(Jain & Chlamtac, 1985) of its median and 90th percentile: five markers
+per quantile, updated in constant time and memory however many runs
+there were. Estimators of all
+names are kept in `estimates_file`, which is only rewritten when a run
+ends. Renders look the current name up in a copy of the file that is
+parsed again only when the file changes.
+"""
+import dataclasses
+import functools
+import json
+import math
+import os
+
+import exceptions
+import files
+
+TYPICAL = 0.5
+P90 = 0.9
+
+
+@dataclasses.dataclass(frozen=True)
+class Estimator:
+    """A P² estimator of the `p`-quantile of the observations.
+
+    The first five observations are kept as is (sorted) in `heights`, and
+    then become the markers.
+    """
+
+    p: float
+    count: int = 0
+    # marker heights, i.e. estimates of the min, p/2, p, (1+p)/2 and max.
+    heights: tuple[float, ...] = ()
+    # marker positions (1-based ranks), once there are five observations.
+    positions: tuple[int, ...] = (1, 2, 3, 4, 5)
+
+    def value(self) -> float | None:
+        if self.count == 0:
+            return None
+        if self.count > 5:
+            return self.heights[2]
+        # few enough to interpolate between the observations themselves.
+        rank = self.p * (self.count - 1)
+        low = math.floor(rank)
+        high = min(low + 1, self.count - 1)
+        return self.heights[low] + (rank - low) * (
+            self.heights[high] - self.heights[low]
+        )
+
+    def _desired(self, count: int) -> list[float]:
+        p = self.p
+        return [
+            1,
+            1 + (count - 1) * p / 2,
+            1 + (count - 1) * p,
+            1 + (count - 1) * (1 + p) / 2,
+            count,
+        ]
+
+    def observe(self, x: float) -> 'Estimator':
+        if self.count < 5:
+            return dataclasses.replace(
+                self, count=self.count + 1, heights=tuple(sorted((*self.heights, x)))
+            )
+        q = list(self.heights)
+        n = list(self.positions)
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = max(i for i in range(4) if q[i] <= x)
+        for i in range(k + 1, 5):
+            n[i] += 1
+        count = self.count + 1
+        desired = self._desired(count)
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                s = 1 if d > 0 else -1
+                height = _parabolic(q, n, i, s)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + s * (q[i + s] - q[i]) / (n[i + s] - n[i])
+                q[i] = height
+                n[i] += s
+        return dataclasses.replace(
+            self, count=count, heights=tuple(q), positions=tuple(n)
+        )
+
+    def encode(self) -> list:
+        # a tenth of a second is plenty for run durations.
+        heights = [round(height, 1) for height in self.heights]
+        if self.count <= 5:
+            return [self.count, *heights]
+        return [self.count, *heights, *self.positions]
+
+
+def _parabolic(q: list[float], n: list[int], i: int, s: int) -> float:
+    return q[i] + s / (n[i + 1] - n[i - 1]) * (
+        (n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+        + (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+    )
+
+
+def _decode_estimator(p: float, encoded: list) -> Estimator:
+    count, *rest = encoded
+    if count <= 5:
+        if len(rest) != count:
+            raise ValueError(encoded)
+        return Estimator(p, count, tuple(float(h) for h in rest))
+    if len(rest) != 10:
+        raise ValueError(encoded)
+    return Estimator(
+        p, count, tuple(float(h) for h in rest[:5]), tuple(int(n) for n in rest[5:])
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class Sketch:
+    typical: Estimator = Estimator(TYPICAL)
+    p90: Estimator = Estimator(P90)
+
+    def observe(self, duration: float) -> 'Sketch':
+        return Sketch(self.typical.observe(duration), self.p90.observe(duration))
+
+    def encode(self) -> list:
+        return [self.typical.encode(), self.p90.encode()]
+
+
+def decode_sketch(encoded: list) -> Sketch:
+    typical, p90 = encoded
+    return Sketch(_decode_estimator(TYPICAL, typical), _decode_estimator(P90, p90))
+
+
+def read_store(path: str) -> dict[str, list]:
+    """The encoded sketches in `path`, by timer name."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except FileNotFoundError:
+        return {}
+    try:
+        store = json.loads(text) if text else {}
+        if not isinstance(store, dict):
+            raise ValueError(path)
+    except ValueError:
+        raise exceptions.BadValue(f"estimates_file='{path}' is not an estimates file")
+    return store
+
+
+def record(path: str, name: str, duration: float):
+    """Adds a run of `name` that took `duration` seconds to `path`."""
+    # blockets of other names may be recording to the same file.
+    with files.locked(path):
+        store = read_store(path)
+        try:
+            sketch = decode_sketch(store[name]) if name in store else Sketch()
+        except (ValueError, TypeError):
+            # a damaged entry starts over rather than blocking every run.
+            sketch = Sketch()
+        store[name] = sketch.observe(duration).encode()
+        files.write_atomically(path, json.dumps(store, separators=(',', ':')))
+
+
+def lookup(path: str, name: str) -> tuple[float | None, float | None]:
+    """The typical (median) and 90th percentile durations of `name`."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None, None
+    return _lookup(path, stat.st_mtime_ns, stat.st_size, name)
+
+
+@functools.lru_cache(maxsize=8)
+def _lookup(
+    path: str, mtime_ns: int, size: int, name: str
+) -> tuple[float | None, float | None]:
+    encoded = read_store(path).get(name)
+    if encoded is None:
+        return None, None
+    try:
+        sketch = decode_sketch(encoded)
+    except (ValueError, TypeError):
+        return None, None
+    return sketch.typical.value(), sketch.p90.value()
@@ -0,0 +1,158 @@
+import fcntl
+import json
+import os
+import random
+import statistics
+import unittest
+from unittest import mock
+
+import estimates
+import exceptions
+import testing
+import timer
+
+
+class EstimatorTest(unittest.TestCase):
+    def test_few_observations(self):
+        estimator = estimates.Estimator(0.5)
+        self.assertIsNone(estimator.value())
+        for duration in (300, 100, 200):
+            estimator = estimator.observe(duration)
+
+        self.assertEqual((100, 200, 300), estimator.heights)
+        self.assertEqual(200, estimator.value())
+        two = estimates.Estimator(0.5).observe(100).observe(200)
+        self.assertEqual(150, two.value())
+
+    def test_converges(self):
+        rng = random.Random(0)
+        # run durations are skewed: mostly ~25m, some much longer.
+        durations = [rng.lognormvariate(7.3, 0.4) for _ in range(2000)]
+        sketch = estimates.Sketch()
+        for duration in durations:
+            sketch = sketch.observe(duration)
+
+        median = statistics.median(durations)
+        p90 = statistics.quantiles(durations, n=10)[-1]
+        self.assertAlmostEqual(1, sketch.typical.value() / median, delta=0.03)
+        self.assertAlmostEqual(1, sketch.p90.value() / p90, delta=0.03)
+        self.assertEqual(2000, sketch.typical.count)
+
+    def test_encode_decode(self):
+        sketch = estimates.Sketch()
+        for duration in range(10):
+            self.assertEqual(
+                sketch.encode(),
+                estimates.decode_sketch(sketch.encode()).encode(),
+            )
+            sketch = sketch.observe(duration * 60.04)
+
+        decoded = estimates.decode_sketch(json.loads(json.dumps(sketch.encode())))
+        self.assertEqual(sketch.typical.positions, decoded.typical.positions)
+        self.assertAlmostEqual(sketch.p90.value(), decoded.p90.value(), delta=0.05)
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(testing.temp_dir(self), 'estimates.json')
+
+    def test_record_and_lookup(self):
+        self.assertEqual((None, None), estimates.lookup(self.path, 'review'))
+        for duration in (1200, 1800, 1500):
+            estimates.record(self.path, 'review', duration)
+        estimates.record(self.path, 'tea', 240)
+
+        self.assertEqual(1500, estimates.lookup(self.path, 'review')[0])
+        self.assertEqual((240, 240), estimates.lookup(self.path, 'tea'))
+        self.assertEqual((None, None), estimates.lookup(self.path, 'other'))
+
+    def test_lookup_reads_the_file_once(self):
+        estimates.record(self.path, 'review', 1200)
+        estimates.lookup(self.path, 'review')
+
+        with mock.patch.object(estimates, 'read_store') as read_store:
+            for _ in range(3):
+                self.assertEqual((1200, 1200), estimates.lookup(self.path, 'review'))
+        read_store.assert_not_called()
+
+    def test_record_holds_the_lock(self):
+        write = estimates.files.write_atomically
+
+        def checked_write(*args):
+            with open(f'{self.path}.lock') as lock:
+                with self.assertRaises(BlockingIOError):
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            write(*args)
+
+        with mock.patch.object(estimates.files, 'write_atomically', checked_write):
+            estimates.record(self.path, 'review', 1200)
+        self.assertEqual((1200, 1200), estimates.lookup(self.path, 'review'))
+
+    def test_bad_file(self):
+        with open(self.path, 'w') as f:
+            f.write('[1, 2]')
+
+        with self.assertRaises(exceptions.BadValue):
+            estimates.record(self.path, 'review', 1200)
+
+    def test_damaged_entry_starts_over(self):
+        with open(self.path, 'w') as f:
+            f.write('{"review": [[3, 1]], "tea": [[1, 240.0], [1, 240.0]]}')
+
+        estimates.record(self.path, 'review', 1200)
+
+        self.assertEqual((1200, 1200), estimates.lookup(self.path, 'review'))
+        self.assertEqual((240, 240), estimates.lookup(self.path, 'tea'))
+
+
+class TimerTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(testing.temp_dir(self), 'estimates.json')
+        self.env = {
+            'timer_name': 'review',
+            'estimates_file': self.path,
+            'text_format': '{elapsed_time:clock} ~{typical:pretty} {vs_typical:pretty}',
+            'timer_state': 'running',
+            'old_timestamp': '1000',
+            # runs are recorded right away when they can't be undone.
+            'undo_depth': '0',
+        }
+
+    def test_runs_feed_the_estimates(self):
+        for elapsed_time in ('1200', '1800', '1500'):
+            timer.run(
+                {**self.env, 'elapsed_time': elapsed_time, 'button': '3'},
+                clock=lambda: 1000,
+            )
+        # stopped timers end no run.
+        timer.run({**self.env, 'timer_state': 'stopped', 'button': '3'})
+
+        output = timer.run({**self.env, 'elapsed_time': '1560'}, clock=lambda: 1000)
+
+        self.assertEqual('26:00 ~25m 1m', output['full_text'])
+
+    def test_unknown_name(self):
+        output = timer.run({**self.env, 'elapsed_time': '60'}, clock=lambda: 1000)
+
+        self.assertEqual('01:00 ~0s 0s', output['full_text'])
+
+    def test_looked_up_only_when_referenced(self):
+        env = {**self.env, 'text_format': '{elapsed_time:clock}', 'elapsed_time': '60'}
+
+        with mock.patch.object(estimates, 'lookup') as lookup:
+            output = timer.run(env, clock=lambda: 1000)
+
+        self.assertEqual('01:00', output['full_text'])
+        lookup.assert_not_called()
+
+    def test_unwritable_file(self):
+        env = {**self.env, 'estimates_file': '/nonexistent/estimates.json'}
+
+        output = timer.run({**env, 'elapsed_time': '60', 'button': '3'})
+
+        self.assertEqual('stopped', output['timer_state'])
+        self.assertIn('No such file', output['error_message'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,9 @@ class TimerException(Exception):
     be displayed in the i3blocket.
     """
 
+    # set when raised by a configured template or command, see `failures`.
+    failure_key: str | None = None
+
     def __init__(self, message: str, *args: object) -> None:
         super().__init__(*[message, args])
         self.message = message
@@ -35,3 +38,9 @@ class BadFloat(BadValue): ...
 
 
 class BadEnum(BadValue): ...
+
+
+class BadBoolean(BadValue): ...
+
+
+class CommandFailed(TimerException): ...
@@ -0,0 +1,99 @@
+"""Negative cache of failing templates and commands.
+
+A `text_format` with a bad placeholder or a `read_input_command` that
+exits non-zero would otherwise be retried (and fail again) every time it
+is used. Failures are keyed by a hash of the template or command as
+configured and are not retried before an exponentially growing backoff
+expires; meanwhile their error is rendered from the cache.
+
+Keys being hashes of the configuration, entries of templates or commands
+that are no longer configured are pruned when the configuration changes.
+"""
+import dataclasses
+import json
+from typing import Iterable
+
+import exceptions
+
+# the first backoff matches how long an error is displayed.
+BASE_BACKOFF = 5.0
+MAX_BACKOFF = 300.0
+
+
+def hash_key(text: str) -> str:
+    import hashlib
+
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def backoff(count: int) -> float:
+    """Seconds before retrying something that failed `count` times in a row."""
+    return min(BASE_BACKOFF * 2 ** (count - 1), MAX_BACKOFF)
+
+
+@dataclasses.dataclass(frozen=True)
+class Failure:
+    message: str
+    # consecutive failures.
+    count: int
+    retry_at: float
+
+
+@dataclasses.dataclass(frozen=True)
+class Failures:
+    entries: dict[str, Failure] = dataclasses.field(default_factory=dict)
+
+    def active(self, key: str, now: float | None) -> Failure | None:
+        """The failure of `key`, unless it is due for a retry."""
+        failure = self.entries.get(key)
+        if failure is None or now is None or now >= failure.retry_at:
+            return None
+        return failure
+
+    def record(self, key: str, message: str, now: float) -> 'Failures':
+        if self.active(key, now):
+            # rendered from the cache, not a new failure.
+            return self
+        previous = self.entries.get(key)
+        count = previous.count + 1 if previous else 1
+        failure = Failure(message, count, now + backoff(count))
+        return Failures({**self.entries, key: failure})
+
+    def clear(self, key: str) -> 'Failures':
+        if key not in self.entries:
+            return self
+        return Failures({k: v for k, v in self.entries.items() if k != key})
+
+    def prune(self, texts: Iterable[str | None]) -> 'Failures':
+        """Keeps only the entries of `texts`, i.e. the current configuration."""
+        if not self.entries:
+            return self
+        keys = {hash_key(text) for text in texts if text}
+        if keys >= self.entries.keys():
+            return self
+        return Failures({k: v for k, v in self.entries.items() if k in keys})
+
+    def encode(self) -> str:
+        if not self.entries:
+            return ''
+        return json.dumps(
+            {
+                key: [failure.message, failure.count, failure.retry_at]
+                for key, failure in self.entries.items()
+            },
+            separators=(',', ':'),
+        )
+
+
+def decode(text: str | None) -> Failures:
+    if not text:
+        return Failures()
+    try:
+        return Failures(
+            {
+                key: Failure(message, int(count), float(retry_at))
+                for key, (message, count, retry_at) in json.loads(text).items()
+            }
+        )
+    except (ValueError, TypeError, AttributeError):
+        raise exceptions.BadValue(f"failures='{text}' is not a failure record")
@@ -0,0 +1,190 @@
+import subprocess
+import unittest
+from unittest import mock
+
+import exceptions
+import failures
+import state
+import state_mutations
+import timer
+
+ENV = {
+    'text_format': '{nope}',
+    'old_timestamp': '1000',
+}
+
+
+class FailuresTest(unittest.TestCase):
+    def test_backoff_doubles_up_to_a_cap(self):
+        self.assertEqual(
+            [5, 10, 20, 40, 80, 160, 300, 300],
+            [failures.backoff(count) for count in range(1, 9)],
+        )
+
+    def test_record(self):
+        key = failures.hash_key('{nope}')
+        cache = failures.Failures().record(key, 'Bad key', now=100)
+
+        self.assertEqual(failures.Failure('Bad key', 1, 105), cache.active(key, 104))
+        self.assertIsNone(cache.active(key, 105))
+        # still active: the same failure, rendered from the cache.
+        self.assertIs(cache, cache.record(key, 'Bad key', now=104))
+        # a retry that failed again.
+        self.assertEqual(
+            failures.Failure('Bad key', 2, 115),
+            cache.record(key, 'Bad key', now=105).active(key, 105),
+        )
+        self.assertEqual(failures.Failures(), cache.clear(key))
+
+    def test_encode_decode(self):
+        cache = failures.Failures().record('abc', 'Bad "key", really', now=100)
+
+        self.assertEqual(cache, failures.decode(cache.encode()))
+        self.assertEqual('', failures.Failures().encode())
+        self.assertEqual(failures.Failures(), failures.decode(None))
+        with self.assertRaises(exceptions.BadValue):
+            failures.decode('[1, 2]')
+
+    def test_prune(self):
+        cache = (
+            failures.Failures()
+            .record(failures.hash_key('{nope}'), 'Bad key', now=100)
+            .record(failures.hash_key('notify'), 'oops', now=100)
+        )
+
+        self.assertIs(cache, cache.prune(['{nope}', 'notify', None]))
+        self.assertEqual(
+            [failures.hash_key('notify')], list(cache.prune(['notify']).entries)
+        )
+
+    def test_bad_template_is_rendered_from_the_cache(self):
+        output = timer.run(ENV, clock=lambda: 1001)
+        self.assertEqual('Bad key \'nope\'(5.0)', output['full_text'])
+
+        # the error display ran out, but the template is not retried yet.
+        output = timer.run({**ENV, **output, 'error_duration': '0'}, lambda: 1002)
+        self.assertNotIn('error_duration', output)
+        self.assertEqual('Bad key \'nope\'(4.0)', output['full_text'])
+
+        # retried and failed again, backing off for longer.
+        output = timer.run({**ENV, **output}, clock=lambda: 1006)
+        cache = failures.decode(output['failures'])
+        self.assertEqual(
+            failures.Failure("Bad key 'nope'", 2, 1016),
+            cache.entries[failures.hash_key('{nope}')],
+        )
+
+    def test_backoff_survives_other_errors_displayed(self):
+        output = timer.run(ENV, clock=lambda: 1001)
+
+        # due for a retry, but the text is not rendered meanwhile.
+        output = timer.run({**ENV, **output, 'error_duration': '30'}, lambda: 1007)
+        self.assertEqual(
+            failures.Failure("Bad key 'nope'", 1, 1006),
+            failures.decode(output['failures']).entries[failures.hash_key('{nope}')],
+        )
+
+        output = timer.run({**ENV, **output, 'error_duration': '0'}, lambda: 1008)
+        self.assertEqual(
+            failures.Failure("Bad key 'nope'", 2, 1018),
+            failures.decode(output['failures']).entries[failures.hash_key('{nope}')],
+        )
+
+    def test_successful_retry_clears_the_failure(self):
+        cache = failures.Failures().record(
+            failures.hash_key('{timer_name}'), 'oops', now=1000
+        )
+        env = {**ENV, 'text_format': '{timer_name}', 'failures': cache.encode()}
+
+        output = timer.run(env, clock=lambda: 1001)
+        self.assertEqual('oops(4.0)', output['full_text'])
+        self.assertIn('failures', output)
+
+        output = timer.run({**env, **output}, clock=lambda: 1005)
+        self.assertEqual('timer', output['full_text'])
+        self.assertNotIn('failures', output)
+
+    def test_retry_renders_once(self):
+        cache = failures.Failures().record(
+            failures.hash_key('{timer_name}'), 'oops', now=1000
+        )
+        env = {**ENV, 'text_format': '{timer_name}', 'failures': cache.encode()}
+        render = state.State.full_text_and_zones
+
+        with mock.patch.object(
+            state.State, 'full_text_and_zones', autospec=True, side_effect=render
+        ) as rendered:
+            output = timer.run(env, clock=lambda: 1005)
+
+        self.assertEqual('timer', output['full_text'])
+        self.assertEqual(1, rendered.call_count)
+
+    def test_config_change_clears_the_cache(self):
+        output = timer.run(ENV, clock=lambda: 1001)
+
+        output = timer.run(
+            {**output, 'text_format': '{timer_name}', 'error_duration': '0'},
+            clock=lambda: 1002,
+        )
+
+        self.assertEqual('timer', output['full_text'])
+        self.assertNotIn('failures', output)
+
+    def test_reload_clears_the_cache(self):
+        output = timer.run(ENV, clock=lambda: 1001)
+        loaded = state.load_state({**ENV, **output, 'error_duration': '0'}, 1010)
+        loaded = state.reload_config(loaded, {'text_format': '{timer_name}'})
+
+        self.assertEqual(failures.Failures(), loaded.failures)
+
+
+class FailingCommandsTest(unittest.TestCase):
+    def setUp(self):
+        self.read_input = state_mutations._INPUT_READ_CALLER
+        self.call_alarm = state_mutations._ALARM_CALLER
+        self.calls = []
+
+        def _fail(cmd):
+            self.calls.append(cmd)
+            raise subprocess.CalledProcessError(1, cmd)
+
+        state_mutations._INPUT_READ_CALLER = _fail
+        state_mutations._ALARM_CALLER = self.calls.append
+
+    def tearDown(self):
+        state_mutations._INPUT_READ_CALLER = self.read_input
+        state_mutations._ALARM_CALLER = self.call_alarm
+
+    def test_failing_read_input_command_backs_off(self):
+        env = {'read_input_command': 'false', 'old_timestamp': '1000'}
+
+        output = timer.run({**env, 'button': '2'}, clock=lambda: 1001)
+        self.assertEqual('read_input_command exited with 1', output['error_message'])
+        output = timer.run({**env, **output, 'button': '2'}, clock=lambda: 1002)
+        self.assertEqual('read_input_command exited with 1', output['error_message'])
+        self.assertEqual(['false'], self.calls)
+
+        timer.run({**env, **output, 'button': '2'}, clock=lambda: 1006)
+        self.assertEqual(['false', 'false'], self.calls)
+
+    def test_bad_alarm_template_does_not_abort_the_tick(self):
+        env = {
+            'start_time': '60',
+            'elapsed_time': '59',
+            'timer_state': 'running',
+            'old_timestamp': '1000',
+            'alarm_thresholds': '0,1s',
+            'alarm_command_1': 'notify {nope}',
+            'alarm_command_2': 'notify {timer_name}',
+        }
+
+        output = timer.run(env, clock=lambda: 1002)
+
+        self.assertEqual('61.0', output['elapsed_time'])
+        self.assertEqual(['notify timer'], self.calls)
+        self.assertEqual("Bad key 'nope'", output['error_message'])
+        self.assertIn(failures.hash_key('notify {nope}'), output['failures'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Files that several blockets (or readers) share.
+
+Writers replace files whole, so readers never see a partial one, and
+serialize through a lock file next to them, as a lock held on the file
+itself would be lost when it is replaced.
+"""
+from collections.abc import Iterator
+import contextlib
+import fcntl
+import logging
+import os
+
+
+def write_atomically(path: str, text: str):
+    import tempfile
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(
+        'w', dir=directory, prefix='.', suffix='.tmp', delete=False
+    ) as f:
+        f.write(text)
+    os.chmod(f.name, 0o644)
+    os.replace(f.name, path)
+
+
+@contextlib.contextmanager
+def locked(path: str) -> Iterator[None]:
+    """Holds the lock of `path` for the duration of the block."""
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+@contextlib.contextmanager
+def best_effort() -> Iterator[None]:
+    """Logs the OSError the block raises, if any, instead of raising it.
+
+    For outputs beside the blocket's own (traces, metrics, profiles,
+    displays, hooks): a full disk or a dead reader must never break the
+    blocket.
+    """
+    try:
+        yield
+    except OSError as e:
+        logging.error(e)
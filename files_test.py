@@ -0,0 +1,43 @@
+import fcntl
+import os
+import unittest
+
+import files
+import testing
+
+
+class FilesTest(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(testing.temp_dir(self), 'state.json')
+
+    def test_write_atomically_replaces_the_file(self):
+        files.write_atomically(self.path, 'old')
+        inode = os.stat(self.path).st_ino
+
+        files.write_atomically(self.path, 'new')
+
+        with open(self.path) as f:
+            self.assertEqual('new', f.read())
+        self.assertNotEqual(inode, os.stat(self.path).st_ino)
+        self.assertEqual(['state.json'], os.listdir(os.path.dirname(self.path)))
+
+    def test_locked(self):
+        with files.locked(self.path):
+            with open(f'{self.path}.lock') as lock:
+                with self.assertRaises(BlockingIOError):
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with open(f'{self.path}.lock') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def test_best_effort(self):
+        with self.assertLogs(level='ERROR'):
+            with files.best_effort():
+                open(os.path.join(self.path, 'missing'))
+        with self.assertRaises(ValueError):
+            with files.best_effort():
+                raise ValueError('not an I/O error')
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,171 @@
+import dataclasses
+import enum
+import json
+from typing import Any
+
+# Fields restored by undo/redo. Timestamps and counters derived from the
+# passage of time are left alone.
+UNDOABLE_FIELDS = (
+    'timer_name',
+    'text_format',
+    'start_time',
+    'color_option',
+    'alarm_command',
+    'read_input_command',
+    'running_label',
+    'stopped_label',
+    'paused_label',
+    'elapsed_time',
+    'timer_state',
+    'laps',
+)
+
+# Not a field: marks a change that ended a run, as [SESSION, timer name,
+# duration]. Runs can't be taken back from `estimates`, so they are only
+# recorded there once their change drops out of the history.
+SESSION = 'session'
+
+# [[field, old value, new value], ...]
+Delta = list[list[Any]]
+
+# (timer name, duration)
+Run = tuple[str, float]
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, enum.Enum):
+        return value.value
+    if dataclasses.is_dataclass(value):
+        return dataclasses.asdict(value)
+    return value
+
+
+def _decode(state: Any, field: str, value: Any) -> Any:
+    current = getattr(state, field)
+    if isinstance(current, enum.Enum):
+        return type(current)(value)
+    if dataclasses.is_dataclass(current):
+        return dataclasses.replace(current, **value)
+    return value
+
+
+def _runs(entry: str) -> list[Run]:
+    if SESSION not in entry:
+        return []
+    return [
+        (name, duration)
+        for field, name, duration in json.loads(entry)
+        if field == SESSION
+    ]
+
+
+def diff(before: Any, after: Any) -> Delta:
+    return [
+        [field, _encode(getattr(before, field)), _encode(getattr(after, field))]
+        for field in UNDOABLE_FIELDS
+        if getattr(before, field) != getattr(after, field)
+    ]
+
+
+# entries of a stack, and the undo and redo stacks.
+_ENTRY_SEPARATOR = '|'
+_STACK_SEPARATOR = '||'
+
+
+def _dump(delta: Delta) -> str:
+    # '|' can only be in strings, where its escape means the same.
+    return json.dumps(delta, separators=(',', ':')).replace('|', '\\u007c')
+
+
+def _push(stack: str, entry: str) -> str:
+    return f'{stack}{_ENTRY_SEPARATOR}{entry}' if stack else entry
+
+
+def _pop(stack: str) -> tuple[str, str]:
+    rest, _, entry = stack.rpartition(_ENTRY_SEPARATOR)
+    return rest, entry
+
+
+@dataclasses.dataclass(frozen=True)
+class History:
+    """Bounded undo/redo stacks of field-level deltas between states.
+
+    Kept encoded, as it round-trips through i3blocks as a single string:
+    every delta is JSON on its own, so recording, undoing or redoing a
+    click only encodes or decodes the delta it moves.
+    """
+
+    depth: int
+    encoded: str = ''
+
+    def _stacks(self) -> tuple[str, str]:
+        undo, _, redo = self.encoded.partition(_STACK_SEPARATOR)
+        return undo, redo
+
+    def _with_stacks(self, undo: str, redo: str) -> 'History':
+        encoded = f'{undo}{_STACK_SEPARATOR}{redo}' if redo else undo
+        return dataclasses.replace(self, encoded=encoded)
+
+    def record(self, before: Any, after: Any, run: Run | None = None) -> 'History':
+        """Records the change from `before` to `after`, clearing redo.
+
+        Args:
+            run: the run the change ended, if any.
+        """
+        delta = diff(before, after)
+        if run is not None:
+            delta.append([SESSION, *run])
+        if not delta or self.depth <= 0:
+            return self
+        undo, _ = self._stacks()
+        undo = _push(undo, _dump(delta))
+        excess = undo.count(_ENTRY_SEPARATOR) + 1 - self.depth
+        if excess > 0:
+            undo = undo.split(_ENTRY_SEPARATOR, excess)[-1]
+        return self._with_stacks(undo, '')
+
+    def settled(self) -> list[Run]:
+        """The runs ended by the changes the next `record` drops."""
+        undo, _ = self._stacks()
+        excess = undo.count(_ENTRY_SEPARATOR) + 2 - self.depth if undo else 0
+        if excess <= 0:
+            return []
+        dropped = undo.split(_ENTRY_SEPARATOR, excess)[:excess]
+        return [run for entry in dropped for run in _runs(entry)]
+
+    def moved_run(self, undone: bool) -> Run | None:
+        """The run ended by the change just undone (or redone), if any."""
+        undo, redo = self._stacks()
+        _, entry = _pop(redo if undone else undo)
+        runs = _runs(entry)
+        return runs[0] if runs else None
+
+    def undo(self, state: Any) -> Any:
+        """Reverts the last recorded change of `state`, if any."""
+        undo, redo = self._stacks()
+        if not undo:
+            return state
+        undo, entry = _pop(undo)
+        changes = {
+            field: _decode(state, field, old)
+            for field, old, _ in json.loads(entry)
+            if field != SESSION
+        }
+        return dataclasses.replace(
+            state, **changes, history=self._with_stacks(undo, _push(redo, entry))
+        )
+
+    def redo(self, state: Any) -> Any:
+        """Re-applies the last undone change of `state`, if any."""
+        undo, redo = self._stacks()
+        if not redo:
+            return state
+        redo, entry = _pop(redo)
+        changes = {
+            field: _decode(state, field, new)
+            for field, _, new in json.loads(entry)
+            if field != SESSION
+        }
+        return dataclasses.replace(
+            state, **changes, history=self._with_stacks(_push(undo, entry), redo)
+        )
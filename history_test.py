@@ -0,0 +1,149 @@
+import dataclasses
+import enum
+import unittest
+from unittest import mock
+
+import history as history_lib
+import laps as laps_lib
+
+
+class Color(enum.Enum):
+    RED = 'red'
+    BLUE = 'blue'
+
+
+@dataclasses.dataclass(frozen=True)
+class FakeState:
+    start_time: int
+    timer_state: Color
+    timer_name: str = 'timer'
+    text_format: str = ''
+    color_option: str = ''
+    alarm_command: str | None = None
+    read_input_command: str | None = None
+    running_label: str = ''
+    stopped_label: str = ''
+    paused_label: str = ''
+    elapsed_time: float = 0.0
+    laps: laps_lib.Laps = laps_lib.Laps(capacity=2)
+    history: history_lib.History = history_lib.History(depth=2)
+
+
+class HistoryTest(unittest.TestCase):
+    def test_diff_only_has_changed_fields(self):
+        before = FakeState(start_time=60, timer_state=Color.RED)
+        after = dataclasses.replace(before, timer_state=Color.BLUE)
+
+        self.assertEqual(
+            [['timer_state', 'red', 'blue']], history_lib.diff(before, after)
+        )
+
+    def test_undo_redo(self):
+        first = FakeState(start_time=60, timer_state=Color.RED)
+        second = dataclasses.replace(first, start_time=120, timer_state=Color.BLUE)
+        second = dataclasses.replace(
+            second, history=first.history.record(first, second)
+        )
+
+        undone = second.history.undo(second)
+        self.assertEqual(60, undone.start_time)
+        self.assertEqual(Color.RED, undone.timer_state)
+
+        redone = undone.history.redo(undone)
+        self.assertEqual(120, redone.start_time)
+        self.assertEqual(Color.BLUE, redone.timer_state)
+
+    def test_recording_clears_redo(self):
+        first = FakeState(start_time=60, timer_state=Color.RED)
+        second = dataclasses.replace(first, start_time=120)
+        second = dataclasses.replace(
+            second, history=first.history.record(first, second)
+        )
+        undone = second.history.undo(second)
+
+        third = dataclasses.replace(undone, timer_name='other')
+        third = dataclasses.replace(
+            third, history=undone.history.record(undone, third)
+        )
+
+        self.assertIs(third, third.history.redo(third))
+
+    def test_depth_bounds_the_history(self):
+        states = [FakeState(start_time=0, timer_state=Color.RED)]
+        for start_time in range(1, 6):
+            previous = states[-1]
+            current = dataclasses.replace(previous, start_time=start_time)
+            states.append(
+                dataclasses.replace(
+                    current, history=previous.history.record(previous, current)
+                )
+            )
+
+        later = states[-1]
+        for _ in range(5):
+            later = later.history.undo(later)
+
+        self.assertEqual(3, later.start_time)
+
+    def test_runs_settle_as_they_drop_out(self):
+        first = FakeState(start_time=60, timer_state=Color.RED, elapsed_time=30)
+        reset = dataclasses.replace(
+            first,
+            elapsed_time=0,
+            history=first.history.record(
+                first, dataclasses.replace(first, elapsed_time=0), ('tea', 30)
+            ),
+        )
+
+        undone = reset.history.undo(reset)
+        self.assertEqual(30, undone.elapsed_time)
+        self.assertEqual(('tea', 30), undone.history.moved_run(undone=True))
+        redone = undone.history.redo(undone)
+        self.assertEqual(('tea', 30), redone.history.moved_run(undone=False))
+
+        self.assertEqual([], redone.history.settled())
+        current = dataclasses.replace(redone, start_time=1)
+        later = dataclasses.replace(
+            current, history=redone.history.record(redone, current)
+        )
+        # the next change drops the reset out of the history.
+        self.assertEqual([('tea', 30)], later.history.settled())
+
+    def test_no_changes_are_not_recorded(self):
+        same = FakeState(start_time=0, timer_state=Color.RED)
+
+        self.assertIs(same.history, same.history.record(same, same))
+
+    def test_pipes_in_values(self):
+        first = FakeState(start_time=60, timer_state=Color.RED, timer_name='a|b||c')
+        second = dataclasses.replace(first, timer_name='d|')
+        second = dataclasses.replace(
+            second, history=first.history.record(first, second)
+        )
+
+        undone = second.history.undo(second)
+        self.assertEqual('a|b||c', undone.timer_name)
+        self.assertEqual('d|', undone.history.redo(undone).timer_name)
+
+    def test_only_the_moved_delta_is_decoded(self):
+        history = history_lib.History(depth=100)
+        previous = FakeState(start_time=0, timer_state=Color.RED, history=history)
+        for start_time in range(1, 51):
+            current = dataclasses.replace(previous, start_time=start_time)
+            previous = dataclasses.replace(
+                current, history=previous.history.record(previous, current)
+            )
+
+        with mock.patch.object(
+            history_lib.json, 'loads', wraps=history_lib.json.loads
+        ) as loads:
+            undone = previous.history.undo(previous)
+            undone.history.redo(undone)
+
+        # [field, old, new], undone then redone.
+        last = '[["start_time",49,50]]'
+        self.assertEqual([mock.call(last), mock.call(last)], loads.call_args_list)
+
+
+if __name__ == '__main__':
+    unittest.main()
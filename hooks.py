@@ -0,0 +1,130 @@
+"""Lifecycle hooks, delivered to a single long-lived worker.
+
+With `hook_command`, every transition of the timer is written as a JSON
+line to a FIFO that the command reads on its stdin, e.g.
+
+    {"event": "pause", "timer_name": "review", "time": 1700000000.0,
+     "elapsed_time": 754.2, "start_time": 1800}
+
+Events are `start`, `pause`, `resume`, `reset`, `input` (with the `input`
+applied) and `alarm` (with the `threshold` crossed, in seconds relative to
+the deadline). Transitions not made by a click have a `source`:
+`"schedule"` for a `start` fired by the schedule, `"undo"` or `"redo"`
+for those undo and redo make.
+
+The worker is started with the first event, and started again whenever
+an event finds nobody reading the FIFO, i.e. the worker died. It holds the
+FIFO open for writing too, so it never sees an end of file between ticks.
+Events are written without blocking: when a slow worker lets the pipe fill
+up, further events are dropped (and logged) rather than delaying the bar.
+"""
+import errno
+import fcntl
+import json
+import logging
+import os
+import select
+import subprocess
+from typing import Any
+
+import files
+
+
+def default_fifo(command: str) -> str:
+    import hashlib
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    key = hashlib.blake2b(command.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(runtime_dir, f'i3blocks-timer-hooks-{os.getuid()}-{key}')
+
+
+def event_line(state: Any, event: str, fields: dict[str, Any]) -> str:
+    now = state.new_timestamp
+    if now is None:
+        now = state.old_timestamp
+    return (
+        json.dumps(
+            {
+                'event': event,
+                'timer_name': state.timer_name,
+                'time': now,
+                'elapsed_time': state.elapsed_time,
+                'start_time': state.start_time,
+                **fields,
+            },
+            separators=(',', ':'),
+        )
+        + '\n'
+    )
+
+
+def _ensure_fifo(path: str):
+    try:
+        os.mkfifo(path, 0o600)
+    except FileExistsError:
+        pass
+
+
+def _open_writer(path: str) -> int | None:
+    """A non-blocking write end of `path`, or None if nobody reads it."""
+    try:
+        return os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as e:
+        if e.errno == errno.ENXIO:
+            return None
+        raise
+
+
+def start_worker(command: str, path: str) -> subprocess.Popen | None:
+    """Starts `command` reading `path`, unless another process just did."""
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        fd = _open_writer(path)
+        if fd is not None:
+            os.close(fd)
+            return None
+        # read-write, so that the worker never reads an end of file.
+        reader = os.open(path, os.O_RDWR)
+        try:
+            return subprocess.Popen(
+                command,
+                shell=True,
+                stdin=reader,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                # survives the blocket, and i3blocks' signals to it.
+                start_new_session=True,
+            )
+        finally:
+            os.close(reader)
+
+
+def deliver(command: str, path: str, line: str):
+    data = line.encode('utf-8')
+    if len(data) > select.PIPE_BUF:
+        # larger writes may be split and interleaved with other blockets'.
+        logging.warning(f'dropping a {len(data)} bytes hook event')
+        return
+    _ensure_fifo(path)
+    fd = _open_writer(path)
+    if fd is None:
+        start_worker(command, path)
+        fd = _open_writer(path)
+        if fd is None:
+            logging.warning(f'hook worker {command!r} is not reading')
+            return
+    try:
+        os.write(fd, data)
+    except BlockingIOError:
+        logging.warning(f'hook worker {command!r} is behind, dropping an event')
+    finally:
+        os.close(fd)
+
+
+def emit(state: Any, event: str, fields: dict[str, Any]):
+    """Sends `event` to the hook worker of `state`, if it has one."""
+    if not state.hook_command:
+        return
+    path = state.hook_fifo or default_fifo(state.hook_command)
+    with files.best_effort():
+        deliver(state.hook_command, path, event_line(state, event, fields))
@@ -0,0 +1,192 @@
+import json
+import os
+import signal
+import time
+import unittest
+from unittest import mock
+
+import hooks
+import state
+import state_mutations
+import testing
+import timer
+
+
+def _wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+class DeliveryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = testing.temp_dir(self)
+        self.fifo = os.path.join(self.dir, 'hooks')
+        self.out = os.path.join(self.dir, 'events')
+        self.pid_file = os.path.join(self.dir, 'pid')
+        self.command = f'echo $$ > {self.pid_file}; exec cat >> {self.out}'
+        self.workers = []
+        start_worker = hooks.start_worker
+
+        def _start_worker(command, path):
+            worker = start_worker(command, path)
+            if worker is not None:
+                self.workers.append(worker)
+            return worker
+
+        patcher = mock.patch.object(hooks, 'start_worker', _start_worker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._kill_workers)
+
+    def _worker_pid(self) -> int | None:
+        try:
+            with open(self.pid_file) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def _kill_workers(self):
+        for worker in self.workers:
+            # workers lead their own session, see `hooks.start_worker`.
+            try:
+                os.killpg(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            worker.wait()
+
+    def _events(self) -> list[str]:
+        try:
+            with open(self.out) as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def test_worker_is_started_and_restarted(self):
+        hooks.deliver(self.command, self.fifo, '{"event":"start"}\n')
+        hooks.deliver(self.command, self.fifo, '{"event":"pause"}\n')
+        _wait_for(lambda: len(self._events()) == 2)
+        first = self._worker_pid()
+
+        os.kill(first, signal.SIGKILL)
+        _wait_for(lambda: hooks._open_writer(self.fifo) is None)
+        os.remove(self.pid_file)
+        hooks.deliver(self.command, self.fifo, '{"event":"resume"}\n')
+
+        _wait_for(lambda: len(self._events()) == 3)
+        self.assertEqual('{"event":"resume"}', self._events()[-1])
+        self.assertNotEqual(first, self._worker_pid())
+
+    def test_a_stuck_worker_does_not_block(self):
+        self.command = f'echo $$ > {self.pid_file}; exec sleep 60'
+        line = json.dumps({'event': 'input', 'input': 'x' * 1000}) + '\n'
+
+        start = time.monotonic()
+        with self.assertLogs(level='WARNING') as logs:
+            for _ in range(200):
+                hooks.deliver(self.command, self.fifo, line)
+
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertIn('is behind', logs.output[-1])
+
+    def test_oversized_events_are_dropped(self):
+        with self.assertLogs(level='WARNING'):
+            hooks.deliver(self.command, self.fifo, 'x' * 10000)
+        self.assertIsNone(self._worker_pid())
+
+
+class EventsTest(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+        emitter = mock.patch.object(
+            state_mutations,
+            '_HOOK_EMITTER',
+            lambda state, event, fields: self.events.append((event, fields)),
+        )
+        emitter.start()
+        self.addCleanup(emitter.stop)
+        self.env = {
+            'hook_command': 'tracker',
+            'start_time': '60',
+            'alarm_thresholds': '-30s,0',
+            'read_input_command': 'rofi',
+        }
+
+    def _run(self, now: float, **env) -> dict:
+        self.env.update(timer.run({**self.env, **env}, clock=lambda: now))
+        return self.env
+
+    def test_transitions(self):
+        self._run(1000)
+        self._run(1000, button='1')
+        self._run(1040)
+        self._run(1040, button='1')
+        self._run(1040, button='1')
+        with mock.patch.object(
+            state_mutations, '_INPUT_READ_CALLER', lambda command: '+1m'
+        ):
+            self._run(1040, button='2')
+        self._run(1041, button='3')
+        # already reset.
+        self._run(1041, button='3')
+
+        self.assertEqual(
+            [
+                ('start', {}),
+                ('alarm', {'threshold': -30.0}),
+                ('pause', {}),
+                ('resume', {}),
+                ('input', {'input': '+1m'}),
+                ('reset', {}),
+            ],
+            self.events,
+        )
+
+    def test_undo_and_redo(self):
+        self._run(1000)
+        self._run(1000, button='1')
+        self._run(1010, button='1')
+        self._run(1010, button='8')
+        self._run(1010, button='8')
+        self._run(1010, button='9')
+
+        self.assertEqual(
+            [
+                ('start', {}),
+                ('pause', {}),
+                ('resume', {'source': 'undo'}),
+                ('reset', {'source': 'undo'}),
+                ('start', {'source': 'redo'}),
+            ],
+            self.events,
+        )
+
+    def test_no_hook_command(self):
+        del self.env['hook_command']
+
+        self._run(1000, button='1')
+
+        self.assertEqual([], self.events)
+
+    def test_event_line(self):
+        loaded = state.load_state(
+            {'timer_name': 'tea', 'elapsed_time': '1.5', 'start_time': '60'}, now=1000
+        )
+
+        self.assertEqual(
+            {
+                'event': 'input',
+                'timer_name': 'tea',
+                'time': 1000,
+                'elapsed_time': 1.5,
+                'start_time': 60,
+                'input': '+1m',
+            },
+            json.loads(hooks.event_line(loaded, 'input', {'input': '+1m'})),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
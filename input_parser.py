@@ -19,6 +19,8 @@ class InputType(enum.Enum):
     SET_TEXT_FORMAT = 'set_text_format'
     SET_COLOR_OPTION = 'set_color_option'
     VOID = 'void'
+    UNDO = 'undo'
+    REDO = 'redo'
 
 
 def pretty_time_to_seconds(text: str) -> int:
@@ -58,6 +60,8 @@ def parse_input(input: str) -> tuple[InputType, list[Any]]:
     input = input.strip()
     if not input:
         return (InputType.VOID, [])
+    if input in ('undo', 'redo'):
+        return (InputType(input), [])
     if '=' in input:
         property, value = input.split('=', 1)
         if property in (
@@ -129,6 +129,14 @@ class InputParserTest(unittest.TestCase):
             input_parser.InputType.VOID, input_type
         )
 
+    def test_undo_and_redo(self):
+        self.assertEqual(
+            (input_parser.InputType.UNDO, []), input_parser.parse_input('undo\n')
+        )
+        self.assertEqual(
+            (input_parser.InputType.REDO, []), input_parser.parse_input('redo')
+        )
+
     def test_set_text_format(self):
         input_type, [value] = input_parser.parse_input('text_format={elapsed_time}')
 
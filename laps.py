@@ -0,0 +1,82 @@
+import array
+import base64
+import dataclasses
+from typing import Any
+
+import exceptions
+
+# laps are kept in milliseconds.
+_TYPECODE = 'I'
+_MAX_MS = 2**32 - 1
+
+
+def _pack(head: int, ring: array.array) -> str:
+    packed = array.array(_TYPECODE, [head])
+    packed.extend(ring)
+    return base64.urlsafe_b64encode(packed.tobytes()).decode('ascii')
+
+
+def _unpack(text: str) -> tuple[int, array.array]:
+    if not text:
+        return 0, array.array(_TYPECODE)
+    packed = array.array(_TYPECODE)
+    try:
+        packed.frombytes(base64.urlsafe_b64decode(text))
+    except ValueError:
+        raise exceptions.BadValue(f"laps='{text}' is not a lap buffer")
+    return packed[0], packed[1:]
+
+
+@dataclasses.dataclass(frozen=True)
+class Laps:
+    """Fixed-capacity ring buffer of lap durations.
+
+    The ring is stored packed (base64 of an array of integer milliseconds,
+    prefixed by the index of its oldest lap) and is only unpacked when a lap
+    is recorded. Everything rendered is kept up to date incrementally.
+    """
+
+    capacity: int
+    packed: str = ''
+    count: int = 0
+    # elapsed_time at which the current lap started.
+    lap_start: float = 0.0
+    last: float = 0.0
+    best: float = 0.0
+
+    def record(self, elapsed_time: float) -> 'Laps':
+        lap = elapsed_time - self.lap_start
+        ms = min(max(round(lap * 1000), 0), _MAX_MS)
+        head, ring = _unpack(self.packed)
+        if len(ring) > self.capacity:
+            # capacity was reduced: keep the most recent laps.
+            ring = (ring[head:] + ring[:head])[len(ring) - self.capacity :]
+            head = 0
+        if len(ring) < self.capacity:
+            ring.append(ms)
+        elif self.capacity > 0:
+            ring[head] = ms
+            head = (head + 1) % self.capacity
+        return dataclasses.replace(
+            self,
+            packed=_pack(head, ring),
+            count=self.count + 1,
+            lap_start=elapsed_time,
+            last=lap,
+            best=lap if self.count == 0 else min(self.best, lap),
+        )
+
+    def laps(self) -> list[float]:
+        """The laps still in the buffer, oldest first, in seconds."""
+        head, ring = _unpack(self.packed)
+        return [ms / 1000 for ms in ring[head:] + ring[:head]]
+
+    def serializable(self) -> dict[str, Any]:
+        return {
+            'laps': self.packed,
+            'lap_count': self.count,
+            'lap_start': str(self.lap_start),
+            'last_lap': str(self.last),
+            'best_lap': str(self.best),
+        }
+
@@ -0,0 +1,53 @@
+import unittest
+
+import laps
+
+
+class LapsTest(unittest.TestCase):
+    def test_record_keeps_aggregates_up_to_date(self):
+        ring = laps.Laps(capacity=3)
+
+        ring = ring.record(10).record(25).record(32)
+
+        self.assertEqual(3, ring.count)
+        self.assertEqual(32, ring.lap_start)
+        self.assertEqual(7, ring.last)
+        self.assertEqual(7, ring.best)
+        self.assertEqual([10, 15, 7], ring.laps())
+
+    def test_ring_keeps_only_the_most_recent_laps(self):
+        ring = laps.Laps(capacity=3)
+        for elapsed in range(10, 60, 10):
+            ring = ring.record(elapsed + elapsed / 10)
+
+        self.assertEqual(5, ring.count)
+        self.assertEqual([11, 11, 11], ring.laps())
+        self.assertEqual(11, ring.best)
+
+    def test_ring_size_is_bounded(self):
+        ring = laps.Laps(capacity=4)
+        ring = ring.record(1)
+        size = None
+        for elapsed in range(2, 100):
+            ring = ring.record(elapsed)
+            if elapsed == 10:
+                size = len(ring.packed)
+
+        self.assertEqual(size, len(ring.packed))
+        self.assertEqual(4, len(ring.laps()))
+
+    def test_reduced_capacity_keeps_the_most_recent_laps(self):
+        ring = laps.Laps(capacity=5)
+        for elapsed in (1, 3, 6, 10, 15):
+            ring = ring.record(elapsed)
+
+        ring = laps.Laps(**{**ring.__dict__, 'capacity': 2}).record(21)
+
+        self.assertEqual([5, 6], ring.laps())
+
+    def test_empty(self):
+        self.assertEqual([], laps.Laps(capacity=3).laps())
+
+
+if __name__ == '__main__':
+    unittest.main()
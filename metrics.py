@@ -0,0 +1,120 @@
+"""Prometheus textfile exporter.
+
+With `metrics_file` set, counters are kept in the state round trip and the
+file is rewritten (atomically) at most every `metrics_interval` seconds,
+for node_exporter's textfile collector to pick up.
+"""
+import dataclasses
+from typing import Any
+
+import exceptions
+import files
+
+PHASES = ('load', 'update', 'render')
+
+
+@dataclasses.dataclass(frozen=True)
+class Metrics:
+    alarms_fired: int = 0
+    errors_raised: int = 0
+    ticks: int = 0
+    # total seconds spent in each of PHASES.
+    phase_seconds: tuple[float, ...] = (0.0,) * len(PHASES)
+    written_at: float | None = None
+
+    def encode(self) -> str:
+        return ','.join(
+            [
+                str(self.alarms_fired),
+                str(self.errors_raised),
+                str(self.ticks),
+                *(f'{seconds:.6f}' for seconds in self.phase_seconds),
+                '' if self.written_at is None else str(self.written_at),
+            ]
+        )
+
+    def observe(self, phase_seconds: tuple[float, ...]) -> 'Metrics':
+        return dataclasses.replace(
+            self,
+            ticks=self.ticks + 1,
+            phase_seconds=tuple(
+                total + seconds
+                for total, seconds in zip(self.phase_seconds, phase_seconds)
+            ),
+        )
+
+
+def decode(text: str | None) -> Metrics:
+    if not text:
+        return Metrics()
+    try:
+        alarms_fired, errors_raised, ticks, *rest = text.split(',')
+        *phase_seconds, written_at = rest
+        if len(phase_seconds) != len(PHASES):
+            raise ValueError(text)
+        return Metrics(
+            alarms_fired=int(alarms_fired),
+            errors_raised=int(errors_raised),
+            ticks=int(ticks),
+            phase_seconds=tuple(float(seconds) for seconds in phase_seconds),
+            written_at=float(written_at) if written_at else None,
+        )
+    except ValueError:
+        raise exceptions.BadValue(f"metrics='{text}' is not a metrics record")
+
+
+def _label(value: str) -> str:
+    escaped = value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def textfile(state: Any) -> str:
+    """Renders the metrics of `state` in Prometheus text format."""
+    metrics = state.metrics
+    timer = f'timer={_label(state.timer_name)}'
+    running = int(state.timer_state.value == 'running')
+    lines = [
+        '# HELP timer_remaining_seconds Seconds left before the timer runs out.',
+        '# TYPE timer_remaining_seconds gauge',
+        f'timer_remaining_seconds{{{timer}}} {state.start_time - state.elapsed_time}',
+        '# HELP timer_running Whether the timer is running.',
+        '# TYPE timer_running gauge',
+        f'timer_running{{{timer}}} {running}',
+        '# HELP timer_alarms_fired_total Alarms fired.',
+        '# TYPE timer_alarms_fired_total counter',
+        f'timer_alarms_fired_total{{{timer}}} {metrics.alarms_fired}',
+        '# HELP timer_errors_total Errors displayed.',
+        '# TYPE timer_errors_total counter',
+        f'timer_errors_total{{{timer}}} {metrics.errors_raised}',
+        '# HELP timer_ticks_total Ticks and clicks handled.',
+        '# TYPE timer_ticks_total counter',
+        f'timer_ticks_total{{{timer}}} {metrics.ticks}',
+        '# HELP timer_phase_seconds_total Time spent per phase of a tick.',
+        '# TYPE timer_phase_seconds_total counter',
+    ]
+    for phase, seconds in zip(PHASES, metrics.phase_seconds):
+        lines.append(
+            f'timer_phase_seconds_total{{{timer},phase="{phase}"}} {seconds:.6f}'
+        )
+    return '\n'.join(lines) + '\n'
+
+
+_TEXTFILE_WRITER = files.write_atomically
+
+
+def observe(
+    state: Any,
+    serialized: dict[str, Any],
+    phase_seconds: tuple[float, ...],
+    now: float,
+) -> tuple[Any, dict[str, Any]]:
+    """Accounts for one tick (or click) and exports the metrics when due."""
+    metrics = state.metrics.observe(phase_seconds)
+    if metrics.written_at is None or now - metrics.written_at >= state.metrics_interval:
+        metrics = dataclasses.replace(metrics, written_at=now)
+        state = dataclasses.replace(state, metrics=metrics)
+        with files.best_effort():
+            _TEXTFILE_WRITER(state.metrics_file, textfile(state))
+    state = dataclasses.replace(state, metrics=metrics)
+    serialized = {**serialized, 'metrics': metrics.encode()}
+    return state, serialized
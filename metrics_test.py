@@ -0,0 +1,107 @@
+import os
+import unittest
+
+import exceptions
+import metrics
+import state
+import testing
+import timer
+
+ENV = {
+    'timer_name': 'tea',
+    'start_time': '300',
+    'elapsed_time': '60',
+    'timer_state': 'running',
+    'old_timestamp': '1000',
+}
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = testing.temp_dir(self)
+        self.path = os.path.join(self.dir, 'timer.prom')
+
+    def test_encode_decode(self):
+        record = metrics.Metrics(
+            alarms_fired=2,
+            errors_raised=1,
+            ticks=30,
+            phase_seconds=(0.5, 0.25, 0.125),
+            written_at=1000.0,
+        )
+
+        self.assertEqual(record, metrics.decode(record.encode()))
+        self.assertEqual(metrics.Metrics(), metrics.decode(None))
+        self.assertEqual(metrics.Metrics(), metrics.decode(metrics.Metrics().encode()))
+
+    def test_decode_bad(self):
+        for text in ('1,2', 'a,0,0,0,0,0,', '1,2,3,0,0,'):
+            with self.subTest(text=text), self.assertRaises(exceptions.BadValue):
+                metrics.decode(text)
+
+    def test_textfile(self):
+        loaded = state.load_state(
+            {**ENV, 'metrics': '2,1,30,0.5,0.25,0.125,'}, 1000
+        )
+
+        text = metrics.textfile(loaded)
+
+        self.assertIn('timer_remaining_seconds{timer="tea"} 240', text)
+        self.assertIn('timer_running{timer="tea"} 1', text)
+        self.assertIn('timer_alarms_fired_total{timer="tea"} 2', text)
+        self.assertIn('timer_errors_total{timer="tea"} 1', text)
+        self.assertIn('timer_ticks_total{timer="tea"} 30', text)
+        self.assertIn(
+            'timer_phase_seconds_total{timer="tea",phase="update"} 0.250000', text
+        )
+        self.assertIn('# TYPE timer_ticks_total counter', text)
+
+    def test_label_escaping(self):
+        loaded = state.load_state({**ENV, 'timer_name': 'a "b"\\c'}, 1000)
+
+        self.assertIn(
+            'timer_running{timer="a \\"b\\"\\\\c"} 1', metrics.textfile(loaded)
+        )
+
+    def test_writes_are_coalesced(self):
+        env = {**ENV, 'metrics_file': self.path, 'metrics_interval': '10'}
+
+        output = timer.run(env, clock=lambda: 1001)
+        self.assertTrue(os.path.exists(self.path))
+        os.remove(self.path)
+        output = timer.run({**env, **output}, clock=lambda: 1005)
+        self.assertFalse(os.path.exists(self.path))
+        output = timer.run({**env, **output}, clock=lambda: 1011)
+
+        self.assertEqual(3, metrics.decode(output['metrics']).ticks)
+        with open(self.path) as f:
+            self.assertIn('timer_ticks_total{timer="tea"} 3', f.read())
+        # no temporary files are left behind.
+        self.assertEqual(['timer.prom'], os.listdir(self.dir))
+
+    def test_errors_are_counted(self):
+        env = {
+            **ENV,
+            'metrics_file': self.path,
+            'text_format': '{nope}',
+        }
+
+        output = timer.run(env, clock=lambda: 1001)
+
+        self.assertEqual(1, metrics.decode(output['metrics']).errors_raised)
+
+    def test_disabled(self):
+        output = timer.run(ENV, clock=lambda: 1001)
+
+        self.assertNotIn('metrics', output)
+
+    def test_unwritable_file(self):
+        env = {**ENV, 'metrics_file': os.path.join(self.dir, 'missing', 'x.prom')}
+
+        output = timer.run(env, clock=lambda: 1001)
+
+        self.assertEqual(1, metrics.decode(output['metrics']).ticks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""Preset catalog for middle click selection.
+
+A catalog is a text file with one preset per line: a timer name followed
+by its time, e.g.
+
+    standup 15m
+    review 30m
+    deep work 1h30m
+
+Its lines are fed as a menu to `read_input_command` (e.g. `rofi -dmenu`),
+and a selection maps directly to the inputs it stands for. Catalogs are
+parsed and validated once and cached in binary form until the file
+changes.
+"""
+import bisect
+import dataclasses
+import logging
+import os
+from typing import Any
+
+import exceptions
+import input_parser
+
+Batch = tuple[tuple[input_parser.InputType, list[Any]], ...]
+
+# bump whenever `Catalog` changes shape.
+_CACHE_VERSION = 1
+
+
+@dataclasses.dataclass(frozen=True)
+class Catalog:
+    # in file order.
+    menu: str
+    # sorted, for prefix lookups.
+    labels: tuple[str, ...]
+    batches: dict[str, Batch]
+
+    def lookup(self, selection: str) -> Batch | None:
+        """Maps a selection (or an unambiguous prefix of one) to its inputs.
+
+        Prefixes that are valid inputs on their own (e.g. "25") are left
+        to be read as such.
+        """
+        selection = selection.strip()
+        if not selection:
+            return None
+        batch = self.batches.get(selection)
+        if batch is not None:
+            return batch
+        try:
+            input_parser.parse_input(selection)
+            return None
+        except exceptions.TimerException:
+            pass
+        index = bisect.bisect_left(self.labels, selection)
+        matches = [
+            label
+            for label in self.labels[index : index + 2]
+            if label.startswith(selection)
+        ]
+        if len(matches) == 1:
+            return self.batches[matches[0]]
+        return None
+
+
+def parse_preset(line: str) -> Batch:
+    name, _, time = line.rpartition(' ')
+    input_type, args = input_parser.parse_input(time)
+    if input_type != input_parser.InputType.TIME_SET:
+        raise exceptions.BadValue(f"bad preset '{line}'")
+    batch = []
+    if name.strip():
+        batch.append(
+            (
+                input_parser.InputType.SET_GENERIC_FREE_TEXT_PROPERTY,
+                ['timer_name', name.strip()],
+            )
+        )
+    batch.append((input_type, args))
+    return tuple(batch)
+
+
+def batch_name(batch: Batch) -> str | None:
+    """The timer name a preset sets, if any."""
+    for input_type, args in batch:
+        if input_type == input_parser.InputType.SET_GENERIC_FREE_TEXT_PROPERTY:
+            return args[1]
+    return None
+
+
+def parse_catalog(text: str) -> Catalog:
+    batches = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        batches[line] = parse_preset(line)
+    return Catalog(
+        menu='\n'.join(batches),
+        labels=tuple(sorted(batches)),
+        batches=batches,
+    )
+
+
+def cache_path(path: str) -> str:
+    import hashlib
+
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    key = hashlib.blake2b(
+        os.path.abspath(path).encode('utf-8'), digest_size=8
+    ).hexdigest()
+    return os.path.join(cache_dir, 'i3blocks-timer', f'presets-{key}.pickle')
+
+
+def load_catalog(path: str) -> Catalog:
+    """Loads a catalog, from its cache if the file did not change."""
+    # only middle clicks and schedules read catalogs.
+    import pickle
+    import tempfile
+
+    stat = os.stat(path)
+    fingerprint = (_CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+    cache = cache_path(path)
+    try:
+        with open(cache, 'rb') as f:
+            cached_fingerprint, catalog = pickle.load(f)
+        if cached_fingerprint == fingerprint:
+            return catalog
+    except Exception:
+        # missing, corrupt or pickled by another version (which may not
+        # even unpickle): rebuilt below.
+        pass
+
+    with open(path, encoding='utf-8') as f:
+        catalog = parse_catalog(f.read())
+    try:
+        os.makedirs(os.path.dirname(cache), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            'wb', dir=os.path.dirname(cache), delete=False
+        ) as f:
+            pickle.dump((fingerprint, catalog), f)
+        os.replace(f.name, cache)
+    except OSError as e:
+        # a missing cache only costs parsing the catalog again.
+        logging.error(e)
+    return catalog
@@ -0,0 +1,147 @@
+import os
+import unittest
+from unittest import mock
+
+import exceptions
+import input_parser
+import presets
+import state
+import state_mutations
+import testing
+
+CATALOG = """\
+# name time
+standup 15m
+review 30m
+deep work 1h30m
+deep sleep 8h
+25:00
+"""
+
+
+class PresetsTest(unittest.TestCase):
+    def setUp(self):
+        tmp = testing.temp_dir(self)
+        patcher = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': tmp})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.path = os.path.join(tmp, 'presets.txt')
+        with open(self.path, 'w') as f:
+            f.write(CATALOG)
+
+    def test_parse_catalog(self):
+        catalog = presets.parse_catalog(CATALOG)
+
+        self.assertEqual(
+            'standup 15m\nreview 30m\ndeep work 1h30m\ndeep sleep 8h\n25:00',
+            catalog.menu,
+        )
+        self.assertEqual(
+            (
+                (
+                    input_parser.InputType.SET_GENERIC_FREE_TEXT_PROPERTY,
+                    ['timer_name', 'deep work'],
+                ),
+                (input_parser.InputType.TIME_SET, [5400]),
+            ),
+            catalog.batches['deep work 1h30m'],
+        )
+        self.assertEqual(
+            ((input_parser.InputType.TIME_SET, [1500]),), catalog.batches['25:00']
+        )
+
+    def test_bad_preset(self):
+        with self.assertRaises(exceptions.BadValue):
+            presets.parse_catalog('standup +15m')
+
+    def test_lookup(self):
+        catalog = presets.parse_catalog(CATALOG)
+
+        self.assertEqual(
+            catalog.batches['review 30m'], catalog.lookup('review 30m\n')
+        )
+        self.assertEqual(catalog.batches['review 30m'], catalog.lookup('rev'))
+        self.assertEqual(
+            catalog.batches['deep sleep 8h'], catalog.lookup('deep s')
+        )
+        # valid inputs are not prefixes.
+        self.assertIsNone(catalog.lookup('25'))
+        self.assertEqual(catalog.batches['25:00'], catalog.lookup('25:00'))
+        # ambiguous, unknown and empty selections.
+        self.assertIsNone(catalog.lookup('deep'))
+        self.assertIsNone(catalog.lookup('lunch'))
+        self.assertIsNone(catalog.lookup(''))
+
+    def test_load_catalog_is_cached_until_the_file_changes(self):
+        catalog = presets.load_catalog(self.path)
+        self.assertTrue(os.path.exists(presets.cache_path(self.path)))
+
+        with mock.patch.object(presets, 'parse_catalog') as parse_catalog:
+            self.assertEqual(catalog, presets.load_catalog(self.path))
+            parse_catalog.assert_not_called()
+
+        with open(self.path, 'a') as f:
+            f.write('lunch 1h\n')
+        self.assertIn('lunch 1h', presets.load_catalog(self.path).batches)
+
+    def test_stale_cache_is_rebuilt(self):
+        catalog = presets.load_catalog(self.path)
+        # pickled by versions with other classes or modules.
+        for stale in (b'cpresets\nOldCatalog\n.', b'cno_such_module\nCatalog\n.'):
+            with self.subTest(stale=stale):
+                with open(presets.cache_path(self.path), 'wb') as f:
+                    f.write(stale)
+
+                self.assertEqual(catalog, presets.load_catalog(self.path))
+                with mock.patch.object(presets, 'parse_catalog') as parse_catalog:
+                    self.assertEqual(catalog, presets.load_catalog(self.path))
+                    parse_catalog.assert_not_called()
+
+    def test_middle_click_selects_preset(self):
+        menus = []
+
+        def _read_menu(cmd, menu):
+            menus.append(menu)
+            return 'deep w\n'
+
+        with mock.patch.object(state_mutations, '_MENU_READ_CALLER', _read_menu):
+            init = state.load_state(
+                {'read_input_command': 'rofi -dmenu', 'preset_file': self.path},
+                now=0,
+            )
+
+            later = state_mutations._on_middle_click(init)
+
+        self.assertEqual([presets.load_catalog(self.path).menu], menus)
+        self.assertEqual('deep work', later.timer_name)
+        self.assertEqual(5400, later.start_time)
+
+    def test_middle_click_falls_back_to_free_form_input(self):
+        with mock.patch.object(
+            state_mutations, '_MENU_READ_CALLER', lambda cmd, menu: '+10m'
+        ):
+            init = state.load_state(
+                {'read_input_command': 'rofi -dmenu', 'preset_file': self.path},
+                now=0,
+            )
+
+            later = state_mutations._on_middle_click(init)
+
+        self.assertEqual(900, later.start_time)
+
+    def test_middle_click_reads_durations_prefixing_presets(self):
+        with mock.patch.object(
+            state_mutations, '_MENU_READ_CALLER', lambda cmd, menu: '25'
+        ):
+            init = state.load_state(
+                {'read_input_command': 'rofi -dmenu', 'preset_file': self.path},
+                now=0,
+            )
+
+            later = state_mutations._on_middle_click(init)
+
+        self.assertEqual(25, later.start_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
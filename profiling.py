@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Aggregated profiles of many i3blocks invocations.
+
+A single tick takes a few milliseconds in a process of its own, so
+profiling one tells little. Setting `profile_file` in the blocket
+configuration (or i3blocks' environment) profiles every invocation with
+cProfile and adds its stats to that file, a regular pstats file that any
+pstats tool reads. Reports then cover every tick since:
+
+    ./profiling.py /tmp/timer.prof --top 30
+    ./profiling.py /tmp/timer.prof --collapsed | flamegraph.pl > timer.svg
+
+Profiles only record who called whom, not whole stacks, so collapsed stacks
+are rebuilt from the call graph, splitting the time of a function among
+its callers in proportion to the time spent under each of them.
+"""
+import argparse
+import cProfile
+import fcntl
+import logging
+import marshal
+import os
+import pstats
+import sys
+import tempfile
+from typing import Any, Callable, Iterator, TypeVar
+
+import files
+
+T = TypeVar('T')
+
+# (file, line, name), as in pstats.
+Function = tuple[str, int, str]
+
+# stacks weighing less than this many seconds are left out of collapsed
+# output, which bounds the walk up the call graph.
+MIN_STACK_SECONDS = 1e-6
+_MAX_DEPTH = 64
+
+
+def record(path: str, call: Callable[[], T]) -> T:
+    """Runs `call` under the profiler and adds its stats to `path`."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return call()
+    finally:
+        profiler.disable()
+        with files.best_effort():
+            merge(path, pstats.Stats(profiler))
+
+
+def merge(path: str, stats: pstats.Stats):
+    """Adds `stats` to the aggregate in `path`, creating it if needed."""
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            stats.add(path)
+        except FileNotFoundError:
+            pass
+        except (EOFError, ValueError, TypeError) as e:
+            logging.warning(f'starting over corrupt profile {path}: {e}')
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile(
+            'wb', dir=directory, prefix='.', suffix='.tmp', delete=False
+        ) as f:
+            marshal.dump(stats.stats, f)
+        os.chmod(f.name, 0o644)
+        # readers never see a partial profile.
+        os.replace(f.name, path)
+
+
+def label(function: Function) -> str:
+    file, line, name = function
+    if file == '~':
+        # built-ins, e.g. "<built-in method posix.stat>".
+        text = name
+    else:
+        text = f'{os.path.basename(file)}:{name}'
+    return text.replace(';', ',')
+
+
+def _stacks(
+    stats: dict[Function, Any],
+    function: Function,
+    seconds: float,
+    path: tuple[Function, ...],
+) -> Iterator[tuple[tuple[Function, ...], float]]:
+    path = (function,) + path
+    callers = {
+        caller: edge[3]
+        for caller, edge in stats[function][4].items()
+        if caller not in path and caller in stats
+    }
+    under_callers = sum(callers.values())
+    if not callers or len(path) >= _MAX_DEPTH or under_callers <= 0:
+        yield path, seconds
+        return
+    for caller, cumulative in callers.items():
+        share = seconds * cumulative / under_callers
+        if share >= MIN_STACK_SECONDS:
+            yield from _stacks(stats, caller, share, path)
+
+
+def collapsed(stats: dict[Function, Any]) -> dict[str, int]:
+    """Stacks in the collapsed format of flamegraph.pl, weighted in µs.
+
+    Args:
+        stats: the `stats` of a `pstats.Stats`.
+    """
+    stacks = {}
+    for function, (_, _, own_seconds, _, _) in stats.items():
+        if own_seconds < MIN_STACK_SECONDS:
+            continue
+        for path, seconds in _stacks(stats, function, own_seconds, ()):
+            stack = ';'.join(label(f) for f in path)
+            stacks[stack] = stacks.get(stack, 0) + seconds
+    return {
+        stack: round(seconds * 1e6)
+        for stack, seconds in stacks.items()
+        if round(seconds * 1e6)
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('profile_file')
+    parser.add_argument('--top', type=int, default=25, help='functions to print')
+    parser.add_argument(
+        '--sort',
+        default='tottime',
+        choices=('tottime', 'cumulative', 'ncalls'),
+        help='order of the functions (default: tottime)',
+    )
+    parser.add_argument(
+        '--collapsed',
+        action='store_true',
+        help='print collapsed stacks for flame graphs instead',
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        stats = pstats.Stats(args.profile_file, stream=sys.stdout)
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        print(f'profiling.py: cannot read {args.profile_file}: {e}', file=sys.stderr)
+        return 1
+    if args.collapsed:
+        for stack, microseconds in sorted(collapsed(stats.stats).items()):
+            print(f'{stack} {microseconds}')
+        return 0
+    stats.strip_dirs().sort_stats(args.sort).print_stats(args.top)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
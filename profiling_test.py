@@ -0,0 +1,111 @@
+import contextlib
+import io
+import json
+import os
+import pstats
+import unittest
+
+import profiling
+import testing
+import timer
+
+
+def _work():
+    return sum(range(1000))
+
+
+def _outer():
+    return _work()
+
+
+def _calls(path: str, name: str) -> int:
+    stats = pstats.Stats(path).stats
+    return sum(
+        calls for (_, _, function), (_, calls, *_) in stats.items() if function == name
+    )
+
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        self.profile_file = os.path.join(testing.temp_dir(self), 'timer.prof')
+
+    def test_record_returns_and_aggregates_invocations(self):
+        for _ in range(3):
+            self.assertEqual(499500, profiling.record(self.profile_file, _outer))
+        self.assertEqual(3, _calls(self.profile_file, '_work'))
+
+    def test_record_keeps_failed_invocations(self):
+        with self.assertRaises(ZeroDivisionError):
+            profiling.record(self.profile_file, lambda: 1 / 0)
+        profiling.record(self.profile_file, _work)
+        self.assertEqual(1, _calls(self.profile_file, '_work'))
+
+    def test_starts_over_a_corrupt_profile(self):
+        with open(self.profile_file, 'wb') as f:
+            f.write(b'not a profile')
+        with self.assertLogs(level='WARNING'):
+            profiling.record(self.profile_file, _work)
+        self.assertEqual(1, _calls(self.profile_file, '_work'))
+
+    def test_timer_main_profiles_when_configured(self):
+        output = timer.main(
+            {'profile_file': self.profile_file, 'start_time': '60'}
+        )
+        self.assertEqual('1m', json.loads(output)['full_text'])
+        self.assertEqual(1, _calls(self.profile_file, 'run'))
+
+    def test_collapsed_splits_time_among_callers(self):
+        a = ('a.py', 1, 'a')
+        b = ('b.py', 1, 'b')
+        c = ('/lib/c.py', 1, 'c')
+        stats = {
+            a: (1, 1, 0.001, 0.004, {}),
+            b: (1, 1, 0.0, 0.003, {a: (1, 1, 0.0, 0.003)}),
+            # 1 ms under a directly, 2 ms through b.
+            c: (
+                2,
+                2,
+                0.003,
+                0.003,
+                {a: (1, 1, 0.001, 0.001), b: (1, 1, 0.002, 0.002)},
+            ),
+        }
+        self.assertEqual(
+            {'a.py:a': 1000, 'a.py:a;c.py:c': 1000, 'a.py:a;b.py:b;c.py:c': 2000},
+            profiling.collapsed(stats),
+        )
+
+    def test_collapsed_survives_recursion(self):
+        f = ('f.py', 1, 'f')
+        stats = {f: (3, 1, 0.002, 0.002, {f: (2, 2, 0.001, 0.001)})}
+        self.assertEqual({'f.py:f': 2000}, profiling.collapsed(stats))
+
+    def test_labels(self):
+        self.assertEqual(
+            '<built-in method posix.stat>',
+            profiling.label(('~', 0, '<built-in method posix.stat>')),
+        )
+        self.assertEqual('x.py:f', profiling.label(('/a;b/x.py', 3, 'f')))
+
+    def test_report(self):
+        profiling.record(self.profile_file, _outer)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(0, profiling.main([self.profile_file, '--top', '5']))
+        self.assertIn('_work', out.getvalue())
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            profiling.main([self.profile_file, '--collapsed'])
+        for line in out.getvalue().splitlines():
+            stack, _, weight = line.rpartition(' ')
+            self.assertTrue(stack)
+            self.assertGreater(int(weight), 0)
+
+    def test_report_on_missing_file(self):
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(1, profiling.main([self.profile_file]))
+
+
+if __name__ == '__main__':
+    unittest.main()
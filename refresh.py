@@ -0,0 +1,103 @@
+"""Signal-driven refreshes for `interval=once` blockets.
+
+With `refresh_signal=N` (and i3blocks' `interval=once` plus `signal=N`),
+i3blocks only runs the timer when clicked or signaled, so idle timers cost
+no process at all. While the displayed text changes every second, i.e. the
+timer runs or an error counts down, each run leaves behind a detached
+sleeper that signals i3blocks with SIGRTMIN+N when the next refresh is due.
+"""
+import dataclasses
+import os
+import signal
+import time
+from typing import Any
+
+import exceptions
+
+# how far up the process tree i3blocks is looked for (e.g. past `sh -c`).
+_MAX_ANCESTORS = 4
+
+
+def signal_number(refresh_signal: int) -> int:
+    signum = signal.SIGRTMIN + refresh_signal
+    if refresh_signal < 1 or signum > signal.SIGRTMAX:
+        raise exceptions.BadValue(
+            f'refresh_signal={refresh_signal} is not between 1 and '
+            f'{signal.SIGRTMAX - signal.SIGRTMIN}'
+        )
+    return signum
+
+
+def _parent(pid: int) -> tuple[str, int]:
+    with open(f'/proc/{pid}/stat') as f:
+        stat = f.read()
+    name = stat[stat.index('(') + 1 : stat.rindex(')')]
+    return name, int(stat.rpartition(')')[2].split()[1])
+
+
+def i3blocks_pid(start: int | None = None) -> int:
+    """The closest i3blocks ancestor from `start` (default: our parent)."""
+    start = os.getppid() if start is None else start
+    pid = start
+    try:
+        for _ in range(_MAX_ANCESTORS):
+            name, parent = _parent(pid)
+            if name == 'i3blocks':
+                return pid
+            if parent <= 1:
+                break
+            pid = parent
+    except OSError:
+        pass
+    return start
+
+
+def spawn_sleeper(pid: int, signum: int, delay: float) -> int:
+    """Signals `pid` after `delay` seconds from a detached process.
+
+    Returns:
+        The pid of the sleeper.
+    """
+    sleeper = os.fork()
+    if sleeper != 0:
+        return sleeper
+    try:
+        os.setsid()
+        # i3blocks waits for its pipes to close before reading the output.
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+        time.sleep(delay)
+        os.kill(pid, signum)
+    finally:
+        os._exit(0)
+
+
+def next_delay(elapsed_time: float, running: bool) -> float:
+    if not running:
+        return 1.0
+    # on the next whole elapsed second, when the displayed time changes.
+    delay = 1.0 - elapsed_time % 1.0
+    return delay if delay >= 0.1 else delay + 1.0
+
+
+_SLEEPER_SPAWNER = spawn_sleeper
+
+
+def schedule(
+    state: Any, serialized: dict[str, Any], now: float
+) -> tuple[Any, dict[str, Any]]:
+    """Makes sure a refresh is pending while the displayed text changes."""
+    running = state.timer_state.value == 'running'
+    if not running and state.error_duration is None:
+        return state, serialized
+    if state.refresh_at is None or now >= state.refresh_at:
+        delay = next_delay(state.elapsed_time, running)
+        _SLEEPER_SPAWNER(
+            i3blocks_pid(state.refresh_pid),
+            signal_number(state.refresh_signal),
+            delay,
+        )
+        state = dataclasses.replace(state, refresh_at=now + delay)
+    # otherwise, e.g. on a click, the pending refresh is kept.
+    return state, {**serialized, 'refresh_at': str(state.refresh_at)}
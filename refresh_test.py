@@ -0,0 +1,89 @@
+import os
+import signal
+import unittest
+
+import exceptions
+import refresh
+import state
+import timer
+
+ENV = {
+    'refresh_signal': '3',
+    'refresh_pid': '4242',
+    'start_time': '60',
+    'old_timestamp': '1000',
+}
+
+
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.spawner = refresh._SLEEPER_SPAWNER
+        self.sleepers = []
+        refresh._SLEEPER_SPAWNER = lambda *args: self.sleepers.append(args)
+
+    def tearDown(self):
+        refresh._SLEEPER_SPAWNER = self.spawner
+
+    def test_signal_number(self):
+        self.assertEqual(signal.SIGRTMIN + 3, refresh.signal_number(3))
+        for bad in (0, signal.SIGRTMAX):
+            with self.subTest(bad=bad), self.assertRaises(exceptions.BadValue):
+                refresh.signal_number(bad)
+
+    def test_bad_refresh_signal(self):
+        with self.assertRaises(exceptions.BadValue):
+            state.load_state({**ENV, 'refresh_signal': '0'}, 1001)
+
+    def test_next_delay(self):
+        self.assertEqual(1.0, refresh.next_delay(10.25, running=False))
+        self.assertEqual(0.75, refresh.next_delay(10.25, running=True))
+        self.assertAlmostEqual(1.05, refresh.next_delay(10.95, running=True))
+
+    def test_idle_timers_are_not_refreshed(self):
+        output = timer.run(ENV, clock=lambda: 1001)
+
+        self.assertEqual([], self.sleepers)
+        self.assertNotIn('refresh_at', output)
+
+    def test_running_timers_refresh_themselves(self):
+        env = {**ENV, 'timer_state': 'running', 'elapsed_time': '10.5'}
+
+        output = timer.run(env, clock=lambda: 1001.25)
+
+        # 11.75s elapsed, the display changes at 12s.
+        self.assertEqual([(4242, signal.SIGRTMIN + 3, 0.25)], self.sleepers)
+        self.assertEqual('1001.5', output['refresh_at'])
+
+        # a click before then keeps the pending refresh.
+        output = timer.run({**env, **output, 'button': '4'}, clock=lambda: 1001.4)
+        self.assertEqual(1, len(self.sleepers))
+        self.assertEqual('1001.5', output['refresh_at'])
+
+        # the refresh itself schedules the next one.
+        timer.run({**env, **output}, clock=lambda: 1001.5)
+        self.assertEqual(2, len(self.sleepers))
+
+    def test_errors_count_down(self):
+        output = timer.run({**ENV, 'text_format': '{nope}'}, clock=lambda: 1001)
+
+        self.assertEqual([(4242, signal.SIGRTMIN + 3, 1.0)], self.sleepers)
+        self.assertEqual('1002.0', output['refresh_at'])
+
+    def test_i3blocks_pid_falls_back_to_start(self):
+        self.assertEqual(os.getpid(), refresh.i3blocks_pid(os.getpid()))
+
+
+class SleeperTest(unittest.TestCase):
+    def test_signals_after_delay(self):
+        signum = refresh.signal_number(5)
+        old_mask = signal.pthread_sigmask(signal.SIG_BLOCK, [signum])
+        self.addCleanup(signal.pthread_sigmask, signal.SIG_SETMASK, old_mask)
+
+        sleeper = refresh.spawn_sleeper(os.getpid(), signum, 0.05)
+        self.addCleanup(os.waitpid, sleeper, 0)
+
+        self.assertIsNotNone(signal.sigtimedwait([signum], 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+"""Output fan-out to displays other than i3blocks.
+
+`output_sinks` is a comma separated list of `<format>:<path>` entries, e.g.
+
+    tmux:/tmp/timer.tmux,waybar:/run/user/1000/timer.fifo
+
+Every tick, the state computed for i3blocks is also rendered in each
+configured format and written to its path, so other displays just read
+it instead of polling their own copy of the timer. Regular files are
+replaced atomically; FIFOs get one line per tick, dropped when nobody is
+reading.
+"""
+from collections.abc import Mapping
+import dataclasses
+import errno
+import html
+import json
+import os
+import re
+import stat
+from typing import Any, Callable
+
+import exceptions
+import files
+
+_TAG = re.compile(r'<(/?)(\w+)([^>]*)>')
+_ATTRIBUTE = re.compile(r'''(\w+)=['"]([^'"]*)['"]''')
+# pango span attributes -> tmux style attributes.
+_TMUX_STYLES = {
+    'color': 'fg',
+    'foreground': 'fg',
+    'fgcolor': 'fg',
+    'background': 'bg',
+    'bgcolor': 'bg',
+}
+# keys i3blocks reads to display a block.
+_I3BLOCKS_KEYS = ('label', 'full_text', 'short_text', 'color', 'background')
+
+
+@dataclasses.dataclass(frozen=True)
+class Sink:
+    format: str
+    path: str
+
+
+def _full_text(serialized: Mapping[str, Any]) -> str:
+    # as i3blocks shows it.
+    return serialized.get('label', '') + serialized['full_text']
+
+
+def i3blocks(serialized: Mapping[str, Any]) -> str:
+    return json.dumps(
+        {key: serialized[key] for key in _I3BLOCKS_KEYS if key in serialized}
+    )
+
+
+def plain(serialized: Mapping[str, Any]) -> str:
+    return html.unescape(_TAG.sub('', _full_text(serialized)))
+
+
+def tmux(serialized: Mapping[str, Any]) -> str:
+    """Renders pango spans (and error colors) as tmux style markup."""
+    base = [
+        f'{_TMUX_STYLES[key]}={serialized[key]}'
+        for key in ('color', 'background')
+        if key in serialized
+    ]
+    reset = f'#[default,{",".join(base)}]' if base else '#[default]'
+    parts = [f'#[{",".join(base)}]'] if base else []
+    text = _full_text(serialized)
+    position = 0
+    for match in _TAG.finditer(text):
+        parts.append(html.unescape(text[position : match.start()]).replace('#', '##'))
+        position = match.end()
+        closing, tag, attributes = match.groups()
+        if tag != 'span':
+            continue
+        if closing:
+            parts.append(reset)
+            continue
+        styles = [
+            f'{_TMUX_STYLES[key]}={value}'
+            for key, value in _ATTRIBUTE.findall(attributes)
+            if key in _TMUX_STYLES
+        ]
+        if styles:
+            parts.append(f'#[{",".join(styles)}]')
+    parts.append(html.unescape(text[position:]).replace('#', '##'))
+    if base:
+        parts.append('#[default]')
+    return ''.join(parts)
+
+
+def waybar(serialized: Mapping[str, Any]) -> str:
+    """Renders the JSON a waybar custom module with `return-type: json` reads."""
+    error = 'error_message' in serialized
+    return json.dumps(
+        {
+            'text': _full_text(serialized),
+            'tooltip': serialized.get('error_message') or serialized['timer_name'],
+            'alt': serialized['timer_state'],
+            'class': 'error' if error else serialized['timer_state'],
+        }
+    )
+
+
+RENDERERS: dict[str, Callable[[Mapping[str, Any]], str]] = {
+    'i3blocks': i3blocks,
+    'plain': plain,
+    'tmux': tmux,
+    'waybar': waybar,
+}
+
+
+def parse_sinks(text: str | None) -> tuple[Sink, ...]:
+    if not text:
+        return ()
+    sinks = []
+    for entry in text.split(','):
+        format, separator, path = entry.strip().partition(':')
+        if not separator or not path or format not in RENDERERS:
+            raise exceptions.BadValue(
+                f"bad output sink '{entry}', expected one of "
+                f"{', '.join(RENDERERS)} followed by ':<path>'"
+            )
+        sinks.append(Sink(format, os.path.expanduser(path)))
+    return tuple(sinks)
+
+
+def _write_fifo(path: str, line: str):
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as e:
+        # nobody is reading.
+        if e.errno == errno.ENXIO:
+            return
+        raise
+    try:
+        os.write(fd, line.encode('utf-8'))
+    except BlockingIOError:
+        # the reader is behind, it will get the next tick.
+        pass
+    finally:
+        os.close(fd)
+
+
+def write(sink: Sink, text: str):
+    try:
+        is_fifo = stat.S_ISFIFO(os.stat(sink.path).st_mode)
+    except FileNotFoundError:
+        is_fifo = False
+    if is_fifo:
+        _write_fifo(sink.path, text + '\n')
+    else:
+        files.write_atomically(sink.path, text + '\n')
+
+
+_SINK_WRITER = write
+
+
+def fan_out(sinks: tuple[Sink, ...], serialized: Mapping[str, Any]):
+    """Renders `serialized` once per format and writes it to every sink."""
+    rendered = {}
+    for sink in sinks:
+        if sink.format not in rendered:
+            rendered[sink.format] = RENDERERS[sink.format](serialized)
+        with files.best_effort():
+            _SINK_WRITER(sink, rendered[sink.format])
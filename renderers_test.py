@@ -0,0 +1,124 @@
+import json
+import os
+import unittest
+
+import exceptions
+import renderers
+import testing
+import timer
+
+SERIALIZED = {
+    'label': 'timer: ',
+    'full_text': "<span color='#BB0A21'>-1m &amp; #1</span>",
+    'short_text': "<span color='#BB0A21'>-1m &amp; #1</span>",
+    'timer_name': 'tea',
+    'timer_state': 'running',
+    'elapsed_time': '360',
+}
+
+ERROR = {
+    **SERIALIZED,
+    'label': '',
+    'full_text': 'bad(3.0)',
+    'short_text': 'bad',
+    'color': '#ffffff',
+    'background': '#ff0000',
+    'error_message': 'bad',
+}
+
+
+class RenderersTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = testing.temp_dir(self)
+
+    def test_i3blocks(self):
+        self.assertEqual(
+            {
+                'label': '',
+                'full_text': 'bad(3.0)',
+                'short_text': 'bad',
+                'color': '#ffffff',
+                'background': '#ff0000',
+            },
+            json.loads(renderers.i3blocks(ERROR)),
+        )
+
+    def test_plain(self):
+        self.assertEqual('timer: -1m & #1', renderers.plain(SERIALIZED))
+
+    def test_tmux(self):
+        self.assertEqual(
+            'timer: #[fg=#BB0A21]-1m & ##1#[default]', renderers.tmux(SERIALIZED)
+        )
+        self.assertEqual(
+            '#[fg=#ffffff,bg=#ff0000]bad(3.0)#[default]', renderers.tmux(ERROR)
+        )
+
+    def test_waybar(self):
+        self.assertEqual(
+            {
+                'text': "timer: <span color='#BB0A21'>-1m &amp; #1</span>",
+                'tooltip': 'tea',
+                'alt': 'running',
+                'class': 'running',
+            },
+            json.loads(renderers.waybar(SERIALIZED)),
+        )
+        self.assertEqual('error', json.loads(renderers.waybar(ERROR))['class'])
+
+    def test_parse_sinks(self):
+        self.assertEqual((), renderers.parse_sinks(None))
+        self.assertEqual(
+            (
+                renderers.Sink('tmux', '/tmp/timer.tmux'),
+                renderers.Sink('waybar', '/tmp/timer:fifo'),
+            ),
+            renderers.parse_sinks('tmux:/tmp/timer.tmux, waybar:/tmp/timer:fifo'),
+        )
+        for text in ('tmux', 'lemonbar:/tmp/x', 'plain:'):
+            with self.subTest(text=text), self.assertRaises(exceptions.BadValue):
+                renderers.parse_sinks(text)
+
+    def test_fan_out_to_files(self):
+        plain = os.path.join(self.dir, 'timer.txt')
+        tmux = os.path.join(self.dir, 'timer.tmux')
+        env = {
+            'timer_name': 'tea',
+            'start_time': '60',
+            'stopped_label': 'timer: ',
+            'output_sinks': f'plain:{plain},tmux:{tmux}',
+        }
+
+        timer.run(env, clock=lambda: 1000)
+
+        with open(plain) as f:
+            self.assertEqual('timer: 1m\n', f.read())
+        with open(tmux) as f:
+            self.assertEqual('timer: 1m\n', f.read())
+
+    def test_fifo_without_reader(self):
+        path = os.path.join(self.dir, 'timer.fifo')
+        os.mkfifo(path)
+
+        # must neither block nor fail.
+        renderers.fan_out((renderers.Sink('plain', path),), SERIALIZED)
+
+    def test_fifo(self):
+        path = os.path.join(self.dir, 'timer.fifo')
+        os.mkfifo(path)
+        reader = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        self.addCleanup(os.close, reader)
+
+        renderers.fan_out((renderers.Sink('plain', path),), SERIALIZED)
+        renderers.fan_out((renderers.Sink('plain', path),), ERROR)
+
+        self.assertEqual(b'timer: -1m & #1\nbad(3.0)\n', os.read(reader, 1024))
+
+    def test_unwritable_sink(self):
+        sink = renderers.Sink('plain', os.path.join(self.dir, 'missing', 'x'))
+
+        renderers.fan_out((sink,), SERIALIZED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,291 @@
+"""Long-running mode for `interval=persist` blockets.
+
+The timer stays resident: it prints one JSON line per tick and reads the
+clicks i3blocks writes to its stdin, so the state lives in memory instead
+of round-tripping through the environment.
+
+Configuration comes from the environment plus, optionally, a
+`config_file` made of `key=value` lines. Sending SIGHUP or modifying
+`config_file` reloads the configuration fields without touching the
+running timer.
+"""
+from collections.abc import Mapping
+import dataclasses
+import json
+import logging
+import os
+import select
+import signal
+import sys
+import time
+from typing import Callable, Sequence
+
+import commands
+import exceptions
+import logging_settings
+import state as state_lib
+import state_mutations
+import timer
+import zones
+
+
+def read_config_file(path: str) -> dict[str, str]:
+    """Parses `key=value` lines. Blank lines and `#` comments are skipped."""
+    config = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            key, sep, value = line.partition('=')
+            if not sep:
+                raise exceptions.BadValue(f"bad config line '{line}'")
+            config[key.strip()] = value.strip()
+    return config
+
+
+def parse_click(line: str) -> state_lib.Button:
+    """Parses a click line written by i3blocks.
+
+    Unknown buttons and malformed lines map to `Button.NONE`.
+    """
+    line = line.strip()
+    try:
+        click = json.loads(line)
+        raw = click.get('button') if isinstance(click, dict) else click
+        return state_lib.Button(str(raw))
+    except ValueError:
+        logging.warning(f'ignoring click {line!r}')
+        return state_lib.Button.NONE
+
+
+def click_position(line: str) -> float | None:
+    """Where a click line landed, as a fraction of the block's width."""
+    try:
+        click = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(click, dict):
+        return None
+    return zones.position(click.get('relative_x'), click.get('width'))
+
+
+class Resident:
+    def __init__(
+        self,
+        environ: Mapping[str, str],
+        clock: Callable[[], float] = state_lib.now,
+    ):
+        self.environ = dict(environ)
+        self.clock = clock
+        self.config_file = self.environ.get('config_file')
+        self.reload_requested = False
+        self._config_mtime = self._read_config_mtime()
+        # alarms launched, to reap once they exit: one-shot invocations
+        # leave them to init, but a resident timer would pile up zombies.
+        self._launched = []
+        state = state_lib.load_state(self._config(), clock())
+        callers = dataclasses.replace(
+            state_mutations._callers(state), call_alarm=self._launch
+        )
+        self.state = dataclasses.replace(state, callers=callers)
+
+    def _read_config_mtime(self) -> float | None:
+        if not self.config_file:
+            return None
+        try:
+            return os.stat(self.config_file).st_mtime
+        except OSError:
+            return None
+
+    def _config(self) -> dict[str, str]:
+        config = dict(self.environ)
+        if self.config_file:
+            config.update(read_config_file(self.config_file))
+        return config
+
+    def reload(self):
+        """Re-reads the configuration, keeping it unchanged if invalid."""
+        self.reload_requested = False
+        self._config_mtime = self._read_config_mtime()
+        try:
+            self.state = state_lib.reload_config(self.state, self._config())
+        except Exception as e:
+            logging.exception(e)
+            self.state = state_mutations.add_error(self.state, e, self.clock())
+
+    def maybe_reload(self):
+        if self.reload_requested or self._config_mtime != self._read_config_mtime():
+            self.reload()
+
+    def _launch(self, command: str | list[str]):
+        self._launched.append(commands.launch(command))
+
+    def step(self, button: state_lib.Button) -> dict:
+        self.maybe_reload()
+        self._launched = commands.reap(self._launched)
+        state = dataclasses.replace(self.state, new_timestamp=self.clock())
+        self.state, serialized = timer.step(state, button, self.clock)
+        return serialized
+
+    def step_clicks(
+        self,
+        buttons: Sequence[state_lib.Button],
+        positions: Sequence[float | None] | None = None,
+    ) -> dict:
+        self.maybe_reload()
+        self._launched = commands.reap(self._launched)
+        state = dataclasses.replace(self.state, new_timestamp=self.clock())
+        self.state, serialized = timer.step_clicks(
+            state, buttons, self.clock, positions
+        )
+        return serialized
+
+    def is_active(self) -> bool:
+        """Whether the output changes between ticks."""
+        return (
+            self.state.timer_state == state_lib.TimerState.RUNNING
+            or self.state.error_duration is not None
+        )
+
+    def run(self, stdin_fd: int, write: Callable[[str], None]):
+        """Ticks and applies clicks as they come.
+
+        Ticks happen up to `refresh_rate` times per second while the timer is
+        running (see `FramePacer`) and once per second otherwise. Clicks
+        arriving within `click_window` seconds (default: 0.05) of each other
+        are applied and rendered together.
+
+        Returns once stdin is closed.
+        """
+        click_window = state_lib.get_float(self.environ, 'click_window', 0.05)
+        pacer = FramePacer(
+            max_rate=state_lib.get_float(self.environ, 'refresh_rate', 1.0),
+            budget=state_lib.get_float_or_none(self.environ, 'frame_budget'),
+        )
+
+        def _request_reload(signum, frame):
+            self.reload_requested = True
+
+        def _tick():
+            cpu_start = time.process_time()
+            write(json.dumps(self.step(state_lib.Button.NONE)))
+            pacer.frame_done(time.process_time() - cpu_start)
+
+        signal.signal(signal.SIGHUP, _request_reload)
+        _tick()
+        next_tick = time.monotonic() + pacer.interval(self.is_active())
+        clicks = ClickReader(stdin_fd)
+        while True:
+            timeout = max(next_tick - time.monotonic(), 0)
+            ready, _, _ = select.select([stdin_fd], [], [], timeout)
+            if ready:
+                burst = clicks.read_clicks()
+                if burst is None:
+                    return
+                # wait for the rest of a burst before rendering, but never
+                # past the next tick.
+                while (
+                    time.monotonic() < next_tick
+                    and select.select([stdin_fd], [], [], click_window)[0]
+                ):
+                    more = clicks.read_clicks()
+                    if more is None:
+                        break
+                    burst.extend(more)
+                if burst:
+                    buttons, positions = zip(*burst)
+                    write(json.dumps(self.step_clicks(buttons, positions)))
+                    # e.g. a paused timer that was just resumed.
+                    interval = pacer.interval(self.is_active())
+                    next_tick = min(next_tick, time.monotonic() + interval)
+                continue
+            _tick()
+            next_tick = max(
+                next_tick + pacer.interval(self.is_active()), time.monotonic()
+            )
+
+
+# Reports the frame rate achieved by the long-running mode, about once per
+# second.
+_FRAME_RATE_HOOK = lambda rate: logging.debug(f'{rate:.1f} frames/s')
+
+
+class FramePacer:
+    """Picks the time between frames of the long-running mode.
+
+    Runs at `max_rate` frames per second while the timer is active and at 1
+    frame per second otherwise. The rate is halved whenever a frame takes
+    more than `budget` CPU seconds (default: half a frame at `max_rate`) and
+    doubled back after a second of frames within budget.
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        budget: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_rate <= 0:
+            raise exceptions.BadValue(f"refresh_rate='{max_rate}' not positive")
+        self.max_rate = max_rate
+        self.budget = budget if budget is not None else 0.5 / max_rate
+        self.rate = max_rate
+        self.clock = clock
+        self._frames_within_budget = 0
+        self._report_start = clock()
+        self._report_frames = 0
+
+    def interval(self, active: bool) -> float:
+        return 1 / (self.rate if active else min(self.max_rate, 1.0))
+
+    def frame_done(self, cpu_seconds: float):
+        if cpu_seconds > self.budget:
+            self.rate = max(self.rate / 2, min(self.max_rate, 1.0))
+            self._frames_within_budget = 0
+        else:
+            self._frames_within_budget += 1
+            if self._frames_within_budget >= self.rate and self.rate < self.max_rate:
+                self.rate = min(self.rate * 2, self.max_rate)
+                self._frames_within_budget = 0
+
+        self._report_frames += 1
+        now = self.clock()
+        if now - self._report_start >= 1:
+            _FRAME_RATE_HOOK(self._report_frames / (now - self._report_start))
+            self._report_start = now
+            self._report_frames = 0
+
+
+class ClickReader:
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.pending = b''
+
+    def read_clicks(self) -> list[tuple[state_lib.Button, float | None]] | None:
+        """Reads the clicks available in `fd`, along with where each landed.
+
+        Returns None once `fd` is closed.
+        """
+        chunk = os.read(self.fd, 4096)
+        if not chunk:
+            return None
+        *lines, self.pending = (self.pending + chunk).split(b'\n')
+        clicks = []
+        for line in lines:
+            line = line.decode('utf-8', 'replace')
+            button = parse_click(line)
+            if button != state_lib.Button.NONE:
+                clicks.append((button, click_position(line)))
+        return clicks
+
+
+def main(environ: Mapping[str, str]):
+    log_file = environ.get('log_file')
+    if log_file:
+        logging_settings.log_to_file(log_file)
+
+    def _write(line: str):
+        print(line, flush=True)
+
+    Resident(environ).run(sys.stdin.fileno(), _write)
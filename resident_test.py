@@ -0,0 +1,197 @@
+import os
+import subprocess
+import time
+import unittest
+
+import colors
+import commands
+import exceptions
+import resident
+import state
+import testing
+
+
+class ResidentTest(unittest.TestCase):
+    def setUp(self):
+        self.config_file = os.path.join(testing.temp_dir(self), 'timer.conf')
+        self._write_config('text_format={remaining_time:clock}\nincrements=60\n')
+        self.clock = testing.FakeClock()
+        self.resident = resident.Resident(
+            {'config_file': self.config_file, 'start_time': '300'}, self.clock
+        )
+
+    def _write_config(self, text: str, mtime: float | None = None):
+        with open(self.config_file, 'w') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(self.config_file, (mtime, mtime))
+
+    def _run_for(self, seconds: float):
+        self.resident.step(state.Button.LEFT)
+        self.resident.step(state.Button.NONE)
+        self.clock.now += seconds
+        return self.resident.step(state.Button.NONE)
+
+    def test_read_config_file(self):
+        self._write_config('# comment\n\ntimer_name = tea \ncolorize=colorful\n')
+
+        config = resident.read_config_file(self.config_file)
+
+        self.assertEqual({'timer_name': 'tea', 'colorize': 'colorful'}, config)
+
+    def test_read_bad_config_file(self):
+        self._write_config('not a key value pair\n')
+
+        with self.assertRaises(exceptions.BadValue):
+            resident.read_config_file(self.config_file)
+
+    def test_parse_click(self):
+        self.assertEqual(
+            state.Button.LEFT, resident.parse_click('{"button": 1, "x": 3}')
+        )
+        self.assertEqual(state.Button.SCROLL_UP, resident.parse_click('4'))
+        self.assertEqual(state.Button.NONE, resident.parse_click('{"button": 7}'))
+        self.assertEqual(state.Button.NONE, resident.parse_click('garbage'))
+
+    def test_click_reader(self):
+        read_fd, write_fd = os.pipe()
+        reader = resident.ClickReader(read_fd)
+
+        os.write(write_fd, b'{"button": 4}\n{"button": 7}\n{"butt')
+        self.assertEqual([(state.Button.SCROLL_UP, None)], reader.read_clicks())
+        os.write(write_fd, b'on": 5}\n')
+        self.assertEqual([(state.Button.SCROLL_DOWN, None)], reader.read_clicks())
+        os.close(write_fd)
+        self.assertIsNone(reader.read_clicks())
+        os.close(read_fd)
+
+    def test_step_clicks_renders_once(self):
+        serialized = self.resident.step_clicks(
+            [state.Button.SCROLL_UP] * 10 + [state.Button.LEFT] * 3
+        )
+
+        self.assertEqual('15:00', serialized['full_text'])
+        self.assertEqual('running', serialized['timer_state'])
+
+    def test_ticks_keep_state_in_memory(self):
+        serialized = self._run_for(30)
+
+        self.assertEqual('04:30', serialized['full_text'])
+        self.assertEqual(state.TimerState.RUNNING, self.resident.state.timer_state)
+
+    def test_reload_keeps_runtime_fields(self):
+        self._run_for(30)
+
+        self.resident.reload_requested = True
+        self._write_config('text_format={remaining_time:pretty}\ncolorize=colorful\n')
+        serialized = self.resident.step(state.Button.NONE)
+
+        self.assertEqual(30, self.resident.state.elapsed_time)
+        self.assertEqual(state.TimerState.RUNNING, self.resident.state.timer_state)
+        self.assertEqual(colors.ColorOption.COLORFUL, self.resident.state.color_option)
+        self.assertEqual('{remaining_time:pretty}', self.resident.state.text_format)
+        self.assertIn('4', serialized['full_text'])
+
+    def test_reload_on_config_file_change(self):
+        self._write_config('timer_name=tea\n', mtime=12345)
+
+        self.resident.step(state.Button.NONE)
+
+        self.assertEqual('tea', self.resident.state.timer_name)
+
+    def test_invalid_reload_keeps_old_config(self):
+        self._run_for(30)
+
+        self._write_config('increments=many\n', mtime=12345)
+        self.resident.step(state.Button.NONE)
+
+        self.assertEqual(60, self.resident.state.increments)
+        self.assertEqual('{remaining_time:clock}', self.resident.state.text_format)
+        self.assertEqual(30, self.resident.state.elapsed_time)
+        self.assertIn('increments', self.resident.state.error_message)
+
+    def test_ticks_reap_finished_alarms(self):
+        self._write_config('alarm_command=true\nstart_time=1\n')
+        self.resident.reload()
+        self._run_for(2)
+        (alarm,) = self.resident._launched
+        alarm.wait()
+
+        self.resident.step(state.Button.NONE)
+
+        self.assertEqual([], self.resident._launched)
+
+    def test_clicks_reap_finished_alarms(self):
+        pid = commands.spawn(['true'])
+        self.resident._launched.append(pid)
+        # leave it time to exit and become a zombie.
+        time.sleep(0.1)
+
+        self.resident.step_clicks([state.Button.LEFT])
+
+        self.assertEqual([], self.resident._launched)
+        with self.assertRaises(ChildProcessError):
+            os.waitpid(pid, os.WNOHANG)
+
+    def test_other_children_are_left_alone(self):
+        # e.g. a hook worker, waited for through its Popen handle.
+        other = subprocess.Popen(['true'])
+        self.addCleanup(other.wait)
+        time.sleep(0.1)
+
+        self.resident.step(state.Button.NONE)
+
+        self.assertEqual(0, other.wait(timeout=1))
+
+
+class FramePacerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = testing.FakeClock()
+        self.rates = []
+        self.hook = resident._FRAME_RATE_HOOK
+        resident._FRAME_RATE_HOOK = self.rates.append
+
+    def tearDown(self):
+        resident._FRAME_RATE_HOOK = self.hook
+
+    def _frames(self, pacer, count, cpu_seconds):
+        for _ in range(count):
+            self.clock.now += pacer.interval(active=True)
+            pacer.frame_done(cpu_seconds)
+
+    def test_idle_timers_refresh_once_per_second(self):
+        pacer = resident.FramePacer(max_rate=20, clock=self.clock)
+
+        self.assertEqual(1 / 20, pacer.interval(active=True))
+        self.assertEqual(1, pacer.interval(active=False))
+
+    def test_rate_drops_over_budget_and_recovers(self):
+        pacer = resident.FramePacer(max_rate=20, budget=0.01, clock=self.clock)
+
+        self._frames(pacer, 1, cpu_seconds=0.02)
+        self.assertEqual(10, pacer.rate)
+        self._frames(pacer, 4, cpu_seconds=0.02)
+        self.assertEqual(1, pacer.rate)
+
+        self._frames(pacer, 1, cpu_seconds=0.001)
+        self.assertEqual(2, pacer.rate)
+        self._frames(pacer, 2 + 4 + 8, cpu_seconds=0.001)
+        self.assertEqual(16, pacer.rate)
+        self._frames(pacer, 16, cpu_seconds=0.001)
+        self.assertEqual(20, pacer.rate)
+
+    def test_reports_achieved_frame_rate(self):
+        pacer = resident.FramePacer(max_rate=10, clock=self.clock)
+
+        self._frames(pacer, 25, cpu_seconds=0)
+
+        self.assertEqual(2, len(self.rates))
+        self.assertAlmostEqual(10, self.rates[0])
+
+    def test_bad_rate(self):
+        with self.assertRaises(exceptions.BadValue):
+            resident.FramePacer(max_rate=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
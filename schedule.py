@@ -0,0 +1,144 @@
+"""Recurring wall-clock timers.
+
+A schedule is a list of rules, in `schedule` (separated by `;`) or one per
+line in `schedule_file`, like
+
+    every weekday 10:00 start standup 15m
+    every hour :50 start break 5m
+    every mon,thu 17:30 start review 30m
+
+i.e. `every <days or hour> <time of day or :minute> [start] <preset>`,
+where the preset is a timer name and time as in a preset catalog. When a
+rule fires, the timer is set and started as if the preset had been typed
+at the middle click input and the timer then left clicked.
+
+Only the next fire time round-trips through the state, so a tick compares
+a single timestamp whatever the number of rules. Rules are parsed, and
+their next occurrences pushed to a min-heap, only when one is due.
+"""
+import dataclasses
+import datetime
+import functools
+import heapq
+import os
+
+import exceptions
+import presets
+
+# occurrences missed by more than this (e.g. while suspended) are skipped.
+MISSED_GRACE = 300.0
+
+_DAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+_DAY_SETS = {
+    'day': frozenset(range(7)),
+    'weekday': frozenset(range(5)),
+    'weekend': frozenset((5, 6)),
+}
+
+
+@dataclasses.dataclass(frozen=True)
+class Rule:
+    text: str
+    # weekdays (0 is Monday) to fire on. None fires every hour.
+    days: frozenset[int] | None
+    hour: int
+    minute: int
+    batch: presets.Batch
+
+    def next_after(self, timestamp: float) -> float:
+        """The first occurrence strictly after `timestamp`, in local time."""
+        # naive datetimes are interpreted in local time, DST included.
+        now = datetime.datetime.fromtimestamp(timestamp)
+        if self.days is None:
+            candidate = now.replace(minute=self.minute, second=0, microsecond=0)
+            if candidate.timestamp() <= timestamp:
+                candidate += datetime.timedelta(hours=1)
+            return candidate.timestamp()
+        candidate = now.replace(
+            hour=self.hour, minute=self.minute, second=0, microsecond=0
+        )
+        # at most a week ahead, since rules fire on at least one weekday.
+        for _ in range(8):
+            if candidate.weekday() in self.days and candidate.timestamp() > timestamp:
+                return candidate.timestamp()
+            candidate += datetime.timedelta(days=1)
+        raise AssertionError(self.text)
+
+
+def _parse_days(text: str) -> frozenset[int] | None:
+    text = text.lower().rstrip('s')
+    if text == 'hour':
+        return None
+    if text in _DAY_SETS:
+        return _DAY_SETS[text]
+    return frozenset(_DAY_NAMES.index(day[:3]) for day in text.split(','))
+
+
+def parse_rule(text: str) -> Rule:
+    try:
+        every, days, at, *preset = text.split()
+        if every != 'every':
+            raise ValueError(text)
+        if preset and preset[0] == 'start':
+            preset = preset[1:]
+        days = _parse_days(days)
+        hour, _, minute = at.partition(':')
+        if (days is None) != (hour == ''):
+            # hourly rules take a minute only, the rest a time of day.
+            raise ValueError(text)
+        hour = int(hour or 0)
+        minute = int(minute)
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(text)
+        batch = presets.parse_preset(' '.join(preset))
+    except (ValueError, exceptions.BadValue):
+        raise exceptions.BadValue(f"bad schedule rule '{text}'")
+    return Rule(text, days, hour, minute, batch)
+
+
+@functools.lru_cache(maxsize=8)
+def parse_schedule(text: str) -> tuple[Rule, ...]:
+    rules = []
+    for line in text.replace(';', '\n').splitlines():
+        line = line.strip()
+        if line and not line.startswith('#'):
+            rules.append(parse_rule(line))
+    return tuple(rules)
+
+
+def stamp(path: str | None) -> str | None:
+    """Identifies the version of a schedule file, to notice it changed."""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f'{stat.st_mtime_ns}:{stat.st_size}'
+
+
+def load_rules(inline: str | None, path: str | None) -> tuple[Rule, ...]:
+    text = inline or ''
+    if path:
+        with open(path, encoding='utf-8') as f:
+            text += '\n' + f.read()
+    return parse_schedule(text)
+
+
+def next_fire(rules: tuple[Rule, ...], after: float) -> float | None:
+    return min((rule.next_after(after) for rule in rules), default=None)
+
+
+def due(
+    rules: tuple[Rule, ...], since: float, now: float
+) -> tuple[list[tuple[float, Rule]], float | None]:
+    """Occurrences in (since, now], in order, and the next one after `now`."""
+    heap = [(rule.next_after(since), index) for index, rule in enumerate(rules)]
+    heapq.heapify(heap)
+    fired = []
+    while heap and heap[0][0] <= now:
+        fire_at, index = heapq.heappop(heap)
+        fired.append((fire_at, rules[index]))
+        # occurrences of the same rule also due by `now` are not repeated.
+        heapq.heappush(heap, (rules[index].next_after(now), index))
+    return fired, heap[0][0] if heap else None
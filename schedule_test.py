@@ -0,0 +1,180 @@
+import datetime
+import os
+import time
+import unittest
+from unittest import mock
+
+import exceptions
+import failures
+import input_parser
+import schedule
+import testing
+import timer
+
+
+def at(*args) -> float:
+    return datetime.datetime(*args).timestamp()
+
+
+class ScheduleTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {'TZ': 'UTC'})
+        patcher.start()
+        self.addCleanup(time.tzset)
+        self.addCleanup(patcher.stop)
+        time.tzset()
+
+    def test_parse_rule(self):
+        rule = schedule.parse_rule('every weekday 10:00 start standup 15m')
+
+        self.assertEqual(frozenset(range(5)), rule.days)
+        self.assertEqual((10, 0), (rule.hour, rule.minute))
+        self.assertEqual(
+            (
+                (
+                    input_parser.InputType.SET_GENERIC_FREE_TEXT_PROPERTY,
+                    ['timer_name', 'standup'],
+                ),
+                (input_parser.InputType.TIME_SET, [900]),
+            ),
+            rule.batch,
+        )
+        self.assertIsNone(schedule.parse_rule('every hour :50 break 5m').days)
+        self.assertEqual(
+            frozenset((0, 3)), schedule.parse_rule('every mon,thu 17:30 1h').days
+        )
+
+    def test_bad_rules(self):
+        for text in (
+            'each day 10:00 standup 15m',
+            'every day :50 standup 15m',
+            'every hour 10:50 standup 15m',
+            'every someday 10:00 standup 15m',
+            'every day 25:00 standup 15m',
+            'every day 10:00 standup +15m',
+            'every day',
+        ):
+            with self.subTest(text=text), self.assertRaises(exceptions.BadValue):
+                schedule.parse_rule(text)
+
+    def test_next_after(self):
+        # 2026-10-19 is a Monday.
+        weekday = schedule.parse_rule('every weekday 10:00 standup 15m')
+        self.assertEqual(
+            at(2026, 10, 19, 10), weekday.next_after(at(2026, 10, 19, 9, 59))
+        )
+        self.assertEqual(at(2026, 10, 20, 10), weekday.next_after(at(2026, 10, 19, 10)))
+        self.assertEqual(at(2026, 10, 26, 10), weekday.next_after(at(2026, 10, 23, 11)))
+
+        hourly = schedule.parse_rule('every hour :50 break 5m')
+        self.assertEqual(
+            at(2026, 10, 19, 9, 50), hourly.next_after(at(2026, 10, 19, 9, 10))
+        )
+        self.assertEqual(
+            at(2026, 10, 19, 10, 50), hourly.next_after(at(2026, 10, 19, 9, 50))
+        )
+
+    def test_due(self):
+        rules = schedule.parse_schedule(
+            'every hour :50 break 5m; every day 10:00 standup 15m'
+        )
+
+        fired, next_fire = schedule.due(
+            rules, at(2026, 10, 19, 9, 49), at(2026, 10, 19, 9, 51)
+        )
+        self.assertEqual([(at(2026, 10, 19, 9, 50), rules[0])], fired)
+        self.assertEqual(at(2026, 10, 19, 10), next_fire)
+
+        # occurrences skipped over fire once each, in order.
+        fired, next_fire = schedule.due(
+            rules, at(2026, 10, 19, 9, 49), at(2026, 10, 19, 12)
+        )
+        self.assertEqual([rules[0], rules[1]], [rule for _, rule in fired])
+        self.assertEqual(at(2026, 10, 19, 12, 50), next_fire)
+
+    def test_ticks_start_scheduled_timers(self):
+        env = {'schedule': 'every hour :50 start break 5m; every day 10:00 standup 15m'}
+
+        output = timer.run(env, clock=lambda: at(2026, 10, 19, 9, 49, 59))
+        self.assertEqual('stopped', output['timer_state'])
+        self.assertEqual(str(at(2026, 10, 19, 9, 50)), output['schedule_next'])
+
+        output = timer.run({**env, **output}, clock=lambda: at(2026, 10, 19, 9, 50, 1))
+        self.assertEqual('running', output['timer_state'])
+        self.assertEqual('break', output['timer_name'])
+        self.assertEqual(300, output['start_time'])
+        self.assertEqual('1.0', output['elapsed_time'])
+        self.assertEqual(str(at(2026, 10, 19, 10)), output['schedule_next'])
+
+    def test_missed_occurrences_are_skipped(self):
+        env = {
+            'schedule': 'every hour :50 break 5m',
+            'old_timestamp': str(at(2026, 10, 19, 9, 49)),
+            'schedule_next': str(at(2026, 10, 19, 9, 50)),
+        }
+
+        # e.g. resumed from suspend.
+        output = timer.run(env, clock=lambda: at(2026, 10, 19, 10, 30))
+
+        self.assertEqual('stopped', output['timer_state'])
+        self.assertEqual(str(at(2026, 10, 19, 10, 50)), output['schedule_next'])
+
+    def test_invalid_schedules_back_off(self):
+        env = {
+            'schedule': 'every hour :50 brake',
+            'timer_state': 'running',
+            'start_time': '300',
+            'elapsed_time': '0',
+            'old_timestamp': '1000',
+        }
+        key = failures.hash_key('every hour :50 brake')
+
+        output = timer.run(env, clock=lambda: 1001)
+        # reported, without failing the tick.
+        self.assertEqual(
+            "bad schedule rule 'every hour :50 brake'", output['error_message']
+        )
+        self.assertEqual('5', output['error_duration'])
+        self.assertEqual('1.0', output['elapsed_time'])
+        self.assertEqual(1, failures.decode(output['failures']).entries[key].count)
+
+        for now in (1002, 1006):
+            output = timer.run({**env, **output}, clock=lambda: now)
+        self.assertEqual('6.0', output['elapsed_time'])
+        # retried once, after the backoff.
+        self.assertEqual(2, failures.decode(output['failures']).entries[key].count)
+
+    def test_schedule_file_fixes_are_retried_at_once(self):
+        path = os.path.join(testing.temp_dir(self), 'schedule.txt')
+        with open(path, 'w') as f:
+            f.write('every hour :50\n')
+        env = {'schedule_file': path}
+        output = timer.run(env, clock=lambda: at(2026, 10, 19, 9))
+        self.assertIn('failures', output)
+
+        with open(path, 'w') as f:
+            f.write('every hour :50 break 5m\n')
+        os.utime(path, ns=(0, 0))
+        output = timer.run({**env, **output}, clock=lambda: at(2026, 10, 19, 9, 0, 1))
+
+        self.assertNotIn('failures', output)
+        self.assertEqual(str(at(2026, 10, 19, 9, 50)), output['schedule_next'])
+
+    def test_schedule_file_changes_are_noticed(self):
+        path = os.path.join(testing.temp_dir(self), 'schedule.txt')
+        with open(path, 'w') as f:
+            f.write('every hour :50 break 5m\n')
+        env = {'schedule_file': path}
+        output = timer.run(env, clock=lambda: at(2026, 10, 19, 9))
+
+        with open(path, 'w') as f:
+            f.write('# now every half hour\nevery hour :30 break 5m\n')
+        os.utime(path, ns=(0, 0))
+        output = timer.run({**env, **output}, clock=lambda: at(2026, 10, 19, 9, 1))
+
+        self.assertEqual(str(at(2026, 10, 19, 9, 30)), output['schedule_next'])
+        self.assertEqual(schedule.stamp(path), output['schedule_stamp'])
+
+
+if __name__ == '__main__':
+    unittest.main()
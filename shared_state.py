@@ -0,0 +1,93 @@
+"""One timer shared by several blockets (e.g. one bar per monitor).
+
+With `shared_state=true`, every blocket with the same `timer_name` reads
+and writes a single state file under an `fcntl` lock. The first blocket to
+tick in each `shared_tick_window` (default: 0.9s) computes the new state;
+the others print the output it stored without recomputing. Clicks from any
+blocket are applied to the shared state.
+"""
+from collections.abc import Mapping
+import json
+import logging
+import os
+import urllib.parse
+from typing import Any, Callable
+
+import files
+import state as state_lib
+
+Runner = Callable[[Mapping[str, str], Callable[[], float]], dict[str, Any]]
+
+
+def state_dir(mapping: Mapping[str, str]) -> str:
+    path = mapping.get('shared_state_dir')
+    if path:
+        return path
+    runtime_dir = mapping.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(runtime_dir, f'i3blocks-timer-{os.getuid()}')
+
+
+def state_path(mapping: Mapping[str, str]) -> str:
+    name = urllib.parse.quote(mapping.get('timer_name', 'timer'), safe='')
+    return os.path.join(state_dir(mapping), f'{name}.json')
+
+
+def read(path: str) -> dict[str, Any]:
+    """Reads a shared state file, empty if missing or unreadable."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            stored = json.loads(f.read() or '{}')
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        # e.g. written by a version that did not replace it atomically.
+        logging.warning(f'ignoring corrupt shared state {path}: {e}')
+        return {}
+    if stored == {}:
+        return stored
+    if not _is_valid(stored):
+        logging.warning(f'ignoring corrupt shared state {path}')
+        return {}
+    return stored
+
+
+def _is_valid(stored: Any) -> bool:
+    if not isinstance(stored, dict):
+        return False
+    tick = stored.get('tick')
+    return (
+        isinstance(tick, (int, float))
+        and not isinstance(tick, bool)
+        and isinstance(stored.get('output'), dict)
+    )
+
+
+def write(path: str, tick: float, output: Mapping[str, Any]):
+    """Replaces a shared state file; hold its lock."""
+    files.write_atomically(path, json.dumps({'tick': tick, 'output': output}))
+
+
+def run(
+    mapping: Mapping[str, str],
+    clock: Callable[[], float] = state_lib.now,
+    *,
+    runner: Runner,
+) -> dict[str, Any]:
+    """Runs `runner` over the shared state of the timer in `mapping`."""
+    window = state_lib.get_float(mapping, 'shared_tick_window', 0.9)
+    path = state_path(mapping)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with files.locked(path):
+        stored = read(path)
+        now = clock()
+        is_tick = not mapping.get('button')
+        if is_tick and stored and 0 <= now - stored['tick'] < window:
+            return stored['output']
+
+        # just like i3blocks, the last output overrides the environment.
+        merged = {**mapping, **stored.get('output', {})}
+        if 'button' in mapping:
+            merged['button'] = mapping['button']
+        output = runner(merged, clock)
+        write(path, now, output)
+    return output
@@ -0,0 +1,101 @@
+import os
+import unittest
+
+import shared_state
+import testing
+import timer
+
+
+class SharedStateTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = testing.FakeClock(1000)
+        self.calls = 0
+        self.mapping = {
+            'shared_state_dir': testing.temp_dir(self),
+            'timer_name': 'tea/time',
+            'start_time': '300',
+        }
+
+    def _runner(self, mapping, clock):
+        self.calls += 1
+        return timer.run(mapping, clock)
+
+    def _run(self, **extra):
+        return shared_state.run(
+            {**self.mapping, **extra}, self.clock, runner=self._runner
+        )
+
+    def test_state_path_is_keyed_by_timer_name(self):
+        path = shared_state.state_path(self.mapping)
+
+        self.assertTrue(path.startswith(self.mapping['shared_state_dir']))
+        self.assertTrue(path.endswith('tea%2Ftime.json'))
+
+    def test_one_computation_per_tick_window(self):
+        first = self._run()
+        self.clock.now += 0.3
+        second = self._run()
+
+        self.assertEqual(1, self.calls)
+        self.assertEqual(first, second)
+
+        self.clock.now += 1
+        self._run()
+        self.assertEqual(2, self.calls)
+
+    def test_clicks_apply_to_the_shared_state(self):
+        self._run()
+        # a click from another bar.
+        self._run(button='1')
+        self.clock.now += 1
+        self._run()
+        self.clock.now += 10
+        # the other bar's own environment is stale, the shared state is not.
+        output = self._run(timer_state='stopped', elapsed_time='0')
+
+        self.assertEqual('running', output['timer_state'])
+        self.assertEqual(11.0, float(output['elapsed_time']))
+        stored = shared_state.read(shared_state.state_path(self.mapping))
+        self.assertEqual(output, stored['output'])
+
+    def test_recomputes_over_a_corrupt_state(self):
+        path = shared_state.state_path(self.mapping)
+        for calls, corrupt in enumerate(
+            (
+                # e.g. cut short by a full disk.
+                '{"tick": 10',
+                '[]',
+                '{"output": {}}',
+                '{"tick": "10", "output": {}}',
+                '{"tick": 10, "output": "stopped"}',
+            ),
+            start=1,
+        ):
+            with self.subTest(corrupt=corrupt):
+                self._run()
+                with open(path, 'w') as f:
+                    f.write(corrupt)
+                self.clock.now += 0.3
+
+                with self.assertLogs(level='WARNING'):
+                    output = self._run()
+                self.assertEqual(2 * calls, self.calls)
+                self.assertEqual(output, shared_state.read(path)['output'])
+                self.clock.now += 1
+
+    def test_writes_replace_the_state_file(self):
+        path = shared_state.state_path(self.mapping)
+        self._run()
+        inode = os.stat(path).st_ino
+        self.clock.now += 1
+        self._run()
+
+        self.assertNotEqual(inode, os.stat(path).st_ino)
+        self.assertEqual(
+            ['tea%2Ftime.json', 'tea%2Ftime.json.lock'],
+            sorted(os.listdir(self.mapping['shared_state_dir'])),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
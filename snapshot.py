@@ -0,0 +1,324 @@
+"""Snapshots of timer states, to carry them over logouts and machines.
+
+    ./timer.py snapshot [-o timers.snap] [timer_name ...]
+    ./timer.py restore timers.snap
+
+Shared timers (`shared_state=true`) keep their state in files under
+`shared_state_dir`, which usually does not survive a logout. A snapshot
+holds the state of some or all of them; restoring it validates every state
+through `load_state` (rejecting the whole snapshot if any is invalid) and
+writes them back as they were; running timers catch up on the time that
+passed since on the next tick of their blockets. Timers whose state only
+lives in i3blocks can't be reached from outside.
+
+The format is binary and versioned: a fixed header with CRCs of the known
+keys and of the body, then each state as key/value pairs. Known keys are
+a byte, numbers are stored as such and everything else as UTF-8.
+"""
+import argparse
+from collections.abc import Mapping
+import os
+import struct
+import sys
+import urllib.parse
+import zlib
+from typing import Any
+
+import exceptions
+import files
+import shared_state
+import state as state_lib
+
+MAGIC = b'TMRS'
+VERSION = 2
+# magic, version, flags, timers, taken at, CRC-32 of the keys and the body.
+_HEADER = struct.Struct('<4sBBHdII')
+
+# keys by index. A checksum of them is in the header: snapshots only
+# restore where the timer has the same keys.
+KEYS = state_lib.CONFIG_KEYS + state_lib.RUNTIME_KEYS
+_KEYS_CRC = zlib.crc32('\n'.join(KEYS).encode('utf-8'))
+_KEY_INDEXES = {key: index for index, key in enumerate(KEYS)}
+
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+# numbers that were strings (as in i3blocks' environment) and are again.
+_INT_STR = 6
+_FLOAT_STR = 7
+
+_DOUBLE = struct.Struct('<d')
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, position: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _write_str(out: bytearray, text: str):
+    encoded = text.encode('utf-8')
+    _write_varint(out, len(encoded))
+    out += encoded
+
+
+def _read_str(data: bytes, position: int) -> tuple[str, int]:
+    length, position = _read_varint(data, position)
+    end = position + length
+    if end > len(data):
+        raise IndexError(end)
+    return data[position:end].decode('utf-8'), end
+
+
+def _write_int(out: bytearray, tag: int, value: int):
+    out.append(tag)
+    # zigzag, for negative numbers.
+    _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _write_value(out: bytearray, value: Any):
+    if value is None:
+        out.append(_NONE)
+    elif value is True or value is False:
+        out.append(_TRUE if value else _FALSE)
+    elif isinstance(value, int):
+        _write_int(out, _INT, value)
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    else:
+        value = str(value)
+        if value.lstrip('-').isdigit() and str(int(value)) == value:
+            _write_int(out, _INT_STR, int(value))
+            return
+        try:
+            number = float(value)
+        except ValueError:
+            number = None
+        if number is not None and str(number) == value:
+            out.append(_FLOAT_STR)
+            out += _DOUBLE.pack(number)
+            return
+        out.append(_STR)
+        _write_str(out, value)
+
+
+def _read_value(data: bytes, position: int) -> tuple[Any, int]:
+    tag = data[position]
+    position += 1
+    if tag == _NONE:
+        return None, position
+    if tag in (_FALSE, _TRUE):
+        return tag == _TRUE, position
+    if tag in (_INT, _INT_STR):
+        zigzag, position = _read_varint(data, position)
+        value = zigzag // 2 if zigzag % 2 == 0 else -(zigzag + 1) // 2
+        return (value if tag == _INT else str(value)), position
+    if tag in (_FLOAT, _FLOAT_STR):
+        (value,) = _DOUBLE.unpack_from(data, position)
+        return (value if tag == _FLOAT else str(value)), position + 8
+    if tag == _STR:
+        return _read_str(data, position)
+    raise ValueError(f'unknown tag {tag}')
+
+
+def encode(states: Mapping[str, Mapping[str, Any]], taken_at: float) -> bytes:
+    """Encodes the round-tripped `states` of timers, by timer name."""
+    body = bytearray()
+    for name, mapping in states.items():
+        _write_str(body, name)
+        _write_varint(body, len(mapping))
+        for key, value in mapping.items():
+            index = _KEY_INDEXES.get(key)
+            if index is None:
+                # e.g. `alarm_command_<n>`.
+                body.append(0)
+                _write_str(body, key)
+            else:
+                _write_varint(body, index + 1)
+            _write_value(body, value)
+    header = _HEADER.pack(
+        MAGIC, VERSION, 0, len(states), taken_at, _KEYS_CRC, zlib.crc32(body)
+    )
+    return header + body
+
+
+def decode(data: bytes) -> tuple[float, dict[str, dict[str, Any]]]:
+    """Decodes a snapshot into its time and states.
+
+    Raises:
+        BadValue: if `data` is not a snapshot this version can read, or is
+            corrupt.
+    """
+    if len(data) < _HEADER.size:
+        raise exceptions.BadValue('not a timer snapshot')
+    magic, version, _, count, taken_at, keys_crc, crc = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise exceptions.BadValue('not a timer snapshot')
+    if version != VERSION:
+        raise exceptions.BadValue(f'unsupported snapshot version {version}')
+    if keys_crc != _KEYS_CRC:
+        raise exceptions.BadValue('snapshot taken by another version of the timer')
+    body = data[_HEADER.size :]
+    if zlib.crc32(body) != crc:
+        raise exceptions.BadValue('corrupt timer snapshot')
+    states = {}
+    position = 0
+    try:
+        for _ in range(count):
+            name, position = _read_str(body, position)
+            length, position = _read_varint(body, position)
+            mapping = {}
+            for _ in range(length):
+                index, position = _read_varint(body, position)
+                if index == 0:
+                    key, position = _read_str(body, position)
+                else:
+                    key = KEYS[index - 1]
+                mapping[key], position = _read_value(body, position)
+            states[name] = mapping
+    except (IndexError, ValueError, struct.error, UnicodeDecodeError):
+        raise exceptions.BadValue('corrupt timer snapshot')
+    if position != len(body):
+        raise exceptions.BadValue('corrupt timer snapshot')
+    return taken_at, states
+
+
+def _round_tripped(output: Mapping[str, Any]) -> dict[str, Any]:
+    # what is rendered from the rest (full_text, label...) is left out.
+    keys = set(state_lib.CONFIG_KEYS + state_lib.RUNTIME_KEYS)
+    return {
+        key: value
+        for key, value in output.items()
+        if key in keys or key.startswith('alarm_command_')
+    }
+
+
+def capture(
+    environ: Mapping[str, str], names: list[str] | None = None
+) -> dict[str, dict[str, Any]]:
+    """The states of the shared timers under `environ`'s state directory."""
+    directory = shared_state.state_dir(environ)
+    if names:
+        entries = [
+            f'{urllib.parse.quote(name, safe="")}.json' for name in names
+        ]
+    else:
+        try:
+            entries = sorted(os.listdir(directory))
+        except FileNotFoundError:
+            entries = []
+    states = {}
+    for file in entries:
+        if not file.endswith('.json'):
+            continue
+        path = os.path.join(directory, file)
+        stored = shared_state.read(path)
+        if not stored:
+            if os.path.exists(path):
+                raise exceptions.BadValue(f'corrupt shared timer state {path}')
+            if names:
+                raise exceptions.BadValue(f'no shared timer {file[:-5]}')
+            continue
+        output = _round_tripped(stored['output'])
+        states[output.get('timer_name', urllib.parse.unquote(file[:-5]))] = output
+    return states
+
+
+def validate(mapping: Mapping[str, Any], now: float) -> dict[str, Any]:
+    """Validates a state, rendered as it was when the snapshot was taken.
+
+    Only what blockets round-trip is in a snapshot: the rest of their
+    configuration (e.g. `mode`) is back once i3blocks runs them. Running
+    timers catch up on the time that passed since on the next tick of
+    their blockets, which fire the alarms crossed meanwhile.
+
+    Raises:
+        TimerException: if the state is invalid.
+    """
+    state = state_lib.load_state(mapping, now)
+    # rendering rejects bad formats too.
+    return {**mapping, **state.serializable()}
+
+
+def restore(
+    environ: Mapping[str, str], data: bytes, now: float
+) -> dict[str, dict[str, Any]]:
+    """Writes back the shared timers of a snapshot.
+
+    Nothing is written unless every state in it is valid.
+
+    Returns:
+        The restored outputs, by timer name.
+    """
+    _, states = decode(data)
+    outputs = {}
+    for name, mapping in states.items():
+        try:
+            outputs[name] = validate(mapping, now)
+        except exceptions.TimerException as e:
+            raise exceptions.BadValue(
+                f"invalid timer '{name}' in snapshot: {e.message}"
+            )
+    directory = shared_state.state_dir(environ)
+    os.makedirs(directory, exist_ok=True)
+    for name, output in outputs.items():
+        path = shared_state.state_path({**environ, 'timer_name': name})
+        # blockets of the timer may be ticking meanwhile.
+        with files.locked(path):
+            # not a recent tick: the next one steps the state.
+            shared_state.write(path, 0, output)
+    return outputs
+
+
+def main(argv: list[str], environ: Mapping[str, str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog='timer.py', description=__doc__.splitlines()[0]
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    take = commands.add_parser('snapshot', help='save shared timers')
+    take.add_argument('names', nargs='*', help='timer names (default: all)')
+    take.add_argument('-o', '--output', help='file (default: stdout)')
+    put = commands.add_parser('restore', help='restore shared timers')
+    put.add_argument('input', help="file, or '-' for stdin")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'snapshot':
+            data = encode(capture(environ, args.names), state_lib.now())
+            if args.output:
+                with open(args.output, 'wb') as f:
+                    f.write(data)
+            else:
+                sys.stdout.buffer.write(data)
+            return 0
+        if args.input == '-':
+            data = sys.stdin.buffer.read()
+        else:
+            with open(args.input, 'rb') as f:
+                data = f.read()
+        for name in restore(environ, data, state_lib.now()):
+            print(f'restored {name}')
+    except exceptions.TimerException as e:
+        print(f'timer.py {args.command}: {e.message}', file=sys.stderr)
+        return 1
+    except OSError as e:
+        print(f'timer.py {args.command}: {e}', file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,186 @@
+import fcntl
+import io
+import json
+import os
+import unittest
+from unittest import mock
+
+import exceptions
+import shared_state
+import snapshot
+import state_mutations
+import testing
+import timer
+
+STATES = {
+    'tea': {
+        'timer_name': 'tea',
+        'start_time': 300,
+        'elapsed_time': '12.5',
+        'old_timestamp': '1000.25',
+        'timer_state': 'running',
+        'lap_count': '-3',
+        'text_format': '{remaining_time:clock}',
+        'alarm_command_2': 'notify-send über',
+        'error_duration': None,
+        'metrics_interval': 1.5,
+        'shared': True,
+    },
+    'empty': {},
+}
+
+
+class FormatTest(unittest.TestCase):
+    def test_round_trip(self):
+        data = snapshot.encode(STATES, 1234.5)
+
+        self.assertEqual((1234.5, STATES), snapshot.decode(data))
+        # strings stay strings, numbers numbers.
+        self.assertIsInstance(snapshot.decode(data)[1]['tea']['elapsed_time'], str)
+
+    def test_compact(self):
+        data = snapshot.encode({'tea': STATES['tea']}, 0)
+
+        self.assertLess(len(data), len(json.dumps(STATES['tea'])) * 2 // 3)
+
+    def test_corrupt(self):
+        data = snapshot.encode(STATES, 0)
+        corrupt = [
+            b'',
+            data[:10],
+            data[:-1],
+            b'XXXX' + data[4:],
+            data[:4] + b'\x09' + data[5:],
+            data[:-2] + bytes([data[-2] ^ 1]) + data[-1:],
+            # from a timer with other keys.
+            data[:16] + bytes([data[16] ^ 1]) + data[17:],
+        ]
+        for data in corrupt:
+            with self.subTest(data=data), self.assertRaises(exceptions.BadValue):
+                snapshot.decode(data)
+
+
+class RestoreTest(unittest.TestCase):
+    def setUp(self):
+        self.environ = {'shared_state_dir': testing.temp_dir(self)}
+
+    def _run(self, now: float, **mapping) -> dict:
+        return shared_state.run(
+            {**self.environ, 'shared_state': 'true', **mapping},
+            lambda: now,
+            runner=timer.run,
+        )
+
+    def test_snapshot_and_restore(self):
+        self._run(1000, timer_name='tea', start_time='300')
+        self._run(1000, timer_name='tea', start_time='300', button='1')
+        self._run(1060, timer_name='tea', start_time='300')
+        self._run(1000, timer_name='review', start_time='1800')
+
+        data = snapshot.encode(snapshot.capture(self.environ), 1060)
+        self.environ = {'shared_state_dir': testing.temp_dir(self)}
+        outputs = snapshot.restore(self.environ, data, now=1100)
+
+        self.assertEqual(['review', 'tea'], sorted(outputs))
+        # as they were when the snapshot was taken.
+        self.assertEqual('4m', outputs['tea']['full_text'])
+        self.assertEqual('30m', outputs['review']['full_text'])
+        # the next tick counts the time that passed since.
+        self.assertEqual(
+            '3m19s', self._run(1101, timer_name='tea', start_time='300')['full_text']
+        )
+
+    def test_restore_leaves_alarms_to_the_blockets(self):
+        call_alarm = state_mutations._ALARM_CALLER
+        alarms = []
+        state_mutations._ALARM_CALLER = alarms.append
+        self.addCleanup(setattr, state_mutations, '_ALARM_CALLER', call_alarm)
+        tea = {'timer_name': 'tea', 'start_time': '60', 'alarm_command': 'ding'}
+        self._run(1000, **tea)
+        self._run(1000, button='1', **tea)
+        data = snapshot.encode(snapshot.capture(self.environ), 1000)
+
+        snapshot.restore(self.environ, data, now=2000)
+
+        self.assertEqual([], alarms)
+        self._run(2000, **tea)
+        self.assertEqual(['ding'], alarms)
+
+    def test_capture_by_name(self):
+        self._run(1000, timer_name='tea/time')
+
+        captured = snapshot.capture(self.environ, ['tea/time'])
+
+        self.assertEqual(['tea/time'], list(captured))
+        with self.assertRaises(exceptions.BadValue):
+            snapshot.capture(self.environ, ['coffee'])
+
+    def test_capture_rejects_corrupt_states(self):
+        self._run(1000, timer_name='tea')
+        path = shared_state.state_path({**self.environ, 'timer_name': 'tea'})
+        with open(path, 'w') as f:
+            f.write('{"tick": 1000}')
+
+        with self.assertRaises(exceptions.BadValue):
+            snapshot.capture(self.environ)
+
+    def test_invalid_states_are_rejected(self):
+        data = snapshot.encode(
+            {
+                'tea': {'timer_name': 'tea'},
+                'bad': {'timer_name': 'bad', 'timer_state': 'sleeping'},
+            },
+            0,
+        )
+
+        with self.assertRaises(exceptions.BadValue):
+            snapshot.restore(self.environ, data, now=0)
+        # not even the valid ones.
+        path = shared_state.state_path({**self.environ, 'timer_name': 'tea'})
+        self.assertFalse(os.path.exists(path))
+
+    def test_restore_writes_under_the_lock(self):
+        data = snapshot.encode({'tea': {'timer_name': 'tea'}}, 0)
+        path = shared_state.state_path({**self.environ, 'timer_name': 'tea'})
+        write = shared_state.write
+
+        def checked_write(*args):
+            with open(f'{path}.lock') as lock:
+                with self.assertRaises(BlockingIOError):
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            write(*args)
+
+        with mock.patch.object(shared_state, 'write', checked_write):
+            snapshot.restore(self.environ, data, now=0)
+        self.assertEqual('tea', shared_state.read(path)['output']['timer_name'])
+        # nothing half-written is left behind.
+        self.assertEqual(
+            ['tea.json', 'tea.json.lock'],
+            sorted(os.listdir(self.environ['shared_state_dir'])),
+        )
+
+    def test_main(self):
+        self._run(1000, timer_name='tea')
+        path = os.path.join(testing.temp_dir(self), 'timers.snap')
+
+        self.assertEqual(0, snapshot.main(['snapshot', '-o', path], self.environ))
+        os.remove(shared_state.state_path({**self.environ, 'timer_name': 'tea'}))
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            self.assertEqual(0, snapshot.main(['restore', path], self.environ))
+        self.assertEqual('restored tea\n', stdout.getvalue())
+
+        with open(path, 'r+b') as f:
+            f.write(b'junk')
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertEqual(1, snapshot.main(['restore', path], self.environ))
+        self.assertIn('not a timer snapshot', stderr.getvalue())
+
+        with mock.patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertEqual(
+                1, snapshot.main(['restore', f'{path}.missing'], self.environ)
+            )
+        self.assertIn('timer.py restore: ', stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""Soak test of the long-running mode.
+
+Drives a `resident.Resident` through ticks and click bursts (on a
+simulated clock, so alarms fire and days roll over quickly) for a
+wall-clock duration, sampling traced Python memory, RSS, open file
+descriptors and child processes. Fails, with the top allocators since the
+first sample, when any of them grows past its threshold:
+
+    ./soak.py --duration 600 --config-file ~/.config/timer.conf
+"""
+import argparse
+import dataclasses
+import gc
+import logging
+import os
+import random
+import resource
+import time
+import tracemalloc
+from typing import Callable
+
+import resident
+import state as state_lib
+
+# short timers with alarms, so a soak goes through every path often.
+DEFAULT_CONFIG = {
+    'timer_name': 'soak',
+    'start_time': '60',
+    'alarm_thresholds': '-30s,0,30s',
+    'alarm_command': 'true',
+}
+
+CLICKS = (
+    state_lib.Button.LEFT,
+    state_lib.Button.RIGHT,
+    state_lib.Button.SCROLL_UP,
+    state_lib.Button.SCROLL_DOWN,
+    state_lib.Button.BACK,
+    state_lib.Button.FORWARD,
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class Limits:
+    traced_bytes: int = 512 * 1024
+    rss_bytes: int = 8 * 1024 * 1024
+    open_fds: int = 0
+    # alarms being run at sampling time.
+    children: int = 2
+
+
+@dataclasses.dataclass(frozen=True)
+class Sample:
+    elapsed: float
+    steps: int
+    traced_bytes: int
+    rss_bytes: int
+    open_fds: int
+    children: int
+    snapshot: tracemalloc.Snapshot = dataclasses.field(repr=False)
+
+
+@dataclasses.dataclass(frozen=True)
+class Report:
+    samples: list[Sample]
+    # human readable, one per limit exceeded.
+    failures: list[str]
+
+    def top_allocators(self, limit: int = 10) -> list[tracemalloc.StatisticDiff]:
+        first, last = self.samples[0], self.samples[-1]
+        return last.snapshot.compare_to(first.snapshot, 'lineno')[:limit]
+
+
+def rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # peak rather than current, but growth still shows.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def open_fds() -> int:
+    for path in ('/proc/self/fd', '/dev/fd'):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return 0
+
+
+def children() -> int:
+    """Counts child processes, zombies included."""
+    pid = os.getpid()
+    count = 0
+    try:
+        entries = os.listdir('/proc')
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            # exited while listing.
+            continue
+        # the command name may contain spaces, fields resume after its ')'.
+        ppid = int(stat.rpartition(')')[2].split()[1])
+        count += ppid == pid
+    return count
+
+
+def take_sample(elapsed: float, steps: int) -> Sample:
+    gc.collect()
+    # the soak's own bookkeeping (samples, snapshots) is not the timer's.
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )
+    )
+    return Sample(
+        elapsed=elapsed,
+        steps=steps,
+        traced_bytes=sum(trace.size for trace in snapshot.traces),
+        rss_bytes=rss_bytes(),
+        open_fds=open_fds(),
+        children=children(),
+        snapshot=snapshot,
+    )
+
+
+def check(first: Sample, sample: Sample, limits: Limits) -> list[str]:
+    failures = []
+    for field in ('traced_bytes', 'rss_bytes', 'open_fds', 'children'):
+        growth = getattr(sample, field) - getattr(first, field)
+        if growth > getattr(limits, field):
+            failures.append(
+                f'{field} grew by {growth} (limit {getattr(limits, field)}) '
+                f'after {sample.steps} steps'
+            )
+    return failures
+
+
+def soak(
+    config: dict[str, str],
+    duration: float,
+    sample_every: float,
+    limits: Limits = Limits(),
+    tick_seconds: float = 1.0,
+    click_chance: float = 0.05,
+    seed: int = 0,
+    timer: Callable[[], float] = time.monotonic,
+) -> Report:
+    """Soaks a resident timer for `duration` wall-clock seconds.
+
+    Args:
+        tick_seconds: simulated time between ticks.
+        click_chance: probability of a click burst before each tick.
+        timer: wall clock measuring `duration` and `sample_every`.
+    """
+    rng = random.Random(seed)
+    simulated = [time.time()]
+    instance = resident.Resident(config, clock=lambda: simulated[0])
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        start = timer()
+        samples = []
+        failures = []
+        steps = 0
+        # the first sample is taken once caches are warm.
+        next_sample = start + sample_every
+        while True:
+            now = timer()
+            if now >= next_sample:
+                sample = take_sample(now - start, steps)
+                samples.append(sample)
+                failures = check(samples[0], sample, limits)
+                next_sample = now + sample_every
+                if failures or now - start >= duration:
+                    break
+            if rng.random() < click_chance:
+                burst = [rng.choice(CLICKS) for _ in range(rng.randint(1, 3))]
+                instance.step_clicks(burst)
+            simulated[0] += tick_seconds
+            instance.step(state_lib.Button.NONE)
+            steps += 1
+    finally:
+        if started:
+            tracemalloc.stop()
+    return Report(samples=samples, failures=failures)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds')
+    parser.add_argument('--sample-every', type=float, default=5.0, help='seconds')
+    parser.add_argument(
+        '--config-file', help='key=value lines (default: short alarmed timers)'
+    )
+    parser.add_argument('--tick-seconds', type=float, default=1.0)
+    parser.add_argument('--click-chance', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-traced-kib', type=int, default=512)
+    parser.add_argument('--max-rss-kib', type=int, default=8192)
+    parser.add_argument('--max-fds', type=int, default=0)
+    parser.add_argument('--max-children', type=int, default=2)
+    parser.add_argument('--top', type=int, default=10, help='allocators to print')
+    args = parser.parse_args(argv)
+
+    config = (
+        resident.read_config_file(args.config_file)
+        if args.config_file
+        else DEFAULT_CONFIG
+    )
+    logging.disable(logging.CRITICAL)
+    report = soak(
+        config,
+        duration=args.duration,
+        sample_every=args.sample_every,
+        limits=Limits(
+            traced_bytes=args.max_traced_kib * 1024,
+            rss_bytes=args.max_rss_kib * 1024,
+            open_fds=args.max_fds,
+            children=args.max_children,
+        ),
+        tick_seconds=args.tick_seconds,
+        click_chance=args.click_chance,
+        seed=args.seed,
+    )
+    for sample in report.samples:
+        print(
+            f'{sample.elapsed:7.1f}s {sample.steps:9d} steps '
+            f'traced={sample.traced_bytes // 1024}KiB '
+            f'rss={sample.rss_bytes // 1024}KiB '
+            f'fds={sample.open_fds} children={sample.children}'
+        )
+    if not report.failures:
+        return 0
+    for failure in report.failures:
+        print(f'FAIL: {failure}')
+    print('top allocators since the first sample:')
+    for stat in report.top_allocators(args.top):
+        print(f'  {stat}')
+    return 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+import dataclasses
+import os
+import subprocess
+import tracemalloc
+import unittest
+
+import soak
+
+
+class SoakTest(unittest.TestCase):
+    def test_short_soak_passes(self):
+        report = soak.soak(soak.DEFAULT_CONFIG, duration=0.3, sample_every=0.1)
+
+        self.assertEqual([], report.failures)
+        self.assertGreaterEqual(len(report.samples), 2)
+        self.assertGreater(report.samples[-1].steps, report.samples[0].steps)
+
+    def test_growth_past_limits_fails(self):
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        first = soak.take_sample(0, 0)
+        leak = [bytearray(64 * 1024) for _ in range(4)]
+        fd = os.open(os.devnull, os.O_RDONLY)
+        self.addCleanup(os.close, fd)
+        last = soak.take_sample(1, 100)
+
+        failures = soak.check(
+            first, last, dataclasses.replace(soak.Limits(), traced_bytes=128 * 1024)
+        )
+
+        self.assertEqual(2, len(failures))
+        self.assertTrue(failures[0].startswith('traced_bytes grew by'))
+        self.assertTrue(failures[1].startswith('open_fds grew by 1'))
+        report = soak.Report(samples=[first, last], failures=failures)
+        self.assertTrue(
+            any(
+                stat.traceback[0].filename == __file__ and stat.size_diff > 0
+                for stat in report.top_allocators()
+            )
+        )
+        del leak
+
+    def test_counts_children(self):
+        before = soak.children()
+        process = subprocess.Popen(['sleep', '10'])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+
+        self.assertEqual(before + 1, soak.children())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,10 +4,18 @@ import enum
 from typing import Any
 import datetime
 import logging
+import os
 
+import alarms as alarms_lib
 import colors
 import exceptions
+import failures as failures_lib
+import history as history_lib
+import laps as laps_lib
+import metrics as metrics_lib
 import time_format
+import usage as usage_lib
+import zones as zones_lib
 
 
 @enum.unique
@@ -18,6 +26,9 @@ class Button(enum.Enum):
     RIGHT = '3'
     SCROLL_UP = '4'
     SCROLL_DOWN = '5'
+    # mouse back / forward buttons.
+    BACK = '8'
+    FORWARD = '9'
 
 
 @enum.unique
@@ -27,10 +38,130 @@ class TimerState(enum.Enum):
     PAUSED = 'paused'
 
 
+@enum.unique
+class TimerMode(enum.Enum):
+    COUNTDOWN = 'countdown'
+    STOPWATCH = 'stopwatch'
+
+
+@enum.unique
+class CommandMode(enum.Enum):
+    # through /bin/sh.
+    SHELL = 'shell'
+    # split into arguments, see `commands`.
+    EXEC = 'exec'
+
+
+DEFAULT_TEXT_FORMATS = {
+    TimerMode.COUNTDOWN: '{remaining_time:pretty}',
+    TimerMode.STOPWATCH: '{elapsed_time:clock}',
+}
+
+
+# Names `State.placeholders` provides to templates.
+PLACEHOLDERS = frozenset(
+    (
+        'timer_name',
+        'start_time',
+        'elapsed_time',
+        'remaining_time',
+        'lap_count',
+        'last_lap',
+        'best_lap',
+        'current_lap',
+        'today_total',
+        'sessions_today',
+        'week_total',
+        'running',
+        'paused',
+        'stopped',
+        'typical',
+        'p90',
+        'vs_typical',
+    )
+)
+# the placeholders that need a lookup in `estimates_file`.
+_ESTIMATES = frozenset(('typical', 'p90', 'vs_typical'))
+
+
+# Keys `load_state` reads from its mapping (i.e. the i3blocks environment).
+CONFIG_KEYS = (
+    'text_format',
+    'timer_name',
+    'start_time',
+    'increments',
+    'colorize',
+    'alarm_command',
+    'read_input_command',
+    'running_label',
+    'stopped_label',
+    'paused_label',
+    'mode',
+    'lap_capacity',
+    'alarm_thresholds',
+    'preset_file',
+    'undo_depth',
+    'metrics_file',
+    'metrics_interval',
+    'output_sinks',
+    'refresh_signal',
+    'refresh_pid',
+    'schedule',
+    'schedule_file',
+    'command_mode',
+    'estimates_file',
+    'hook_command',
+    'hook_fifo',
+)
+RUNTIME_KEYS = (
+    'elapsed_time',
+    'old_timestamp',
+    'timer_state',
+    'error_message',
+    'short_error_message',
+    'error_duration',
+    'laps',
+    'lap_count',
+    'lap_start',
+    'last_lap',
+    'best_lap',
+    'today_total',
+    'sessions_today',
+    'week_total',
+    'day_end',
+    'week_end',
+    'history',
+    'metrics',
+    'failures',
+    'refresh_at',
+    'schedule_next',
+    'schedule_stamp',
+    'zones',
+)
+
+
 def now():
     return datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
 
 
+def compile_text(text: str) -> time_format.Template:
+    """Compiles (once) a template, validated against `PLACEHOLDERS`.
+
+    Zone actions are validated too, so a bad one fails when loaded rather
+    than when clicked.
+    """
+    try:
+        return time_format.compile_template(text, PLACEHOLDERS, zones_lib.is_action)
+    except KeyError as e:
+        error = exceptions.BadFormat(f'Bad key {e}')
+    except ValueError as e:
+        error = exceptions.BadFormat(str(e))
+    except SyntaxError as e:
+        error = exceptions.BadFormat(f'Bad syntax in {text}')
+    error.failure_key = failures_lib.hash_key(text)
+    raise error
+
+
 def get_int(mapping: Mapping[str, Any], key: str, default: int) -> int:
     res = mapping.get(key)
     if res is None:
@@ -51,10 +182,28 @@ def get_float(mapping: Mapping[str, Any], key: str, default: float) -> float:
         raise exceptions.BadFloat(f"{key}='{res}' not a float")
 
 
+def get_int_or_none(mapping: Mapping[str, Any], key: str) -> int | None:
+    return get_int(mapping, key, None)
+
+
 def get_float_or_none(mapping: Mapping[str, Any], key: str) -> float | None:
     return get_float(mapping, key, None)
 
 
+def get_bool(mapping: Mapping[str, Any], key: str, default: bool) -> bool:
+    res = mapping.get(key)
+    if res is None:
+        return default
+    if isinstance(res, bool):
+        return res
+    match str(res).strip().lower():
+        case 'true' | 'yes' | 'on' | '1':
+            return True
+        case 'false' | 'no' | 'off' | '0':
+            return False
+    raise exceptions.BadBoolean(f"{key}='{res}' not a boolean")
+
+
 def get_enum(
     mapping: Mapping[str, Any], key: str, default: enum.Enum | None
 ) -> enum.Enum:
@@ -82,21 +231,64 @@ class State:
     running_label: str
     stopped_label: str
     paused_label: str
+    mode: TimerMode
+    lap_capacity: int
+    alarms: alarms_lib.Alarms
+    preset_file: str | None
+    undo_depth: int
+    metrics_file: str | None
+    metrics_interval: float
+    # `renderers.Sink`s.
+    output_sinks: tuple[Any, ...]
+    refresh_signal: int | None
+    # where to look for i3blocks from, see `refresh.i3blocks_pid`.
+    refresh_pid: int | None
+    # rules are only parsed when one is due, see `schedule`.
+    schedule: str | None
+    schedule_file: str | None
+    command_mode: CommandMode
+    # durations of past runs by timer name, see `estimates`.
+    estimates_file: str | None
+    # the worker lifecycle events are sent to, see `hooks`.
+    hook_command: str | None
+    hook_fifo: str | None
 
     # internal control - not modifiable through configuration
     elapsed_time: float
     timer_state: TimerState
     old_timestamp: float | None
+    laps: laps_lib.Laps
+    usage: usage_lib.Usage
+    history: history_lib.History
+    metrics: metrics_lib.Metrics
+    failures: failures_lib.Failures
+    refresh_at: float | None
+    schedule_next: float | None
+    # the version of `schedule_file` that `schedule_next` was computed from.
+    schedule_stamp: str | None
+    # encoded click zones of the last rendered text, see `zones`.
+    zones: str
     new_timestamp: float | None = None
     execute_alert_command: bool = False
+    # indexes of the alarms crossed during the last step.
+    fired_alarms: tuple[int, ...] = ()
     error_message: str | None = None
     short_error_message: str | None = None
     error_duration: float | None = None
+    # where a click landed, as a fraction of the block's width.
+    click_x: float | None = None
+    # (timer name, duration) of the run the step ended, see `history.SESSION`.
+    ended_session: tuple[str, float] | None = None
+    # `state_mutations.Callers` of this state, or None for the module hooks.
+    callers: Any = dataclasses.field(default=None, compare=False, repr=False)
 
     def reset_transient_state(self) -> 'State':
         res = dataclasses.replace(
             self,
             execute_alert_command=False,
+            fired_alarms=(),
+            click_x=None,
+            ended_session=None,
         )
         return res
 
@@ -109,30 +301,77 @@ class State:
             case TimerState.STOPPED:
                 return self.stopped_label
 
-    def build_alarm_command(self) -> str:
-        return self.formatted(self.alarm_command)
+    def build_command(self, template: str) -> str | list[str]:
+        """Fills in a command, as a shell line or as arguments."""
+        if self.command_mode == CommandMode.EXEC:
+            import commands
+
+            return [self.formatted(arg) for arg in commands.split(template)]
+        return self.formatted(template)
+
+    def build_alarm_command(self) -> str | list[str]:
+        return self.build_command(self.alarm_command)
+
+    def fired_alarm_templates(self) -> list[str]:
+        templates = []
+        for index in self.fired_alarms:
+            command = self.alarms.commands[index] or self.alarm_command
+            if command:
+                templates.append(command)
+        return templates
+
+    def build_fired_alarm_commands(self) -> list[str | list[str]]:
+        return [
+            self.build_command(command) for command in self.fired_alarm_templates()
+        ]
+
+    def build_read_input_command(self) -> str | list[str]:
+        return self.build_command(self.read_input_command)
 
-    def build_read_input_command(self) -> str:
-        return self.formatted(self.read_input_command)
+    def placeholders(self, names: frozenset[str] | None = None) -> dict[str, Any]:
+        """The values of `PLACEHOLDERS`.
+
+        Estimates are only looked up if `names` (default: all of them)
+        refer to them.
+        """
+        typical = p90 = None
+        if self.estimates_file and (names is None or _ESTIMATES & names):
+            import estimates
+
+            typical, p90 = estimates.lookup(self.estimates_file, self.timer_name)
+        return dict(
+            timer_name=self.timer_name,
+            start_time=self.start_time,
+            elapsed_time=self.elapsed_time,
+            remaining_time=self.start_time - self.elapsed_time,
+            lap_count=self.laps.count,
+            last_lap=self.laps.last,
+            best_lap=self.laps.best,
+            current_lap=self.elapsed_time - self.laps.lap_start,
+            today_total=self.usage.today_total,
+            sessions_today=self.usage.sessions_today,
+            week_total=self.usage.week_total,
+            running=self.timer_state == TimerState.RUNNING,
+            paused=self.timer_state == TimerState.PAUSED,
+            stopped=self.timer_state == TimerState.STOPPED,
+            # 0 until a run of this name ended.
+            typical=typical or 0.0,
+            p90=p90 or 0.0,
+            vs_typical=self.elapsed_time - typical if typical else 0.0,
+        )
 
     def formatted(self, text) -> str:
-        remaining_time = self.start_time - self.elapsed_time
-        try:
-            return time_format.FORMATTER.format(
-                text,
-                timer_name=self.timer_name,
-                start_time=self.start_time,
-                elapsed_time=self.elapsed_time,
-                remaining_time=remaining_time,
-            )
-        except KeyError as e:
-            raise exceptions.BadFormat(f'Bad key {e}')
-        except SyntaxError as e:
-            raise exceptions.BadFormat(f'Bad syntax in {text}')
+        template = compile_text(text)
+        return template(self.placeholders(time_format.template_names(text)))
 
     def full_text(self) -> str:
+        return self.full_text_and_zones()[0]
+
+    def full_text_and_zones(self) -> tuple[str, tuple[zones_lib.Zone, ...]]:
         remaining_time = self.start_time - self.elapsed_time
-        text = self.formatted(self.text_format)
+        text, zones = zones_lib.extract(
+            self.formatted(self.text_format), self.label()
+        )
 
         match self.color_option:
             case colors.ColorOption.COLORFUL:
@@ -145,7 +384,7 @@ class State:
                     text = colors.colorize(text)
             case colors.ColorOption.NEVER:
                 pass
-        return text
+        return text, zones
 
     def serializable(self) -> dict[str, Any]:
         res = {
@@ -162,16 +401,45 @@ class State:
             'paused_label': self.paused_label,
             'old_timestamp': str(self.old_timestamp),
         }
+        if self.mode == TimerMode.STOPWATCH:
+            res.update(self.laps.serializable())
+        res.update(self.usage.serializable())
+        if self.history.encoded:
+            res['history'] = self.history.encoded
+        if self.schedule_next is not None:
+            res['schedule_next'] = str(self.schedule_next)
+        if self.schedule_stamp is not None:
+            res['schedule_stamp'] = self.schedule_stamp
+
+        now = self.old_timestamp if self.new_timestamp is None else self.new_timestamp
+        cached = None
+        if self.failures.entries:
+            key = failures_lib.hash_key(self.text_format)
+            # due for a retry: rendered again below, see
+            # `state_mutations.retry_text_format`.
+            cached = self.failures.active(key, now)
+            res['failures'] = self.failures.encode()
 
         display_error = self.error_duration is None
-        if display_error:
-            full_text = self.full_text()
+        if display_error and cached is not None:
+            res.update(
+                {
+                    'full_text': f'{cached.message}({cached.retry_at - now:.1f})',
+                    'short_text': cached.message[:40],
+                    'color': '#ffffff',
+                    'background': '#ff0000',
+                }
+            )
+        elif display_error:
+            full_text, zones = self.full_text_and_zones()
             res.update(
                 {
                     'full_text': full_text,
                     'short_text': full_text,
                 }
             )
+            if zones:
+                res['zones'] = zones_lib.encode(zones)
         else:
             res.update(
                 {
@@ -188,24 +456,140 @@ class State:
         return res
 
 
-def load_state(mapping: Mapping, now: float) -> State:
-    state = State(
-        text_format=mapping.get('text_format', '{remaining_time:pretty}'),
+def _config_fields(mapping: Mapping) -> dict[str, Any]:
+    mode = get_enum(mapping, 'mode', TimerMode.COUNTDOWN)
+    return dict(
+        text_format=mapping.get('text_format', DEFAULT_TEXT_FORMATS[mode]),
         timer_name=mapping.get('timer_name', 'timer'),
         start_time=get_int(mapping, 'start_time', 300),
-        elapsed_time=get_float(mapping, 'elapsed_time', 0.0),
-        old_timestamp=get_float_or_none(mapping, 'old_timestamp'),
-        new_timestamp=now,
         increments=get_int(mapping, 'increments', 60),
-        timer_state=get_enum(mapping, 'timer_state', TimerState.STOPPED),
         color_option=get_enum(mapping, 'colorize', colors.ColorOption.NEVER),
         alarm_command=mapping.get('alarm_command'),
         read_input_command=mapping.get('read_input_command'),
         running_label=mapping.get('running_label', 'running:'),
         stopped_label=mapping.get('stopped_label', 'timer:'),
         paused_label=mapping.get('paused_label', 'paused:'),
+        mode=mode,
+        lap_capacity=get_int(mapping, 'lap_capacity', 10),
+        alarms=alarms_lib.load_alarms(mapping),
+        preset_file=mapping.get('preset_file'),
+        undo_depth=get_int(mapping, 'undo_depth', 10),
+        metrics_file=mapping.get('metrics_file'),
+        metrics_interval=get_float(mapping, 'metrics_interval', 15.0),
+        output_sinks=_load_output_sinks(mapping),
+        refresh_signal=_load_refresh_signal(mapping),
+        refresh_pid=get_int_or_none(mapping, 'refresh_pid'),
+        schedule=mapping.get('schedule'),
+        schedule_file=mapping.get('schedule_file'),
+        command_mode=get_enum(mapping, 'command_mode', CommandMode.SHELL),
+        estimates_file=_expand_path(mapping.get('estimates_file')),
+        hook_command=mapping.get('hook_command'),
+        hook_fifo=_expand_path(mapping.get('hook_fifo')),
+    )
+
+
+def _expand_path(path: str | None) -> str | None:
+    return os.path.expanduser(path) if path else path
+
+
+def _load_output_sinks(mapping: Mapping) -> tuple[Any, ...]:
+    if not mapping.get('output_sinks'):
+        return ()
+    import renderers
+
+    return renderers.parse_sinks(mapping['output_sinks'])
+
+
+def _load_refresh_signal(mapping: Mapping) -> int | None:
+    refresh_signal = get_int_or_none(mapping, 'refresh_signal')
+    if refresh_signal is not None:
+        import refresh
+
+        # validated once, when loaded.
+        refresh.signal_number(refresh_signal)
+    return refresh_signal
+
+
+def _configured_templates(config: Mapping[str, Any]) -> list[str | None]:
+    return [
+        config['text_format'],
+        config['alarm_command'],
+        config['read_input_command'],
+        config['schedule_file'] or config['schedule'],
+        *config['alarms'].commands,
+    ]
+
+
+def _load_laps(mapping: Mapping, capacity: int) -> laps_lib.Laps:
+    return laps_lib.Laps(
+        capacity=capacity,
+        packed=mapping.get('laps', ''),
+        count=get_int(mapping, 'lap_count', 0),
+        lap_start=get_float(mapping, 'lap_start', 0.0),
+        last=get_float(mapping, 'last_lap', 0.0),
+        best=get_float(mapping, 'best_lap', 0.0),
+    )
+
+
+def _load_usage(mapping: Mapping) -> usage_lib.Usage:
+    return usage_lib.Usage(
+        today_total=get_float(mapping, 'today_total', 0.0),
+        sessions_today=get_int(mapping, 'sessions_today', 0),
+        week_total=get_float(mapping, 'week_total', 0.0),
+        day_end=get_float_or_none(mapping, 'day_end'),
+        week_end=get_float_or_none(mapping, 'week_end'),
+    )
+
+
+def load_state(mapping: Mapping, now: float) -> State:
+    config = _config_fields(mapping)
+    state = State(
+        **config,
+        laps=_load_laps(mapping, config['lap_capacity']),
+        usage=_load_usage(mapping),
+        history=history_lib.History(
+            depth=config['undo_depth'], encoded=mapping.get('history', '')
+        ),
+        metrics=metrics_lib.decode(mapping.get('metrics')),
+        failures=failures_lib.decode(mapping.get('failures')).prune(
+            _configured_templates(config)
+        ),
+        elapsed_time=get_float(mapping, 'elapsed_time', 0.0),
+        old_timestamp=get_float_or_none(mapping, 'old_timestamp'),
+        new_timestamp=now,
+        timer_state=get_enum(mapping, 'timer_state', TimerState.STOPPED),
         error_message=mapping.get('error_message'),
         short_error_message=mapping.get('short_error_message'),
         error_duration=get_float_or_none(mapping, 'error_duration'),
+        refresh_at=get_float_or_none(mapping, 'refresh_at'),
+        schedule_next=get_float_or_none(mapping, 'schedule_next'),
+        schedule_stamp=mapping.get('schedule_stamp'),
+        zones=mapping.get('zones', ''),
+        click_x=zones_lib.position(mapping.get('relative_x'), mapping.get('width')),
     )
     return state
+
+
+def reload_config(state: State, mapping: Mapping) -> State:
+    """Re-reads only the configuration fields of `state` from `mapping`.
+
+    Runtime fields (elapsed time, timer state, timestamps, errors) are kept,
+    except for cached failures of templates and commands no longer configured.
+    Raises the same errors as `load_state` (and `BadFormat` for a
+    `text_format` that does not compile) on invalid configuration, in which
+    case `state` is left untouched.
+    """
+    config = _config_fields(mapping)
+    compile_text(config['text_format'])
+    laps = dataclasses.replace(state.laps, capacity=config['lap_capacity'])
+    history = dataclasses.replace(state.history, depth=config['undo_depth'])
+    failures = state.failures.prune(_configured_templates(config))
+    return dataclasses.replace(
+        state,
+        **config,
+        laps=laps,
+        history=history,
+        failures=failures,
+        # recomputed from the new rules on the next tick.
+        schedule_next=None,
+    )
@@ -1,36 +1,153 @@
 import dataclasses
+import re
 import subprocess
-from typing import Any, Callable
+from typing import Any, Callable, Sequence
 import logging
 
+import commands
 import exceptions
+import failures as failures_lib
+import history as history_lib
 import input_parser
+import laps as laps_lib
 from monads import StateMonad
 import state as state_lib
+import zones as zones_lib
 
 
-_ALARM_CALLER = lambda cmd: subprocess.Popen(cmd, shell=True)
-_INPUT_READ_CALLER = lambda cmd: subprocess.check_output(
-    cmd, shell=True, encoding='utf-8'
-)
+# imported on first use: most blockets never record nor emit anything.
+def _record_estimate(path: str, name: str, duration: float):
+    import estimates
+
+    estimates.record(path, name, duration)
+
+
+def _emit_hook(state: state_lib.State, event: str, fields: dict[str, Any]):
+    import hooks
+
+    hooks.emit(state, event, fields)
+
+
+# commands are shell lines, or argument lists with `command_mode=exec`.
+_ALARM_CALLER = commands.launch
+_INPUT_READ_CALLER = commands.read_output
+_MENU_READ_CALLER = lambda cmd, menu: commands.read_output(cmd, input=menu)
+_ESTIMATE_RECORDER = _record_estimate
+_HOOK_EMITTER = _emit_hook
+
+
+@dataclasses.dataclass(frozen=True)
+class Callers:
+    """Where a state's side effects go, instead of the module hooks above."""
+
+    call_alarm: Callable[[str | list[str]], Any]
+    read_input: Callable[[str | list[str]], str]
+    read_menu: Callable[[str | list[str], str], str]
+    record_estimate: Callable[[str, str, float], Any]
+    emit_hook: Callable[[state_lib.State, str, dict[str, Any]], Any]
+
+
+def _callers(state: state_lib.State) -> Callers:
+    if state.callers is not None:
+        return state.callers
+    # looked up on every call, so the hooks can be swapped at any time.
+    return Callers(
+        _ALARM_CALLER,
+        _INPUT_READ_CALLER,
+        _MENU_READ_CALLER,
+        _ESTIMATE_RECORDER,
+        _HOOK_EMITTER,
+    )
+
+
+def _emit(state: state_lib.State, event: str, **fields):
+    if state.hook_command:
+        _callers(state).emit_hook(state, event, fields)
 
 
 def handle_increments(init_state: state_lib.State) -> state_lib.State:
     _, state = (
         StateMonad.get()
         .then(lambda _: StateMonad.modify(_increase_elapsed_time_if_running))
+        .then(lambda _: StateMonad.modify(_roll_usage))
+        # before the schedule, which may report an error of its own.
         .then(lambda _: StateMonad.modify(_consume_error_time))
+        .then(lambda _: StateMonad.modify(_run_schedule))
+        .then(lambda _: StateMonad.modify(_record_ended_session))
         .then(lambda _: StateMonad.modify(_move_new_timestamp_to_old_timestamp))
         .run(init_state)
     )
 
+    for index in state.fired_alarms:
+        _emit(state, 'alarm', threshold=state.alarms.offsets[index])
     if state.execute_alert_command:
-        _ALARM_CALLER(state.build_alarm_command())
+        state = _launch_alarms(state, init_state.new_timestamp)
 
     return state.reset_transient_state()
 
 
-def add_error(init_state: state_lib.State, e: Exception, now: float) -> state_lib.State:
+def _launch_alarms(state: state_lib.State, now: float) -> state_lib.State:
+    # a failing alarm is reported without aborting the tick, which would
+    # cross (and fail) the same threshold again on the next one.
+    launched = 0
+    for template in state.fired_alarm_templates():
+        key = failures_lib.hash_key(template)
+        if state.failures.active(key, now):
+            continue
+        try:
+            _callers(state).call_alarm(state.build_command(template))
+        except (exceptions.TimerException, OSError) as e:
+            logging.exception(e)
+            state = add_error(state, e, now, failure_key=key)
+            continue
+        launched += 1
+        state = dataclasses.replace(state, failures=state.failures.clear(key))
+    metrics = dataclasses.replace(
+        state.metrics, alarms_fired=state.metrics.alarms_fired + launched
+    )
+    return dataclasses.replace(state, metrics=metrics)
+
+
+def retry_text_format(
+    state: state_lib.State,
+) -> tuple[state_lib.State, dict[str, Any]]:
+    """Renders `state`, retrying a failed `text_format` once its backoff expired.
+
+    Its failure is only forgotten once it renders: failing again raises,
+    for `add_error` to record it with a longer backoff.
+
+    Returns:
+        The state and its serialized output.
+    """
+    serialized = state.serializable()
+    if not state.failures.entries or state.error_duration is not None:
+        # the text is not rendered while an error is displayed.
+        return state, serialized
+    key = failures_lib.hash_key(state.text_format)
+    now = state.old_timestamp if state.new_timestamp is None else state.new_timestamp
+    if key not in state.failures.entries or state.failures.active(key, now):
+        return state, serialized
+    # rendered by `serializable`.
+    state = dataclasses.replace(state, failures=state.failures.clear(key))
+    serialized.pop('failures')
+    if state.failures.entries:
+        serialized['failures'] = state.failures.encode()
+    return state, serialized
+
+
+def add_error(
+    init_state: state_lib.State,
+    e: Exception,
+    now: float,
+    failure_key: str | None = None,
+) -> state_lib.State:
+    """Displays `e` for a while.
+
+    Errors of configured templates and commands (`failure_key`, which
+    defaults to the one `e` carries) are also cached, see `failures`.
+    """
+    failure_key = failure_key or getattr(e, 'failure_key', None)
+
     def _add_error(state: state_lib.State):
         full_text = str(e)
         short_text = str(e)[:40]
@@ -41,8 +158,16 @@ def add_error(init_state: state_lib.State, e: Exception, now: float) -> state_li
             short_text = full_text[:40]
             # "known" errors can be displayed for shorter
             duration = 5
+        metrics = dataclasses.replace(
+            state.metrics, errors_raised=state.metrics.errors_raised + 1
+        )
+        failures = state.failures
+        if failure_key:
+            failures = failures.record(failure_key, full_text, now)
         return dataclasses.replace(
             state,
+            metrics=metrics,
+            failures=failures,
             error_message=full_text,
             short_error_message=short_text,
             error_duration=duration,
@@ -53,6 +178,56 @@ def add_error(init_state: state_lib.State, e: Exception, now: float) -> state_li
     return state
 
 
+def _run_schedule(state: state_lib.State) -> state_lib.State:
+    if not (state.schedule or state.schedule_file) or state.new_timestamp is None:
+        return state
+    import schedule as schedule_lib
+
+    now = state.new_timestamp
+    stamp = schedule_lib.stamp(state.schedule_file)
+    configured = state.schedule_next is not None and stamp == state.schedule_stamp
+    if configured and now < state.schedule_next:
+        return state
+
+    # the file, when there is one, identifies the rules as configured.
+    key = failures_lib.hash_key(state.schedule_file or state.schedule)
+    if state.failures.active(key, now) and stamp == state.schedule_stamp:
+        # retried once its backoff expired, or as soon as the file changed.
+        return state
+    try:
+        rules = schedule_lib.load_rules(state.schedule, state.schedule_file)
+    except (exceptions.TimerException, OSError) as e:
+        logging.exception(e)
+        state = add_error(state, e, now, failure_key=key)
+        return dataclasses.replace(state, schedule_next=None, schedule_stamp=stamp)
+    state = dataclasses.replace(state, failures=state.failures.clear(key))
+    if not configured:
+        # nothing fires before the first occurrence after (re)configuring.
+        return dataclasses.replace(
+            state,
+            schedule_next=schedule_lib.next_fire(rules, now),
+            schedule_stamp=stamp,
+        )
+    since = now - schedule_lib.MISSED_GRACE
+    if state.old_timestamp is not None:
+        since = max(since, state.old_timestamp)
+    fired, next_fire = schedule_lib.due(rules, since, now)
+    state = dataclasses.replace(state, schedule_next=next_fire)
+    if not fired:
+        return state
+    # of several rules due at once, the latest one wins.
+    fire_at, rule = fired[-1]
+    for input_type, args in rule.batch:
+        state = _input_intake_mutation(input_type, args)(state)
+    state = dataclasses.replace(
+        state,
+        timer_state=state_lib.TimerState.RUNNING,
+        elapsed_time=now - fire_at,
+    )
+    _emit(state, 'start', source='schedule')
+    return state
+
+
 def _consume_error_time(state: state_lib.State) -> tuple[Any, state_lib.State]:
     if state.error_duration is not None and state.old_timestamp is not None:
         delta = state.new_timestamp - state.old_timestamp
@@ -78,23 +253,71 @@ def _increase_elapsed_time_if_running(state: state_lib.State) -> state_lib.State
         # we can't until we move to "persistent" interval.
         delta = state.new_timestamp - state.old_timestamp
         new_elapsed_time = state.elapsed_time + delta
-        execute_alert_command = (
-            # before this step, elapsed time had still not
-            # reached state.start_time.
-            state.elapsed_time < state.start_time
-            # by the end of this step, the new elapsed time
-            # would have reached the start_time.
-            and new_elapsed_time >= state.start_time
-        )
+        fired_alarms = ()
+        # stopwatches count up with no deadline to alert on.
+        if state.mode == state_lib.TimerMode.COUNTDOWN:
+            # thresholds between the overtime before this step (exclusive)
+            # and by the end of this step (inclusive). A long gap between
+            # steps fires every threshold it skipped over, in order.
+            fired_alarms = tuple(
+                state.alarms.crossed(
+                    state.elapsed_time - state.start_time,
+                    new_elapsed_time - state.start_time,
+                )
+            )
         return dataclasses.replace(
             state,
             elapsed_time=new_elapsed_time,
-            execute_alert_command=execute_alert_command,
+            execute_alert_command=bool(fired_alarms),
+            fired_alarms=fired_alarms,
+            usage=state.usage.accrue(state.new_timestamp, delta),
         )
 
     return state
 
 
+def _roll_usage(state: state_lib.State) -> state_lib.State:
+    if state.new_timestamp is None:
+        return state
+    usage = state.usage.roll(state.new_timestamp)
+    if usage is state.usage:
+        return state
+    return dataclasses.replace(state, usage=usage)
+
+
+def _end_session(state: state_lib.State) -> state_lib.State:
+    if state.elapsed_time <= 0 or state.new_timestamp is None:
+        return state
+    return dataclasses.replace(
+        state,
+        usage=state.usage.end_session(state.new_timestamp),
+        # only recorded once it can no longer be undone, see `_record_history`.
+        ended_session=(state.timer_name, state.elapsed_time),
+    )
+
+
+def _record_runs(
+    state: state_lib.State, runs: list[history_lib.Run]
+) -> state_lib.State:
+    if not state.estimates_file:
+        return state
+    for name, duration in runs:
+        try:
+            _callers(state).record_estimate(state.estimates_file, name, duration)
+        except (exceptions.TimerException, OSError) as e:
+            # the run still ended, only its duration is lost.
+            logging.exception(e)
+            state = add_error(state, e, state.new_timestamp)
+    return state
+
+
+def _record_ended_session(state: state_lib.State) -> state_lib.State:
+    # e.g. a schedule setting a new time: ticks are not undoable.
+    if state.ended_session is None:
+        return state
+    return _record_runs(state, [state.ended_session])
+
+
 def _move_new_timestamp_to_old_timestamp(state: state_lib.State) -> state_lib.State:
     if state.new_timestamp is not None:
         return dataclasses.replace(
@@ -124,23 +347,187 @@ def handle_clicks(
         .then(_on_click(state_lib.Button.LEFT, _on_left_click))
         .then(_on_click(state_lib.Button.SCROLL_UP, _on_scroll_up))
         .then(_on_click(state_lib.Button.SCROLL_DOWN, _on_scroll_down))
+        .then(_on_click(state_lib.Button.BACK, _undo))
+        .then(_on_click(state_lib.Button.FORWARD, _redo))
     ).run(init_state)
 
+    return _record_history(init_state, state).reset_transient_state()
+
+
+def _record_history(
+    init_state: state_lib.State, state: state_lib.State
+) -> state_lib.State:
+    if state.history is not init_state.history:
+        # undo / redo already moved through the history.
+        return state
+    run = state.ended_session
+    history = state.history.record(init_state, state, run)
+    if history is state.history:
+        # not undoable (`undo_depth=0`): the run can be recorded right away.
+        return _record_runs(state, [run] if run else [])
+    # runs of changes that can no longer be undone.
+    state = _record_runs(state, state.history.settled())
+    return dataclasses.replace(state, history=history)
+
+
+def _undo(state: state_lib.State) -> state_lib.State:
+    undone = state.history.undo(state)
+    if undone is not state and undone.history.moved_run(undone=True) is not None:
+        undone = dataclasses.replace(undone, usage=undone.usage.reopen_session())
+    _emit_transition(state, undone, source='undo')
+    return undone
+
+
+def _redo(state: state_lib.State) -> state_lib.State:
+    redone = state.history.redo(state)
+    if redone is not state and redone.history.moved_run(undone=False) is not None:
+        now = state.new_timestamp
+        if now is None:
+            now = state.old_timestamp
+        redone = dataclasses.replace(redone, usage=redone.usage.end_session(now))
+    _emit_transition(state, redone, source='redo')
+    return redone
+
+
+def _emit_transition(before: state_lib.State, after: state_lib.State, **fields):
+    """Emits the lifecycle event of a change of `timer_state`, if any."""
+    if before.timer_state == after.timer_state:
+        return
+    match after.timer_state:
+        case state_lib.TimerState.RUNNING:
+            paused = before.timer_state == state_lib.TimerState.PAUSED
+            event = 'resume' if paused else 'start'
+        case state_lib.TimerState.PAUSED:
+            event = 'pause'
+        case _:
+            event = 'reset'
+    _emit(after, event, **fields)
+
+
+def handle_click_batch(
+    init_state: state_lib.State,
+    buttons: Sequence[state_lib.Button],
+    positions: Sequence[float | None] | None = None,
+) -> state_lib.State:
+    """Applies `buttons` in order, as `handle_clicks` would one by one.
+
+    Each click is its own undo step and emits its own hook events, so the
+    result is exactly that of separate clicks: only rendering, which costs
+    far more than a click, is left for the whole burst.
+
+    Args:
+        positions: where each click landed (see `State.click_x`), if known.
+    """
+    state = init_state
+    positions = positions or [None] * len(buttons)
+    for button, x in zip(buttons, positions):
+        if button != state_lib.Button.NONE:
+            state = handle_clicks(dataclasses.replace(state, click_x=x), button)
     return state
 
 
 def _on_left_click(state: state_lib.State) -> state_lib.State:
-    if state.timer_state == state_lib.TimerState.RUNNING:
-        return dataclasses.replace(state, timer_state=state_lib.TimerState.PAUSED)
-    return dataclasses.replace(state, timer_state=state_lib.TimerState.RUNNING)
+    action = zones_lib.hit(state.zones, state.click_x)
+    if action is not None:
+        return _zone_mutation(action)(state)
+    return _toggle(state)
+
+
+def _toggle(state: state_lib.State) -> state_lib.State:
+    match state.timer_state:
+        case state_lib.TimerState.RUNNING:
+            event, timer_state = 'pause', state_lib.TimerState.PAUSED
+        case state_lib.TimerState.PAUSED:
+            event, timer_state = 'resume', state_lib.TimerState.RUNNING
+        case _:
+            event, timer_state = 'start', state_lib.TimerState.RUNNING
+    state = dataclasses.replace(state, timer_state=timer_state)
+    _emit(state, event)
+    return state
 
 
 def _on_right_click(state: state_lib.State) -> state_lib.State:
+    if (
+        state.mode == state_lib.TimerMode.STOPWATCH
+        and state.timer_state == state_lib.TimerState.RUNNING
+    ):
+        return _record_lap(state)
+    return _reset(state)
+
+
+def _reset(state: state_lib.State) -> state_lib.State:
+    if state.timer_state != state_lib.TimerState.STOPPED or state.elapsed_time:
+        # with the elapsed time it was reset from.
+        _emit(state, 'reset')
     return dataclasses.replace(
-        state,
+        _end_session(state),
         timer_state=state_lib.TimerState.STOPPED,
         elapsed_time=0,
+        laps=laps_lib.Laps(capacity=state.lap_capacity),
+    )
+
+
+def _zone_mutation(
+    action: str,
+) -> Callable[[state_lib.State], state_lib.State]:
+    match action:
+        case 'toggle':
+            return _toggle
+        case 'reset':
+            return _reset
+        case 'next_preset':
+            return lambda state: _cycle_preset(state, 1)
+        case 'previous_preset':
+            return lambda state: _cycle_preset(state, -1)
+        case 'toggle_format':
+            return _toggle_format
+        case 'undo':
+            return _undo
+        case 'redo':
+            return _redo
+    if action.startswith(zones_lib.INPUT_ACTION):
+        # e.g. `input:+5m`, as if typed at the middle click input.
+        text = action[len(zones_lib.INPUT_ACTION) :]
+        return _input_intake_mutation(*input_parser.parse_input(text))
+    raise exceptions.BadValue(f"unknown zone action '{action}'")
+
+
+def _cycle_preset(state: state_lib.State, step: int) -> state_lib.State:
+    if not state.preset_file:
+        raise exceptions.BadValue('preset zones need a preset_file')
+    import presets
+
+    batches = list(presets.load_catalog(state.preset_file).batches.values())
+    if not batches:
+        return state
+    names = [presets.batch_name(batch) for batch in batches]
+    if state.timer_name in names:
+        index = (names.index(state.timer_name) + step) % len(batches)
+    else:
+        index = 0 if step > 0 else -1
+    for input_type, args in batches[index]:
+        state = _input_intake_mutation(input_type, args)(state)
+    return state
+
+
+_FORMAT_SPECS = re.compile(r':(clock|pretty)}')
+
+
+def _toggle_format(state: state_lib.State) -> state_lib.State:
+    """Swaps the `clock` and `pretty` formats of `text_format`."""
+    text_format = _FORMAT_SPECS.sub(
+        lambda m: ':pretty}' if m.group(1) == 'clock' else ':clock}',
+        state.text_format,
     )
+    return dataclasses.replace(state, text_format=text_format)
+
+
+def _record_lap(state: state_lib.State) -> state_lib.State:
+    # clicks don't usually account for the time since the last tick, but
+    # laps should be measured up to the click itself.
+    state = _increase_elapsed_time_if_running(state)
+    state = _move_new_timestamp_to_old_timestamp(state)
+    return dataclasses.replace(state, laps=state.laps.record(state.elapsed_time))
 
 
 def _on_scroll_up(state: state_lib.State) -> state_lib.State:
@@ -175,7 +562,9 @@ def _input_intake_mutation(
                 return dataclasses.replace(state, text_format=new_text_format)
 
             case input_parser.InputType.TIME_SET:
-                return dataclasses.replace(state, start_time=args[0], elapsed_time=0)
+                return dataclasses.replace(
+                    _end_session(state), start_time=args[0], elapsed_time=0
+                )
 
             case input_parser.InputType.TIME_ADDITION:
                 return dataclasses.replace(
@@ -188,15 +577,85 @@ def _input_intake_mutation(
                 )
             case input_parser.InputType.VOID:
                 return state
+            case input_parser.InputType.UNDO:
+                return _undo(state)
+            case input_parser.InputType.REDO:
+                return _redo(state)
         raise exceptions.BadValue(f'unrecognized input {input}')
 
     return _mutation
 
 
+def _read_input(
+    state: state_lib.State, read: Callable[[str | list[str]], str]
+) -> tuple[str, state_lib.State]:
+    key = failures_lib.hash_key(state.read_input_command)
+    failure = state.failures.active(key, state.new_timestamp)
+    if failure is not None:
+        error = exceptions.CommandFailed(failure.message)
+        error.failure_key = key
+        raise error
+    try:
+        input = read(state.build_read_input_command())
+    except subprocess.CalledProcessError as e:
+        error = exceptions.CommandFailed(
+            f'read_input_command exited with {e.returncode}'
+        )
+        error.failure_key = key
+        raise error from e
+    except OSError as e:
+        # e.g. not found, without a shell to report it.
+        error = exceptions.CommandFailed(f"can't run read_input_command: {e}")
+        error.failure_key = key
+        raise error from e
+    return input, dataclasses.replace(state, failures=state.failures.clear(key))
+
+
 def _on_middle_click(state: state_lib.State) -> state_lib.State:
     if not state.read_input_command:
         return state
-    input = _INPUT_READ_CALLER(state.build_read_input_command())
+    callers = _callers(state)
+    if state.preset_file:
+        import presets
+
+        catalog = presets.load_catalog(state.preset_file)
+        input, state = _read_input(
+            state, lambda command: callers.read_menu(command, catalog.menu)
+        )
+        return _apply_input(state, input, catalog)
+    input, state = _read_input(state, callers.read_input)
+    return _apply_input(state, input)
+
+
+def _apply_input(
+    state: state_lib.State, input: str, catalog: 'presets.Catalog | None' = None
+) -> state_lib.State:
+    state = _parsed_input_mutation(state, input, catalog)
+    _emit(state, 'input', input=input.strip())
+    return state
+
+
+def _parsed_input_mutation(
+    state: state_lib.State, input: str, catalog: 'presets.Catalog | None'
+) -> state_lib.State:
+    if catalog is not None:
+        batch = catalog.lookup(input)
+        if batch is not None:
+            # presets were parsed and validated when the catalog was loaded.
+            for input_type, args in batch:
+                state = _input_intake_mutation(input_type, args)(state)
+            return state
     input_type, args = input_parser.parse_input(input)
     _mutation = _input_intake_mutation(input_type, args)
     return _mutation(state)
+
+
+def handle_input(init_state: state_lib.State, input: str) -> state_lib.State:
+    """Applies `input` as if `read_input_command` had returned it."""
+    catalog = None
+    if init_state.preset_file:
+        import presets
+
+        catalog = presets.load_catalog(init_state.preset_file)
+    state = _apply_input(init_state, input, catalog)
+    return _record_history(init_state, state).reset_transient_state()
@@ -1,3 +1,5 @@
+import dataclasses
+import random
 import unittest
 
 import exceptions
@@ -229,6 +231,308 @@ class StateMutationsTest(unittest.TestCase):
         # assert time doesn't pass during click events
         self.assertEqual(0, later.elapsed_time)
 
+    def test_record_lap_on_right_click_if_stopwatch_is_running(self):
+        init = state.load_state(
+            {
+                'mode': 'stopwatch',
+                'timer_state': state.TimerState.RUNNING,
+                'elapsed_time': '60',
+                'old_timestamp': 0,
+            },
+            now=5,
+        )
+
+        later = state_mutations._on_right_click(init)
+        self.assertEqual(state.TimerState.RUNNING, later.timer_state)
+        self.assertEqual(65, later.elapsed_time)
+        self.assertEqual(5, later.old_timestamp)
+        self.assertEqual(1, later.laps.count)
+        self.assertEqual(65, later.laps.last)
+
+        # laps survive the i3blocks round trip (configuration stays in the
+        # environment).
+        later = state.load_state(
+            {'mode': 'stopwatch', **later.serializable()}, now=35
+        )
+        later = state_mutations._on_right_click(later)
+        self.assertEqual(2, later.laps.count)
+        self.assertEqual(30, later.laps.last)
+        self.assertEqual(30, later.laps.best)
+        self.assertEqual(
+            '2 00:30 30s',
+            later.formatted('{lap_count} {last_lap:clock} {best_lap:pretty}'),
+        )
+
+    def test_reset_stopwatch_and_laps_on_right_click_if_paused(self):
+        init = state.load_state(
+            {
+                'mode': 'stopwatch',
+                'timer_state': state.TimerState.PAUSED,
+                'elapsed_time': '60',
+                'lap_count': '3',
+            },
+            now=0,
+        )
+
+        later = state_mutations._on_right_click(init)
+        self.assertEqual(state.TimerState.STOPPED, later.timer_state)
+        self.assertEqual(0, later.elapsed_time)
+        self.assertEqual(0, later.laps.count)
+
+    def test_stopwatch_does_not_trigger_alarm_cmd(self):
+        init = state.load_state(
+            {
+                'mode': 'stopwatch',
+                'timer_state': state.TimerState.RUNNING,
+                'start_time': 300,
+                'elapsed_time': 299,
+                'old_timestamp': 0,
+            },
+            now=2,
+        )
+
+        later = state_mutations._increase_elapsed_time_if_running(init)
+        self.assertFalse(later.execute_alert_command)
+
+    def test_usage_accrues_while_running_and_sessions_end_on_reset(self):
+        init = state.load_state(
+            {
+                'timer_state': state.TimerState.RUNNING,
+                'elapsed_time': '60',
+                'old_timestamp': 1_700_000_000,
+            },
+            now=1_700_000_030,
+        )
+
+        later = state_mutations.handle_increments(init)
+        self.assertEqual(30, later.usage.today_total)
+        self.assertEqual(30, later.usage.week_total)
+
+        later = state.load_state(later.serializable(), now=1_700_000_031)
+        later = state_mutations._on_right_click(later)
+        self.assertEqual(1, later.usage.sessions_today)
+        self.assertEqual(
+            '30s 1', later.formatted('{today_total:pretty} {sessions_today}')
+        )
+
+    def test_click_batch_matches_clicks_one_by_one(self):
+        events = []
+
+        def _emit(state, event, fields):
+            events.append(event)
+
+        emitter = state_mutations._HOOK_EMITTER
+        state_mutations._HOOK_EMITTER = _emit
+        self.addCleanup(setattr, state_mutations, '_HOOK_EMITTER', emitter)
+        rng = random.Random(42)
+        buttons = [
+            state.Button.LEFT,
+            state.Button.RIGHT,
+            state.Button.SCROLL_UP,
+            state.Button.SCROLL_DOWN,
+            state.Button.BACK,
+        ]
+        for timer_state in state.TimerState:
+            for _ in range(50):
+                clicks = rng.choices(
+                    buttons, weights=[3, 1, 4, 4, 1], k=rng.randint(0, 12)
+                )
+                init = state.load_state(
+                    {
+                        'timer_state': timer_state,
+                        'start_time': '60',
+                        'elapsed_time': '10',
+                        'hook_command': 'tracker',
+                    },
+                    now=0,
+                )
+                one_by_one = init
+                for button in clicks:
+                    one_by_one = state_mutations.handle_clicks(one_by_one, button)
+                one_by_one_events = events[:]
+                events.clear()
+
+                batched = state_mutations.handle_click_batch(init, clicks)
+
+                # history included.
+                self.assertEqual(one_by_one, batched, clicks)
+                self.assertEqual(one_by_one_events, events, clicks)
+                events.clear()
+
+    def test_click_batch_merges_scroll_storms(self):
+        init = state.load_state({'start_time': '120', 'increments': '60'}, now=0)
+        clicks = [state.Button.SCROLL_DOWN] * 5 + [state.Button.SCROLL_UP] * 3
+
+        later = state_mutations.handle_click_batch(init, clicks)
+
+        self.assertEqual(180, later.start_time)
+
+    def test_every_crossed_alarm_fires_once_in_order(self):
+        launched = []
+        alarm_caller = state_mutations._ALARM_CALLER
+        state_mutations._ALARM_CALLER = launched.append
+        self.addCleanup(setattr, state_mutations, '_ALARM_CALLER', alarm_caller)
+        init = state.load_state(
+            {
+                'timer_state': state.TimerState.RUNNING,
+                'start_time': 600,
+                'elapsed_time': 0,
+                'old_timestamp': 0,
+                'alarm_thresholds': '-5m,0,+5m',
+                'alarm_command': 'up {timer_name}',
+                'alarm_command_1': 'warn',
+                'alarm_command_3': 'nag',
+            },
+            now=900,
+        )
+
+        later = state_mutations.handle_increments(init)
+
+        self.assertEqual(['warn', 'up timer', 'nag'], launched)
+        self.assertEqual((), later.fired_alarms)
+
+        later = state_mutations.handle_increments(
+            dataclasses.replace(later, new_timestamp=1000)
+        )
+        self.assertEqual(3, len(launched))
+
+    def test_undo_and_redo_right_click(self):
+        init = state.load_state(
+            {
+                'timer_state': state.TimerState.RUNNING,
+                'elapsed_time': '240',
+                'start_time': '300',
+                'old_timestamp': '0',
+            },
+            now=0,
+        )
+
+        reset = state_mutations.handle_clicks(init, state.Button.RIGHT)
+        self.assertEqual(0, reset.elapsed_time)
+        self.assertEqual(1, reset.usage.sessions_today)
+
+        # the history survives the i3blocks round trip.
+        reset = state.load_state(reset.serializable(), now=1)
+        undone = state_mutations.handle_clicks(reset, state.Button.BACK)
+        self.assertEqual(240, undone.elapsed_time)
+        self.assertEqual(state.TimerState.RUNNING, undone.timer_state)
+        # the session goes on.
+        self.assertEqual(0, undone.usage.sessions_today)
+
+        redone = state_mutations.handle_clicks(undone, state.Button.FORWARD)
+        self.assertEqual(0, redone.elapsed_time)
+        self.assertEqual(state.TimerState.STOPPED, redone.timer_state)
+        self.assertEqual(1, redone.usage.sessions_today)
+
+        # nothing left to redo.
+        self.assertEqual(
+            redone, state_mutations.handle_clicks(redone, state.Button.FORWARD)
+        )
+
+    def test_undo_a_new_time(self):
+        init = state.load_state(
+            {
+                'timer_state': state.TimerState.RUNNING,
+                'elapsed_time': '240',
+                'start_time': '300',
+                'old_timestamp': '0',
+            },
+            now=0,
+        )
+
+        later = state_mutations.handle_input(init, '10m')
+        self.assertEqual((600, 0), (later.start_time, later.elapsed_time))
+        later = state_mutations.handle_input(later, 'undo')
+
+        self.assertEqual((300, 240), (later.start_time, later.elapsed_time))
+        self.assertEqual(0, later.usage.sessions_today)
+
+    def test_undo_restores_laps(self):
+        init = state.load_state(
+            {
+                'mode': 'stopwatch',
+                'timer_state': state.TimerState.RUNNING,
+                'elapsed_time': '30',
+                'old_timestamp': '0',
+            },
+            now=0,
+        )
+        lapped = state_mutations.handle_clicks(init, state.Button.RIGHT)
+        paused = state_mutations.handle_clicks(lapped, state.Button.LEFT)
+
+        reset = state_mutations.handle_clicks(paused, state.Button.RIGHT)
+        self.assertEqual(0, reset.laps.count)
+        undone = state_mutations.handle_clicks(reset, state.Button.BACK)
+
+        self.assertEqual(lapped.laps, undone.laps)
+
+    def test_runs_are_recorded_once_they_cannot_be_undone(self):
+        runs = []
+        record_estimate = state_mutations._ESTIMATE_RECORDER
+        state_mutations._ESTIMATE_RECORDER = lambda path, name, run: runs.append(run)
+        self.addCleanup(
+            setattr, state_mutations, '_ESTIMATE_RECORDER', record_estimate
+        )
+        later = state.load_state(
+            {
+                'timer_state': state.TimerState.RUNNING,
+                'elapsed_time': '240',
+                'old_timestamp': '0',
+                'estimates_file': '/dev/null',
+                'undo_depth': '2',
+            },
+            now=0,
+        )
+
+        later = state_mutations.handle_clicks(later, state.Button.RIGHT)
+        later = state_mutations.handle_clicks(later, state.Button.SCROLL_UP)
+        self.assertEqual([], runs)
+        # the reset drops out of the history.
+        later = state_mutations.handle_clicks(later, state.Button.SCROLL_UP)
+        self.assertEqual([240], runs)
+
+        # undone runs are never recorded.
+        later = state_mutations.handle_clicks(later, state.Button.LEFT)
+        later = dataclasses.replace(later, elapsed_time=60)
+        later = state_mutations.handle_clicks(later, state.Button.RIGHT)
+        later = state_mutations.handle_clicks(later, state.Button.BACK)
+        for _ in range(3):
+            later = state_mutations.handle_clicks(later, state.Button.SCROLL_UP)
+        self.assertEqual([240], runs)
+
+    def test_undo_through_input(self):
+        user_input = None
+        read_input = state_mutations._INPUT_READ_CALLER
+        state_mutations._INPUT_READ_CALLER = lambda cmd: user_input
+        self.addCleanup(setattr, state_mutations, '_INPUT_READ_CALLER', read_input)
+        init = state.load_state(
+            {'read_input_command': 'whatever', 'start_time': '300'}, now=0
+        )
+
+        user_input = 'timer_name=oops'
+        later = state_mutations.handle_clicks(init, state.Button.MIDDLE)
+        user_input = '1h'
+        later = state_mutations.handle_clicks(later, state.Button.MIDDLE)
+        user_input = 'undo'
+        later = state_mutations.handle_clicks(later, state.Button.MIDDLE)
+        self.assertEqual(300, later.start_time)
+        self.assertEqual('oops', later.timer_name)
+        later = state_mutations.handle_clicks(later, state.Button.MIDDLE)
+        self.assertEqual('timer', later.timer_name)
+
+        user_input = 'redo'
+        later = state_mutations.handle_clicks(later, state.Button.MIDDLE)
+        self.assertEqual('oops', later.timer_name)
+
+    def test_undo_history_is_bounded(self):
+        later = state.load_state({'undo_depth': '3', 'start_time': '0'}, now=0)
+        for _ in range(10):
+            later = state_mutations.handle_clicks(later, state.Button.SCROLL_UP)
+        for _ in range(10):
+            later = state_mutations.handle_clicks(later, state.Button.BACK)
+
+        self.assertEqual(420, later.start_time)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -46,6 +46,19 @@ class StateTest(unittest.TestCase):
         with self.assertRaises(exceptions.BadInteger):
             state.get_int({'key': 'not_an_int'}, 'key', 42.0)
 
+    def test_get_bool(self):
+        self.assertTrue(state.get_bool({'key': 'true'}, 'key', False))
+        self.assertTrue(state.get_bool({'key': 'Yes'}, 'key', False))
+        self.assertFalse(state.get_bool({'key': '0'}, 'key', True))
+        self.assertFalse(state.get_bool({'key': False}, 'key', True))
+
+    def test_get_default_bool(self):
+        self.assertTrue(state.get_bool({}, 'key', True))
+
+    def test_get_bad_bool(self):
+        with self.assertRaises(exceptions.BadBoolean):
+            state.get_bool({'key': 'not_a_bool'}, 'key', True)
+
     def test_get_enum(self):
         self.assertEqual(
             TestEnum.UNO, state.get_enum({'key': 'uno'}, 'key', TestEnum.NADA)
@@ -61,6 +74,23 @@ class StateTest(unittest.TestCase):
         with self.assertRaises(exceptions.BadEnum):
             state.get_enum({'key': 'not_an_enum'}, 'key', TestEnum.NADA)
 
+    def test_placeholders(self):
+        loaded = state.load_state({'timer_state': 'paused'}, now=0)
+
+        self.assertEqual(state.PLACEHOLDERS, loaded.placeholders().keys())
+        self.assertEqual(
+            'paused',
+            loaded.formatted('{?running}running{/}{paused?paused}{?stopped}x{/}'),
+        )
+
+    def test_templates_are_validated_in_every_branch(self):
+        loaded = state.load_state({}, now=0)
+
+        with self.assertRaisesRegex(exceptions.BadFormat, 'Bad key'):
+            loaded.formatted('{?running}{nope}{/running}')
+        with self.assertRaisesRegex(exceptions.BadFormat, 'Bad syntax'):
+            state.reload_config(loaded, {'text_format': '{?running}unclosed'})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,18 @@
+"""Helpers shared by the tests."""
+import tempfile
+import unittest
+
+
+class FakeClock:
+    def __init__(self, now: float = 0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def temp_dir(test: unittest.TestCase) -> str:
+    """A temporary directory, removed once `test` is done."""
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    return directory.name
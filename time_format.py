@@ -1,5 +1,10 @@
+from collections.abc import Mapping
+import functools
+import operator
+import re
 import string
 import logging
+from typing import Any, Callable
 
 
 class Formatter(string.Formatter):
@@ -17,6 +22,273 @@ class Formatter(string.Formatter):
 
 FORMATTER = Formatter()
 
+Template = Callable[[Mapping[str, Any]], str]
+
+# delimit the text of click zones until `zones.extract` takes them out.
+ZONE_START = '\x02'
+ZONE_SEP = '\x03'
+ZONE_END = '\x04'
+
+
+@functools.lru_cache(maxsize=64)
+def compile_template(
+    text: str,
+    names: frozenset[str] | None = None,
+    is_action: Callable[[str], bool] | None = None,
+) -> Template:
+    """Parses `text` once into a function of the placeholder values.
+
+    On top of what `FORMATTER.format(text, **values)` renders, templates
+    may hold conditional sections and selections:
+
+        {?running}{timer_name} {/running}
+        {!running}idle{/running}
+        {remaining_time<0?-{remaining_time:clock}:{remaining_time:clock}}
+
+    i.e. `{?<condition>}...{/}` (or `{/<condition>}`) renders its body only
+    if the condition holds, `{!<condition>}...{/}` only if it does not, and
+    `{<condition>?<if true>:<if false>}` one of two nested templates.
+    `{#<action>}...{/}` marks its body as a click zone, see `zones`. A
+    condition is a placeholder, true unless zero or empty, or a comparison
+    (`<`, `<=`, `==`, `!=`, `>=`, `>`) of a placeholder with a number, a
+    quoted string or another placeholder.
+
+    Raises:
+        SyntaxError: on malformed sections, selections or conditions.
+        KeyError: if given the placeholder `names`, on any other name,
+            even in a branch that is not rendered.
+        ValueError: if given `is_action`, on a zone action it rejects.
+    """
+    template, referenced, actions = _compile(text)
+    if names is not None and not referenced <= names:
+        raise KeyError(min(referenced - names))
+    if is_action is not None:
+        for action in sorted(actions):
+            if not is_action(action):
+                raise ValueError(f"unknown zone action '{action}'")
+    return template
+
+
+def template_names(text: str) -> frozenset[str]:
+    """Placeholders `text` refers to, in any branch."""
+    return _compile(text)[1]
+
+
+@functools.lru_cache(maxsize=64)
+def _compile(text: str) -> tuple[Template, frozenset[str], frozenset[str]]:
+    """The template, its placeholder names and its zone actions."""
+    names = set()
+    if '?' in text or '{/' in text or '{#' in text:
+        actions = set()
+        parts, _ = _parse(text, 0, None, names, actions)
+        return _join(parts), frozenset(names), frozenset(actions)
+    try:
+        return _compile_fields(text, names), frozenset(names), frozenset()
+    except ValueError as e:
+        # e.g. a single '}'.
+        raise SyntaxError(f'{e} in {text!r}')
+
+
+def _compile_fields(text: str, names: set[str]) -> Template:
+    parts = []
+    for literal, field_name, format_spec, conversion in FORMATTER.parse(text):
+        if literal:
+            parts.append(literal)
+        if field_name is None:
+            continue
+        names.add(field_name.partition('.')[0].partition('[')[0])
+        if not field_name.isidentifier() or '{' in format_spec:
+            # positional and nested fields, attribute and index lookups
+            # are left to the regular formatter.
+            return lambda values: FORMATTER.vformat(text, (), values)
+        parts.append(_compile_field(field_name, format_spec, conversion))
+    return _join(parts)
+
+
+def _join(parts: list[str | Template]) -> Template:
+    if all(isinstance(part, str) for part in parts):
+        rendered = ''.join(parts)
+        return lambda values: rendered
+    if len(parts) == 1:
+        return parts[0]
+
+    def _render(values: Mapping[str, Any]) -> str:
+        return ''.join(
+            part if isinstance(part, str) else part(values) for part in parts
+        )
+
+    return _render
+
+
+def _compile_field(
+    field_name: str, format_spec: str, conversion: str | None
+) -> Template:
+    format_field = FORMATTER.format_field
+    if conversion:
+        convert_field = FORMATTER.convert_field
+        return lambda values: format_field(
+            convert_field(values[field_name], conversion), format_spec
+        )
+    return lambda values: format_field(values[field_name], format_spec)
+
+
+def _closing_brace(text: str, start: int) -> int:
+    """Index of the `}` matching the `{` at `start`."""
+    depth = 0
+    for index in range(start, len(text)):
+        if text[index] == '{':
+            depth += 1
+        elif text[index] == '}':
+            depth -= 1
+            if depth == 0:
+                return index
+    raise SyntaxError(f"unclosed '{{' in {text!r}")
+
+
+def _top_level(text: str, char: str) -> int:
+    """Index of the first `char` of `text` outside of braces, or -1."""
+    depth = 0
+    for index, c in enumerate(text):
+        if c == '{':
+            depth += 1
+        elif c == '}':
+            depth -= 1
+        elif c == char and depth == 0:
+            return index
+    return -1
+
+
+def _is_format_spec(head: str) -> bool:
+    """Whether the text before a `?` is a field name and its format spec."""
+    return ':' in head and not _CONDITION.fullmatch(head)
+
+
+def _parse(
+    text: str, position: int, section: str | None, names: set[str], actions: set[str]
+) -> tuple[list[str | Template], int]:
+    """Parses up to the end of `section` (or of `text` for None)."""
+    parts = []
+    literal = []
+    while position < len(text):
+        c = text[position]
+        if c == '}':
+            if not text.startswith('}}', position):
+                raise SyntaxError(f"single '}}' in {text!r}")
+            literal.append('}')
+            position += 2
+            continue
+        if c != '{':
+            literal.append(c)
+            position += 1
+            continue
+        if text.startswith('{{', position):
+            literal.append('{')
+            position += 2
+            continue
+
+        end = _closing_brace(text, position)
+        tag = text[position + 1 : end]
+        position = end + 1
+        if literal:
+            parts.append(''.join(literal))
+            literal = []
+        if tag.startswith('/'):
+            if section is None or tag[1:] not in ('', section):
+                raise SyntaxError(f'unexpected {{{tag}}} in {text!r}')
+            return parts, position
+        if tag.startswith('#'):
+            action = tag[1:].strip()
+            if not action or any(c in action for c in '{}'):
+                raise SyntaxError(f'bad zone {{{tag}}} in {text!r}')
+            actions.add(action)
+            body, position = _parse(text, position, tag, names, actions)
+            parts.append(_zone(action, _join(body)))
+            continue
+        if tag[:1] in ('?', '!'):
+            condition = _compile_condition(tag[1:], names)
+            body, position = _parse(text, position, tag[1:], names, actions)
+            parts.append(_section(condition, _join(body), tag[0] == '?'))
+            continue
+        question = _top_level(tag, '?')
+        if question != -1 and _is_format_spec(tag[:question]):
+            # e.g. `{timer_name:?>10}`, with '?' as the fill character.
+            question = -1
+        if question == -1:
+            try:
+                parts.append(_compile_fields(f'{{{tag}}}', names))
+            except ValueError as e:
+                raise SyntaxError(f'{e} in {text!r}')
+            continue
+        condition = _compile_condition(tag[:question], names)
+        branches = tag[question + 1 :]
+        colon = _top_level(branches, ':')
+        if colon == -1:
+            colon = len(branches)
+        if_true, _ = _parse(branches[:colon], 0, None, names, actions)
+        if_false, _ = _parse(branches[colon + 1 :], 0, None, names, actions)
+        parts.append(_selection(condition, _join(if_true), _join(if_false)))
+
+    if section is not None:
+        raise SyntaxError(f'unclosed {{?{section}}} in {text!r}')
+    if literal:
+        parts.append(''.join(literal))
+    return parts, position
+
+
+def _section(
+    condition: Callable[[Mapping[str, Any]], bool], body: Template, expected: bool
+) -> Template:
+    return lambda values: body(values) if condition(values) == expected else ''
+
+
+def _zone(action: str, body: Template) -> Template:
+    start = f'{ZONE_START}{action}{ZONE_SEP}'
+    return lambda values: f'{start}{body(values)}{ZONE_END}'
+
+
+def _selection(
+    condition: Callable[[Mapping[str, Any]], bool],
+    if_true: Template,
+    if_false: Template,
+) -> Template:
+    return lambda values: if_true(values) if condition(values) else if_false(values)
+
+
+_CONDITION = re.compile(r'\s*(\w+)\s*(?:(<=|>=|==|!=|<|>)\s*(.*?))?\s*')
+_COMPARISONS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
+
+
+def _compile_condition(
+    text: str, names: set[str]
+) -> Callable[[Mapping[str, Any]], bool]:
+    match = _CONDITION.fullmatch(text)
+    if not match:
+        raise SyntaxError(f'bad condition {text!r}')
+    name, comparison, operand = match.groups()
+    names.add(name)
+    if comparison is None:
+        return lambda values: bool(values[name])
+
+    compare = _COMPARISONS[comparison]
+    if operand[:1] in ('"', "'") and operand[-1:] == operand[:1] and len(operand) > 1:
+        string = operand[1:-1]
+        return lambda values: compare(str(values[name]), string)
+    try:
+        number = float(operand)
+    except ValueError:
+        if not operand.isidentifier():
+            raise SyntaxError(f'bad operand {operand!r} in condition {text!r}')
+        names.add(operand)
+        return lambda values: compare(values[name], values[operand])
+    return lambda values: compare(float(values[name]), number)
+
 
 def seconds_to_clock_format(secs: int) -> str:
     res = ''
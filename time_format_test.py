@@ -70,6 +70,100 @@ class FormatterTest(unittest.TestCase):
             with self.subTest(expected, secs=secs, expected=expected):
                 self.assertEqual(expected, format('{time:clock}', time=secs))
 
+    def test_compiled_templates_match_the_formatter(self):
+        values = {'name': 'code review', 'time': 299.56, 'count': 3}
+        templates = [
+            '',
+            'no placeholders',
+            '{time:pretty}/{time:clock}',
+            '{name:.6} {time:.1f}s',
+            '{name!r:>20} {{literal}} {count:03d}',
+            '{name[0]} {name.upper}',
+            '{time:{count}}',
+        ]
+        for template in templates:
+            with self.subTest(template):
+                self.assertEqual(
+                    time_format.FORMATTER.format(template, **values),
+                    time_format.compile_template(template)(values),
+                )
+
+    def test_compiled_templates_raise_on_missing_keys(self):
+        with self.assertRaises(KeyError):
+            time_format.compile_template('{missing}')({})
+
+    def test_sections(self):
+        template = time_format.compile_template(
+            '{?running}{name} {/running}{!running}idle {/}{time:clock}'
+        )
+
+        self.assertEqual(
+            'tea 05:00', template({'running': True, 'name': 'tea', 'time': 300})
+        )
+        self.assertEqual(
+            'idle 05:00', template({'running': False, 'name': 'tea', 'time': 300})
+        )
+
+    def test_selections(self):
+        template = time_format.compile_template(
+            "{time<0?<span color='red'>{time:clock}</span>:{time:clock}} "
+            "{name=='tea'?cuppa:{name}} {count>=limit?full}"
+        )
+        values = {'name': 'tea', 'time': -65, 'count': 3, 'limit': 3}
+
+        self.assertEqual(
+            "<span color='red'>-01:05</span> cuppa full", template(values)
+        )
+        self.assertEqual(
+            '01:05 work ',
+            template({**values, 'name': 'work', 'time': 65, 'limit': 4}),
+        )
+
+    def test_question_marks_in_format_specs(self):
+        values = {'name': 'tea', 'n': 3}
+        for template, expected in [
+            ('{name:?>6}', '???tea'),
+            ('{n:?^5} done?', '??3?? done?'),
+            ("{name=='a:b'?x:{name:?<4}}", 'tea?'),
+        ]:
+            with self.subTest(template):
+                self.assertEqual(
+                    expected, time_format.compile_template(template)(values)
+                )
+
+    def test_literals_around_conditionals(self):
+        template = time_format.compile_template('done? {{{?n}{n}{/n}}}')
+
+        self.assertEqual('done? {3}', template({'n': 3}))
+        self.assertEqual('done? {}', template({'n': 0}))
+
+    def test_names_are_validated_in_every_branch(self):
+        template = '{?running}{name}{/running}{time<limit?{late}:x}'
+
+        self.assertEqual(
+            frozenset(('running', 'name', 'time', 'limit', 'late')),
+            time_format.template_names(template),
+        )
+        with self.assertRaisesRegex(KeyError, 'late'):
+            time_format.compile_template(
+                template, frozenset(('running', 'name', 'time', 'limit'))
+            )
+
+    def test_syntax_errors(self):
+        templates = [
+            '{?running}never closed',
+            '{?running}x{/paused}',
+            'x{/running}',
+            '{time<?a:b}',
+            '{time<a b?a:b}',
+            '{?time<<0}x{/}',
+            '{unclosed',
+            'single }',
+        ]
+        for template in templates:
+            with self.subTest(template), self.assertRaises(SyntaxError):
+                time_format.compile_template(template)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,32 +1,174 @@
 #!/usr/bin/env python3
+from collections.abc import Mapping
+import dataclasses
+import functools
 import json
 import os
+import sys
 import logging
+import time
+from typing import Any, Callable, Sequence
 import logging_settings
 
 import state as state_lib
 import state_mutations
 
 
-if __name__ == '__main__':
-    log_file = os.getenv('log_file')
-    if log_file:
-        logging_settings.log_to_file(log_file)
-    button = state_lib.Button(os.environ.get('button'))
-    state = state_lib.load_state(os.environ, state_lib.now())
+def run(
+    mapping: Mapping[str, str], clock: Callable[[], float] = state_lib.now
+) -> dict[str, Any]:
+    """Runs a single i3blocks invocation.
+
+    Args:
+        mapping: the i3blocks environment (configuration, round-tripped
+            state and the clicked `button`, if any).
+        clock: source of timestamps.
+
+    Returns:
+        The i3blocks JSON output as a dict.
+    """
+    start = time.perf_counter()
+    button = state_lib.Button(mapping.get('button'))
+    state = state_lib.load_state(mapping, clock())
+    load_seconds = time.perf_counter() - start
+    _, serialized = step(state, button, clock, load_seconds)
+    return serialized
+
+
+def step(
+    state: state_lib.State,
+    button: state_lib.Button,
+    clock: Callable[[], float] = state_lib.now,
+    load_seconds: float = 0.0,
+) -> tuple[state_lib.State, dict[str, Any]]:
+    """Applies a click (or a tick, for `Button.NONE`) and renders the result.
+
+    Args:
+        load_seconds: time spent loading `state`, for metrics.
+
+    Returns:
+        The new state and its i3blocks JSON output.
+    """
+    if button == state_lib.Button.NONE:
+        return _apply(state, state_mutations.handle_increments, clock, load_seconds)
+    return _apply(
+        state,
+        lambda state: state_mutations.handle_clicks(state, button),
+        clock,
+        load_seconds,
+    )
+
+
+def step_clicks(
+    state: state_lib.State,
+    buttons: Sequence[state_lib.Button],
+    clock: Callable[[], float] = state_lib.now,
+    positions: Sequence[float | None] | None = None,
+) -> tuple[state_lib.State, dict[str, Any]]:
+    """Like `step`, but coalesces a burst of clicks into a single render.
+
+    Args:
+        positions: where each click landed, for click zones.
+    """
+    return _apply(
+        state,
+        lambda state: state_mutations.handle_click_batch(state, buttons, positions),
+        clock,
+    )
+
+
+def _apply(
+    state: state_lib.State,
+    mutation: Callable[[state_lib.State], state_lib.State],
+    clock: Callable[[], float],
+    load_seconds: float = 0.0,
+) -> tuple[state_lib.State, dict[str, Any]]:
+    start = time.perf_counter()
+    updated = start
     try:
-        if button != state_lib.Button.NONE:
-          state = state_mutations.handle_clicks(state, button)
-        else:
-          state = state_mutations.handle_increments(state)
-        serialized = state.serializable()
+        state = mutation(state)
+        updated = time.perf_counter()
+        state, serialized = state_mutations.retry_text_format(state)
     except Exception as e:
         logging.exception(e)
         # Since some I/O errors take longer to be generated,
         # refreshing the timestamp is necessary to avoid time-skips or
         # error messages shown for too little.
-        state = state_mutations.add_error(state, e, state_lib.now())
+        state = state_mutations.add_error(state, e, clock())
         serialized = state.serializable()
-    finally:
-        logging.debug(serialized)
-        print(json.dumps(serialized), flush=True)
+    zones = serialized.get('zones', '')
+    if zones != state.zones:
+        # clicks are hit-tested against what was displayed last.
+        state = dataclasses.replace(state, zones=zones)
+    # features are only imported when configured, to keep ticks fast.
+    if state.metrics_file:
+        import metrics
+
+        rendered = time.perf_counter()
+        state, serialized = metrics.observe(
+            state,
+            serialized,
+            (load_seconds, updated - start, rendered - updated),
+            state.new_timestamp or clock(),
+        )
+    if state.refresh_signal is not None:
+        now = state.new_timestamp
+        if now is None:
+            # moved there by a tick.
+            now = state.old_timestamp
+        import refresh
+
+        state, serialized = refresh.schedule(state, serialized, now)
+    if state.output_sinks:
+        import renderers
+
+        renderers.fan_out(state.output_sinks, serialized)
+    logging.debug(serialized)
+    return state, serialized
+
+
+def main(environ: Mapping[str, str]) -> str:
+    """Runs the invocation described by `environ`.
+
+    Returns:
+        The line to print for i3blocks.
+    """
+    profile_file = environ.get('profile_file')
+    if profile_file:
+        import profiling
+
+        return profiling.record(profile_file, lambda: _main(environ))
+    return _main(environ)
+
+
+def _main(environ: Mapping[str, str]) -> str:
+    log_file = environ.get('log_file')
+    if log_file:
+        logging_settings.log_to_file(log_file)
+    runner = run
+    trace_file = environ.get('trace_file')
+    if trace_file:
+        import tracing
+
+        def runner(mapping, clock=state_lib.now):
+            # the mapping `run` steps, e.g. merged with the shared state.
+            return tracing.record(trace_file, mapping, run, clock)
+
+    if state_lib.get_bool(environ, 'shared_state', False):
+        import shared_state
+
+        runner = functools.partial(shared_state.run, runner=runner)
+    return json.dumps(runner(environ))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] in (['snapshot'], ['restore']):
+        import snapshot
+
+        sys.exit(snapshot.main(sys.argv[1:], os.environ))
+    if os.environ.get('interval') == 'persist':
+        import resident
+
+        resident.main(os.environ)
+    else:
+        print(main(os.environ), flush=True)
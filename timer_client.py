@@ -0,0 +1,113 @@
+#!/usr/bin/python3 -S
+"""Thin launcher for `interval=1` blockets.
+
+Forwards the i3blocks environment (which carries the configuration, the
+round-tripped state and the clicked `button`) to a warm `timer_server.py`
+and prints its reply, so an invocation costs a bare interpreter start plus
+a socket round-trip instead of importing the whole timer.
+
+The server is started on demand. While it is not reachable the invocation
+runs in-process, exactly like `timer.py`.
+
+Keep the imports of this module to the bare minimum.
+"""
+import os
+import socket
+import stat
+import sys
+
+SERVER_SCRIPT = 'timer_server.py'
+# where the socket goes without $XDG_RUNTIME_DIR.
+SHARED_TMP = '/tmp'
+
+
+def socket_path(environ) -> str:
+    """Raises OSError if the default directory isn't private to the user."""
+    path = environ.get('server_socket')
+    if path:
+        return path
+    runtime_dir = environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, f'i3blocks-timer-{os.getuid()}.sock')
+    # anyone could bind a predictable path there first: the socket goes in
+    # a directory only the user can enter.
+    directory = os.path.join(SHARED_TMP, f'i3blocks-timer-server-{os.getuid()}')
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or info.st_mode & 0o077
+    ):
+        raise PermissionError(f'{directory} is not private to the user')
+    return os.path.join(directory, 'server.sock')
+
+
+def encode_environ(environ) -> bytes:
+    return b'\0'.join(
+        os.fsencode(key) + b'=' + os.fsencode(value) for key, value in environ.items()
+    )
+
+
+def request(path: str, payload: bytes) -> bytes:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        conn.sendall(payload)
+        conn.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = conn.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def start_server():
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), SERVER_SCRIPT)
+    # the server must not hold on to i3blocks' pipes.
+    devnull = [
+        (os.POSIX_SPAWN_OPEN, fd, os.devnull, os.O_RDWR, 0) for fd in (0, 1, 2)
+    ]
+    os.posix_spawn(
+        sys.executable,
+        [sys.executable, script],
+        os.environ,
+        file_actions=devnull,
+        setsid=True,
+    )
+
+
+def main():
+    environ = os.environ
+    if 'refresh_signal' in environ and 'refresh_pid' not in environ:
+        # the server looks for i3blocks, to signal it, from our parent.
+        environ = {**environ, 'refresh_pid': str(os.getppid())}
+    reply = b''
+    try:
+        path = socket_path(environ)
+    except OSError:
+        # no server, rather than one others could impersonate.
+        path = None
+    if path:
+        try:
+            reply = request(path, encode_environ(environ))
+        except OSError:
+            try:
+                start_server()
+            except OSError:
+                pass
+    if reply:
+        os.write(1, reply)
+        return
+
+    import timer
+
+    print(timer.main(environ), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Warm fork server for `timer_client.py`.
+
+Keeps the timer modules imported and forks a child per request: the child
+adopts the client's environment, runs the invocation exactly like
+`timer.py` would and writes back the line to print. Forking keeps requests
+isolated from each other (logging configuration, a middle click waiting
+on `read_input_command`, ...) while skipping interpreter start and imports.
+
+The server exits after `server_idle_timeout` seconds (default: 600)
+without requests and is started again on demand by the client.
+"""
+import fcntl
+import logging
+import os
+import signal
+import socket
+
+# state_mutations and time_format are imported so forked children find
+# them warm.
+import state
+import state_mutations
+import time_format
+import timer
+import timer_client
+
+
+def decode_environ(payload: bytes) -> dict[str, str]:
+    environ = {}
+    for entry in payload.split(b'\0'):
+        key, sep, value = entry.partition(b'=')
+        if sep:
+            environ[os.fsdecode(key)] = os.fsdecode(value)
+    return environ
+
+
+def _read_all(conn: socket.socket) -> bytes:
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def handle(conn: socket.socket):
+    """Serves one request. Only to be called in a forked child."""
+    environ = decode_environ(_read_all(conn))
+    # commands launched by the timer (alarms, input readers) must see the
+    # client's environment (DISPLAY, PATH, ...).
+    os.environ.clear()
+    os.environ.update(environ)
+    try:
+        line = timer.main(environ)
+    except Exception as e:
+        logging.exception(e)
+        # an empty reply makes the client fall back to in-process execution.
+        return
+    conn.sendall(line.encode('utf-8') + b'\n')
+
+
+def serve(path: str, idle_timeout: float):
+    with open(f'{path}.lock', 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # another server is already up.
+            return
+        # to find the server, e.g. to stop it.
+        lock.write(f'{os.getpid()}\n')
+        lock.flush()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        # children are never waited for.
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(path)
+            server.listen(64)
+            server.settimeout(idle_timeout)
+            try:
+                while True:
+                    try:
+                        conn, _ = server.accept()
+                    except socket.timeout:
+                        return
+                    conn.settimeout(None)
+                    if os.fork() == 0:
+                        server.close()
+                        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                        try:
+                            handle(conn)
+                        finally:
+                            os._exit(0)
+                    conn.close()
+            finally:
+                os.unlink(path)
+
+
+if __name__ == '__main__':
+    serve(
+        timer_client.socket_path(os.environ),
+        state.get_float(os.environ, 'server_idle_timeout', 600.0),
+    )
@@ -0,0 +1,113 @@
+import fcntl
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+from unittest import mock
+
+import testing
+import timer
+import timer_client
+import timer_server
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TimerServerTest(unittest.TestCase):
+    def setUp(self):
+        self.socket_path = os.path.join(testing.temp_dir(self), 'timer.sock')
+        self.environ = {
+            'PATH': os.environ.get('PATH', ''),
+            'server_socket': self.socket_path,
+            'server_idle_timeout': '5',
+            'start_time': '120',
+        }
+        self.addCleanup(self._stop_server)
+
+    def _stop_server(self):
+        lock_path = f'{self.socket_path}.lock'
+        try:
+            with open(lock_path) as f:
+                pid = int(f.read() or 0)
+        except FileNotFoundError:
+            return
+        if pid:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                return
+        # the lock is released once it exited.
+        with open(lock_path) as lock:
+            deadline = time.monotonic() + 5
+            while True:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return
+                except BlockingIOError:
+                    self.assertLess(time.monotonic(), deadline, 'server still up')
+                    time.sleep(0.01)
+
+    def _client(self, **extra) -> dict:
+        output = subprocess.check_output(
+            [sys.executable, '-S', os.path.join(_DIR, 'timer_client.py')],
+            env={**self.environ, **extra},
+            encoding='utf-8',
+        )
+        return json.loads(output)
+
+    def test_environ_round_trip(self):
+        environ = {'button': '1', 'text_format': '{timer_name}=x', 'empty': ''}
+
+        decoded = timer_server.decode_environ(timer_client.encode_environ(environ))
+
+        self.assertEqual(environ, decoded)
+
+    def test_default_socket_is_in_a_private_directory(self):
+        with mock.patch.object(timer_client, 'SHARED_TMP', testing.temp_dir(self)):
+            path = timer_client.socket_path({})
+            directory = os.path.dirname(path)
+            self.assertEqual(0o700, os.stat(directory).st_mode & 0o777)
+
+            os.chmod(directory, 0o777)
+            with self.assertRaises(PermissionError):
+                timer_client.socket_path({})
+        # already private to the user.
+        self.assertEqual(
+            f'/run/user/1/i3blocks-timer-{os.getuid()}.sock',
+            timer_client.socket_path({'XDG_RUNTIME_DIR': '/run/user/1'}),
+        )
+
+    def test_in_process_fallback_gets_the_refresh_pid(self):
+        environ = {**self.environ, 'refresh_signal': '10'}
+
+        # no server: the client answers in-process.
+        with mock.patch.dict(os.environ, environ, clear=True):
+            with mock.patch.object(timer_client, 'start_server'):
+                with mock.patch.object(timer, 'main', return_value='{}') as main:
+                    with mock.patch('sys.stdout'):
+                        timer_client.main()
+
+        self.assertEqual(str(os.getppid()), main.call_args.args[0]['refresh_pid'])
+
+    def test_client_falls_back_and_then_uses_the_server(self):
+        # no server yet: the client answers in-process and starts one.
+        self.assertEqual('2m', self._client()['full_text'])
+
+        payload = timer_client.encode_environ({**self.environ, 'button': '4'})
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                reply = timer_client.request(self.socket_path, payload)
+                break
+            except OSError:
+                self.assertLess(time.monotonic(), deadline, 'server did not start')
+                time.sleep(0.01)
+        self.assertEqual('3m', json.loads(reply)['full_text'])
+        self.assertEqual('2m', self._client()['full_text'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Trace capture and replay of i3blocks invocations.
+
+Setting `trace_file` in the blocket configuration appends one compact JSON
+line per invocation with everything needed to reproduce it: the keys
+`load_state` reads, the clicked button, every timestamp taken, the text
+returned by `read_input_command` and the alarm commands launched, next to
+the JSON that was printed.
+
+Replaying feeds those traces back through the same code path in-process,
+reports throughput and diffs the outputs against the recorded ones:
+
+    ./tracing.py /tmp/timer_trace.jsonl --repeat 100
+"""
+import argparse
+from collections.abc import Mapping
+import contextlib
+import dataclasses
+import json
+import logging
+import time
+from typing import Any, Callable, Iterable
+
+import alarms as alarms_lib
+import exceptions
+import files
+import metrics
+import refresh
+import renderers
+import state as state_lib
+import state_mutations
+
+# where clicks land matters for click zones.
+TRACED_KEYS = (
+    ('button', 'relative_x', 'width') + state_lib.CONFIG_KEYS + state_lib.RUNTIME_KEYS
+)
+
+Runner = Callable[[Mapping[str, str], Callable[[], float]], dict[str, Any]]
+
+
+@dataclasses.dataclass(frozen=True)
+class Mismatch:
+    index: int
+    # key -> (recorded, replayed)
+    diff: dict[str, tuple[Any, Any]]
+
+
+@dataclasses.dataclass(frozen=True)
+class ReplayReport:
+    invocations: int
+    seconds: float
+    mismatches: list[Mismatch]
+
+    def throughput(self) -> float:
+        if self.seconds <= 0:
+            return float('inf')
+        return self.invocations / self.seconds
+
+
+def record(
+    path: str,
+    mapping: Mapping[str, str],
+    runner: Runner,
+    clock: Callable[[], float] = state_lib.now,
+) -> dict[str, Any]:
+    """Runs `runner` over `mapping` and appends its trace to `path`.
+
+    Only what `runner` is given is traced: wrap it rather than what calls
+    it, e.g. inside `shared_state.run`.
+    """
+    timestamps = []
+    inputs = []
+    alarms = []
+
+    def _clock() -> float:
+        timestamp = clock()
+        timestamps.append(timestamp)
+        return timestamp
+
+    read_input = state_mutations._INPUT_READ_CALLER
+    read_menu = state_mutations._MENU_READ_CALLER
+    call_alarm = state_mutations._ALARM_CALLER
+
+    def _read_input(cmd):
+        text = read_input(cmd)
+        inputs.append(text)
+        return text
+
+    def _read_menu(cmd, menu):
+        text = read_menu(cmd, menu)
+        inputs.append(text)
+        return text
+
+    def _call_alarm(cmd):
+        alarms.append(cmd)
+        return call_alarm(cmd)
+
+    state_mutations._INPUT_READ_CALLER = _read_input
+    state_mutations._MENU_READ_CALLER = _read_menu
+    state_mutations._ALARM_CALLER = _call_alarm
+    try:
+        serialized = runner(mapping, _clock)
+    finally:
+        state_mutations._INPUT_READ_CALLER = read_input
+        state_mutations._MENU_READ_CALLER = read_menu
+        state_mutations._ALARM_CALLER = call_alarm
+
+    entry = {
+        'e': {
+            key: value
+            for key, value in mapping.items()
+            if key in TRACED_KEYS or key.startswith(alarms_lib.COMMAND_KEY_PREFIX)
+        },
+        't': timestamps,
+        'o': serialized,
+    }
+    if inputs:
+        entry['i'] = inputs
+    if alarms:
+        entry['a'] = alarms
+    line = json.dumps(entry, separators=(',', ':')) + '\n'
+    with files.best_effort(), open(path, 'a', encoding='utf-8') as f:
+        f.write(line)
+    return serialized
+
+
+def load(path: str) -> list[dict[str, Any]]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _comparable(output: Mapping[str, Any]) -> Mapping[str, Any]:
+    """`output` without what is measured rather than replayed."""
+    if not output.get('metrics'):
+        return output
+    try:
+        recorded = metrics.decode(output['metrics'])
+    except exceptions.BadValue:
+        return output
+    # phase timings differ on every run.
+    unmeasured = dataclasses.replace(
+        recorded, phase_seconds=(0.0,) * len(metrics.PHASES)
+    )
+    return {**output, 'metrics': unmeasured.encode()}
+
+
+@contextlib.contextmanager
+def _swapped(module: Any, **hooks: Any):
+    """Replaces hooks of `module` for the duration of the block."""
+    saved = {name: getattr(module, name) for name in hooks}
+    for name, hook in hooks.items():
+        setattr(module, name, hook)
+    try:
+        yield
+    finally:
+        for name, hook in saved.items():
+            setattr(module, name, hook)
+
+
+def _diff(recorded: Mapping[str, Any], replayed: Mapping[str, Any]):
+    return {
+        key: (recorded.get(key), replayed.get(key))
+        for key in recorded.keys() | replayed.keys()
+        if recorded.get(key) != replayed.get(key)
+    }
+
+
+def replay(
+    entries: Iterable[dict[str, Any]], runner: Runner, repeat: int = 1
+) -> ReplayReport:
+    """Replays recorded invocations in-process.
+
+    Args:
+        entries: traces as returned by `load`.
+        runner: the invocation to replay through (i.e. `timer.run`).
+        repeat: how many times to go over `entries`.
+
+    Returns:
+        A report with throughput and the outputs that did not match.
+    """
+    entries = list(entries)
+    mismatches = []
+    alarms = []
+    inputs = iter(())
+    start = time.perf_counter()
+    # side effects go through module hooks, swapped out while replaying.
+    with (
+        _swapped(
+            state_mutations,
+            _INPUT_READ_CALLER=lambda cmd: next(inputs),
+            _MENU_READ_CALLER=lambda cmd, menu: next(inputs),
+            _ALARM_CALLER=alarms.append,
+            # replayed transitions already happened.
+            _HOOK_EMITTER=lambda state, event, fields: None,
+            _ESTIMATE_RECORDER=lambda path, name, duration: None,
+        ),
+        _swapped(metrics, _TEXTFILE_WRITER=lambda path, text: None),
+        _swapped(renderers, _SINK_WRITER=lambda sink, text: None),
+        # the recorded refreshes were already signaled.
+        _swapped(refresh, _SLEEPER_SPAWNER=lambda pid, signum, delay: 0),
+    ):
+        for _ in range(repeat):
+            for index, entry in enumerate(entries):
+                timestamps = entry['t']
+                clock = iter(timestamps).__next__
+                inputs = iter(entry.get('i', ()))
+                alarms.clear()
+                serialized = runner(entry['e'], clock)
+                diff = _diff(
+                    _comparable(entry['o']),
+                    _comparable(json.loads(json.dumps(serialized))),
+                )
+                if alarms != entry.get('a', []):
+                    diff['alarms'] = (entry.get('a', []), list(alarms))
+                if diff:
+                    mismatches.append(Mismatch(index, diff))
+    return ReplayReport(
+        invocations=repeat * len(entries),
+        seconds=time.perf_counter() - start,
+        mismatches=mismatches,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    import timer
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('trace_file')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument(
+        '--max-diffs', type=int, default=10, help='mismatches to print'
+    )
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.CRITICAL)
+    report = replay(load(args.trace_file), timer.run, args.repeat)
+    for mismatch in report.mismatches[: args.max_diffs]:
+        print(f'invocation #{mismatch.index}:')
+        for key, (recorded, replayed) in sorted(mismatch.diff.items()):
+            print(f'  {key}: recorded={recorded!r} replayed={replayed!r}')
+    print(
+        f'{report.invocations} invocations in {report.seconds:.3f}s '
+        f'({report.throughput():.0f}/s), {len(report.mismatches)} mismatches'
+    )
+    return 1 if report.mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,184 @@
+import os
+import unittest
+
+import refresh
+import state_mutations
+import testing
+import timer
+import tracing
+
+
+class TracingTest(unittest.TestCase):
+    def setUp(self):
+        self.trace_file = os.path.join(testing.temp_dir(self), 'trace.jsonl')
+        self.alarms = []
+        self.callers = (
+            state_mutations._ALARM_CALLER,
+            state_mutations._INPUT_READ_CALLER,
+        )
+        state_mutations._ALARM_CALLER = self.alarms.append
+
+    def tearDown(self):
+        (
+            state_mutations._ALARM_CALLER,
+            state_mutations._INPUT_READ_CALLER,
+        ) = self.callers
+
+    def test_record_and_replay_without_mismatches(self):
+        mappings = [
+            {
+                'timer_state': 'running',
+                'old_timestamp': '0',
+                'start_time': '1',
+                'alarm_command': 'notify {timer_name}',
+            },
+            {'button': '1', 'timer_state': 'running', 'PATH': '/usr/bin'},
+            {'button': '4', 'start_time': '60'},
+        ]
+        for mapping in mappings:
+            tracing.record(self.trace_file, mapping, timer.run)
+        # the running timer crossed its start_time.
+        self.assertEqual(['notify timer'], self.alarms)
+
+        entries = tracing.load(self.trace_file)
+        self.assertEqual(3, len(entries))
+        self.assertNotIn('PATH', entries[1]['e'])
+
+        report = tracing.replay(entries, timer.run, repeat=2)
+        self.assertEqual(6, report.invocations)
+        self.assertEqual([], report.mismatches)
+        # alarms are not launched again while replaying.
+        self.assertEqual(1, len(self.alarms))
+
+    def test_replay_reports_mismatches(self):
+        tracing.record(self.trace_file, {'start_time': '60'}, timer.run)
+        [entry] = tracing.load(self.trace_file)
+        entry['o']['full_text'] = 'something else'
+
+        report = tracing.replay([entry], timer.run)
+
+        [mismatch] = report.mismatches
+        self.assertEqual(('something else', '1m'), mismatch.diff['full_text'])
+
+    def test_replay_feeds_recorded_input(self):
+        state_mutations._INPUT_READ_CALLER = lambda cmd: '10m'
+        tracing.record(
+            self.trace_file,
+            {'button': '2', 'read_input_command': 'whatever'},
+            timer.run,
+        )
+        state_mutations._INPUT_READ_CALLER = lambda cmd: '20m'
+        [entry] = tracing.load(self.trace_file)
+
+        report = tracing.replay([entry], timer.run)
+
+        self.assertEqual(['10m'], entry['i'])
+        self.assertEqual([], report.mismatches)
+
+    def test_replay_ignores_timings_and_writes_no_metrics(self):
+        metrics_file = os.path.join(os.path.dirname(self.trace_file), 'timer.prom')
+        for mapping in [
+            {'metrics_file': metrics_file, 'timer_state': 'running'},
+            {'metrics_file': metrics_file, 'button': '1'},
+        ]:
+            tracing.record(self.trace_file, mapping, timer.run)
+        os.remove(metrics_file)
+
+        report = tracing.replay(tracing.load(self.trace_file), timer.run, repeat=3)
+
+        self.assertEqual([], report.mismatches)
+        self.assertFalse(os.path.exists(metrics_file))
+
+    def test_replay_still_compares_metrics_counters(self):
+        tracing.record(
+            self.trace_file, {'metrics_file': os.devnull, 'start_time': '60'}, timer.run
+        )
+        [entry] = tracing.load(self.trace_file)
+        entry['o']['metrics'] = '0,0,7' + entry['o']['metrics'][5:]
+
+        [mismatch] = tracing.replay([entry], timer.run).mismatches
+
+        self.assertIn('metrics', mismatch.diff)
+
+    def test_replay_writes_no_output_sinks(self):
+        sink = os.path.join(os.path.dirname(self.trace_file), 'timer.txt')
+        tracing.record(
+            self.trace_file, {'output_sinks': f'plain:{sink}'}, timer.run
+        )
+        os.remove(sink)
+
+        report = tracing.replay(tracing.load(self.trace_file), timer.run)
+
+        self.assertEqual([], report.mismatches)
+        self.assertFalse(os.path.exists(sink))
+
+    def test_replay_spawns_no_refresh_sleepers(self):
+        sleepers = []
+        spawner = refresh._SLEEPER_SPAWNER
+        refresh._SLEEPER_SPAWNER = lambda *args: sleepers.append(args)
+        try:
+            tracing.record(
+                self.trace_file,
+                {
+                    'refresh_signal': '3',
+                    'refresh_pid': '4242',
+                    'timer_state': 'running',
+                },
+                timer.run,
+            )
+            self.assertEqual(1, len(sleepers))
+
+            report = tracing.replay(tracing.load(self.trace_file), timer.run)
+        finally:
+            refresh._SLEEPER_SPAWNER = spawner
+
+        self.assertEqual([], report.mismatches)
+        self.assertEqual(1, len(sleepers))
+
+    def test_replay_records_no_estimates(self):
+        estimates_file = os.path.join(os.path.dirname(self.trace_file), 'estimates')
+        tracing.record(
+            self.trace_file,
+            {
+                'button': '3',
+                'timer_state': 'paused',
+                'elapsed_time': '30',
+                'estimates_file': estimates_file,
+                # recorded right away, without undo.
+                'undo_depth': '0',
+            },
+            timer.run,
+        )
+        with open(estimates_file, 'rb') as f:
+            recorded = f.read()
+
+        report = tracing.replay(tracing.load(self.trace_file), timer.run, repeat=3)
+
+        self.assertEqual([], report.mismatches)
+        with open(estimates_file, 'rb') as f:
+            self.assertEqual(recorded, f.read())
+
+    def test_replay_shared_state_traces(self):
+        environ = {
+            'shared_state': 'true',
+            'shared_state_dir': os.path.dirname(self.trace_file),
+            # every invocation computes the state.
+            'shared_tick_window': '0',
+            'trace_file': self.trace_file,
+            'start_time': '60',
+        }
+        for button in ('', '1', '', '4', '3', ''):
+            # i3blocks' environment only has the configuration and button.
+            timer.main({**environ, 'button': button} if button else environ)
+
+        entries = tracing.load(self.trace_file)
+        report = tracing.replay(entries, timer.run)
+
+        self.assertEqual(6, report.invocations)
+        self.assertEqual([], report.mismatches)
+        # what was stepped, not i3blocks' stale environment.
+        self.assertEqual('running', entries[2]['e']['timer_state'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import dataclasses
+import datetime
+from typing import Any
+
+
+def _local_midnight(timestamp: float, days_ahead: int) -> float:
+    date = datetime.datetime.fromtimestamp(timestamp).date()
+    date += datetime.timedelta(days=days_ahead)
+    # naive datetimes are interpreted in local time, DST included.
+    return datetime.datetime(date.year, date.month, date.day).timestamp()
+
+
+def day_start(timestamp: float) -> float:
+    return _local_midnight(timestamp, 0)
+
+
+def next_day_start(timestamp: float) -> float:
+    return _local_midnight(timestamp, 1)
+
+
+def week_start(timestamp: float) -> float:
+    weekday = datetime.datetime.fromtimestamp(timestamp).weekday()
+    return _local_midnight(timestamp, -weekday)
+
+
+def next_week_start(timestamp: float) -> float:
+    weekday = datetime.datetime.fromtimestamp(timestamp).weekday()
+    return _local_midnight(timestamp, 7 - weekday)
+
+
+@dataclasses.dataclass(frozen=True)
+class Usage:
+    """Running counters of timed work for the current day and week.
+
+    Counters are updated as time accrues, and are reset when a timestamp
+    reaches the stored end of the day (or week), so they never need a
+    history to be recomputed.
+    """
+
+    today_total: float = 0.0
+    sessions_today: int = 0
+    week_total: float = 0.0
+    # exclusive ends of the current day and week, in local time.
+    day_end: float | None = None
+    week_end: float | None = None
+
+    def roll(self, now: float) -> 'Usage':
+        res = self
+        if res.day_end is None or now >= res.day_end:
+            res = dataclasses.replace(
+                res, today_total=0.0, sessions_today=0, day_end=next_day_start(now)
+            )
+        if res.week_end is None or now >= res.week_end:
+            res = dataclasses.replace(
+                res, week_total=0.0, week_end=next_week_start(now)
+            )
+        return res
+
+    def accrue(self, now: float, delta: float) -> 'Usage':
+        """Adds `delta` seconds of work that ended at `now`."""
+        rolled = self.roll(now)
+        today = delta
+        week = delta
+        if rolled.day_end != self.day_end:
+            # only the part of delta after the day started counts.
+            today = min(delta, now - day_start(now))
+        if rolled.week_end != self.week_end:
+            week = min(delta, now - week_start(now))
+        return dataclasses.replace(
+            rolled,
+            today_total=rolled.today_total + today,
+            week_total=rolled.week_total + week,
+        )
+
+    def end_session(self, now: float) -> 'Usage':
+        rolled = self.roll(now)
+        return dataclasses.replace(rolled, sessions_today=rolled.sessions_today + 1)
+
+    def reopen_session(self) -> 'Usage':
+        """Takes back the last `end_session`, e.g. when it is undone."""
+        return dataclasses.replace(
+            self, sessions_today=max(self.sessions_today - 1, 0)
+        )
+
+    def serializable(self) -> dict[str, Any]:
+        if self.day_end is None:
+            return {}
+        return {
+            'today_total': str(self.today_total),
+            'sessions_today': self.sessions_today,
+            'week_total': str(self.week_total),
+            'day_end': str(self.day_end),
+            'week_end': str(self.week_end),
+        }
@@ -0,0 +1,60 @@
+import datetime
+import unittest
+
+import usage
+
+# a Wednesday, at noon local time.
+NOON = datetime.datetime(2024, 5, 15, 12).timestamp()
+
+
+class UsageTest(unittest.TestCase):
+    def test_boundaries(self):
+        self.assertEqual(
+            datetime.datetime(2024, 5, 15).timestamp(), usage.day_start(NOON)
+        )
+        self.assertEqual(
+            datetime.datetime(2024, 5, 16).timestamp(), usage.next_day_start(NOON)
+        )
+        self.assertEqual(
+            datetime.datetime(2024, 5, 13).timestamp(), usage.week_start(NOON)
+        )
+        self.assertEqual(
+            datetime.datetime(2024, 5, 20).timestamp(), usage.next_week_start(NOON)
+        )
+
+    def test_accrue(self):
+        counters = usage.Usage().accrue(NOON, 30).accrue(NOON + 1, 1)
+
+        self.assertEqual(31, counters.today_total)
+        self.assertEqual(31, counters.week_total)
+        self.assertEqual(usage.next_day_start(NOON), counters.day_end)
+
+    def test_accrue_across_midnight_only_counts_the_new_day(self):
+        midnight = usage.next_day_start(NOON)
+        counters = usage.Usage().accrue(midnight - 10, 100)
+
+        counters = counters.accrue(midnight + 5, 15)
+
+        self.assertEqual(5, counters.today_total)
+        self.assertEqual(115, counters.week_total)
+
+    def test_roll_resets_counters(self):
+        counters = usage.Usage().accrue(NOON, 30).end_session(NOON)
+        self.assertIs(counters, counters.roll(NOON + 60))
+
+        next_day = counters.roll(NOON + 24 * 3600)
+        self.assertEqual(0, next_day.today_total)
+        self.assertEqual(0, next_day.sessions_today)
+        self.assertEqual(30, next_day.week_total)
+
+        next_week = counters.roll(NOON + 7 * 24 * 3600)
+        self.assertEqual(0, next_week.week_total)
+
+    def test_end_session(self):
+        counters = usage.Usage().end_session(NOON).end_session(NOON)
+
+        self.assertEqual(2, counters.sessions_today)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""Click zones of the rendered text.
+
+Parts of `text_format` wrapped in `{#<action>}...{/}` become zones: a left
+click on them runs their action instead of starting or pausing the timer,
+e.g.
+
+    {#next_preset}{timer_name}{/} {#toggle_format}{remaining_time:clock}{/}
+
+Zone boundaries are measured when the text is rendered, as fractions of
+the block (label included), and round-trip with the rest of the state.
+A click is then hit-tested against them from the `relative_x` and `width`
+that i3blocks passes along, without parsing the template again.
+Boundaries are counted in characters, which is exact for monospace fonts
+and close enough for most others.
+"""
+import dataclasses
+import re
+
+import exceptions
+import time_format
+
+# what a zone may do, see `state_mutations._zone_mutation`. On top of
+# these, `input:<text>` applies `<text>` as if typed at the middle click
+# input.
+ACTIONS = frozenset(
+    (
+        'toggle',
+        'reset',
+        'next_preset',
+        'previous_preset',
+        'toggle_format',
+        'undo',
+        'redo',
+    )
+)
+INPUT_ACTION = 'input:'
+
+# pango tags take no room.
+_MARKUP = re.compile(r'<[^<>]*>')
+
+
+@dataclasses.dataclass(frozen=True)
+class Zone:
+    action: str
+    # fractions of the block's width.
+    start: float
+    end: float
+
+
+def is_action(action: str) -> bool:
+    if not action.startswith(INPUT_ACTION):
+        return action in ACTIONS
+    import input_parser
+
+    try:
+        input_parser.parse_input(action[len(INPUT_ACTION) :])
+    except exceptions.BadValue:
+        return False
+    return True
+
+
+def visible_length(text: str) -> int:
+    if '<' not in text and '&' not in text:
+        return len(text)
+    import html
+
+    return len(html.unescape(_MARKUP.sub('', text)))
+
+
+def extract(text: str, label: str = '') -> tuple[str, tuple[Zone, ...]]:
+    """Takes the zone delimiters out of rendered `text`.
+
+    Returns:
+        The text to display and its zones, innermost zones first.
+    """
+    if time_format.ZONE_START not in text:
+        return text, ()
+    spans = []
+    opened = []
+    parts = []
+    offset = visible_length(label)
+    pieces = re.split(
+        f'([{time_format.ZONE_START}{time_format.ZONE_END}])', text
+    )
+    for index, piece in enumerate(pieces):
+        if piece == time_format.ZONE_START:
+            continue
+        if piece == time_format.ZONE_END:
+            action, start = opened.pop()
+            spans.append((action, start, offset))
+            continue
+        if index and pieces[index - 1] == time_format.ZONE_START:
+            action, _, piece = piece.partition(time_format.ZONE_SEP)
+            opened.append((action, offset))
+        parts.append(piece)
+        offset += visible_length(piece)
+    if not offset:
+        return ''.join(parts), ()
+    zones = tuple(
+        Zone(action, start / offset, end / offset)
+        for action, start, end in spans
+        if end > start
+    )
+    return ''.join(parts), zones
+
+
+def encode(zones: tuple[Zone, ...]) -> str:
+    return ';'.join(
+        f'{zone.action}@{zone.start:.4f}-{zone.end:.4f}' for zone in zones
+    )
+
+
+def decode(text: str | None) -> tuple[Zone, ...]:
+    if not text:
+        return ()
+    zones = []
+    try:
+        for entry in text.split(';'):
+            action, _, span = entry.rpartition('@')
+            start, end = span.split('-')
+            zones.append(Zone(action, float(start), float(end)))
+    except ValueError:
+        raise exceptions.BadValue(f"zones='{text}' is not a zone list")
+    return tuple(zones)
+
+
+def position(relative_x: str | None, width: str | None) -> float | None:
+    """Where a click landed, as a fraction of the block's width."""
+    try:
+        x = float(relative_x)
+        width = float(width)
+    except (TypeError, ValueError):
+        return None
+    if width <= 0:
+        return None
+    return x / width
+
+
+def hit(encoded: str | None, x: float | None) -> str | None:
+    """The action of the (innermost) zone at `x`, if any."""
+    if x is None or not encoded:
+        return None
+    for zone in decode(encoded):
+        if zone.start <= x < zone.end:
+            return zone.action
+    return None
@@ -0,0 +1,209 @@
+import os
+import unittest
+
+import exceptions
+import resident
+import state
+import testing
+import time_format
+import timer
+import zones
+
+FORMAT = '{#next_preset}{timer_name}{/} {#toggle_format}{remaining_time:clock}{/}'
+
+
+def _render(text: str, **values) -> str:
+    return time_format.compile_template(text)(values)
+
+
+class ExtractTest(unittest.TestCase):
+    def test_no_zones(self):
+        self.assertEqual(('5:00', ()), zones.extract('5:00', 'timer:'))
+
+    def test_zones(self):
+        text, found = zones.extract(
+            _render(FORMAT, timer_name='tea', remaining_time=300), 'ab'
+        )
+
+        self.assertEqual('tea 05:00', text)
+        # 'ab' + 'tea' + ' ' + '05:00'
+        self.assertEqual(
+            (
+                zones.Zone('next_preset', 2 / 11, 5 / 11),
+                zones.Zone('toggle_format', 6 / 11, 1.0),
+            ),
+            found,
+        )
+
+    def test_nested_zones_innermost_first(self):
+        text, found = zones.extract(
+            _render('{#reset}a{#toggle}bc{/}{/}d{#undo}{/}')
+        )
+
+        self.assertEqual('abcd', text)
+        # empty zones can't be clicked.
+        self.assertEqual(
+            (zones.Zone('toggle', 0.25, 0.75), zones.Zone('reset', 0.0, 0.75)),
+            found,
+        )
+
+    def test_markup_takes_no_room(self):
+        _, found = zones.extract(
+            _render("<b>&amp;</b>{#toggle}<span color='red'>x</span>{/}")
+        )
+
+        self.assertEqual((zones.Zone('toggle', 0.5, 1.0),), found)
+
+    def test_encode_decode(self):
+        found = (zones.Zone('input:+5m', 0.25, 0.5), zones.Zone('reset', 0.5, 1.0))
+
+        self.assertEqual(found, zones.decode(zones.encode(found)))
+        self.assertEqual((), zones.decode(''))
+        with self.assertRaises(exceptions.BadValue):
+            zones.decode('reset@half')
+
+    def test_bad_zone(self):
+        with self.assertRaises(SyntaxError):
+            time_format.compile_template('{#}x{/}')
+        with self.assertRaises(SyntaxError):
+            time_format.compile_template('{#reset}x')
+        with self.assertRaises(ValueError):
+            time_format.compile_template(
+                '{?running}{#launch}x{/}{/}', is_action=zones.is_action
+            )
+        # only checked when asked to.
+        time_format.compile_template('{#launch}x{/}')
+
+    def test_is_action(self):
+        self.assertTrue(zones.is_action('toggle'))
+        self.assertTrue(zones.is_action('input:+5m'))
+        self.assertFalse(zones.is_action('input:soon'))
+        self.assertFalse(zones.is_action('launch'))
+
+    def test_hit(self):
+        encoded = zones.encode(
+            (zones.Zone('toggle', 0.25, 0.5), zones.Zone('reset', 0.0, 1.0))
+        )
+
+        self.assertEqual('toggle', zones.hit(encoded, zones.position('30', '100')))
+        self.assertEqual('reset', zones.hit(encoded, zones.position('60', '100')))
+        self.assertIsNone(zones.hit(encoded, zones.position('100', '100')))
+        self.assertIsNone(zones.hit(encoded, zones.position(None, '100')))
+        self.assertIsNone(zones.hit(encoded, zones.position('10', '0')))
+
+
+class ClickTest(unittest.TestCase):
+    def setUp(self):
+        self.preset_file = os.path.join(testing.temp_dir(self), 'presets.txt')
+        with open(self.preset_file, 'w') as f:
+            f.write('standup 15m\nreview 30m\n')
+        self.env = {
+            'timer_name': 'standup',
+            'start_time': '900',
+            'text_format': FORMAT,
+            'stopped_label': '',
+            'preset_file': self.preset_file,
+        }
+        # 'standup 15:00'
+        self.output = timer.run(self.env, clock=lambda: 1000)
+
+    def _click(self, relative_x: int, **env) -> dict:
+        if env:
+            self.env.update(env)
+            self.output = timer.run(self.env, clock=lambda: 1000)
+        return timer.run(
+            {
+                **self.env,
+                **self.output,
+                'button': '1',
+                'relative_x': str(relative_x),
+                'width': '130',
+            },
+            clock=lambda: 1000,
+        )
+
+    def test_rendered_zones(self):
+        self.assertEqual('standup 15:00', self.output['full_text'])
+        self.assertEqual(
+            'next_preset@0.0000-0.5385;toggle_format@0.6154-1.0000',
+            self.output['zones'],
+        )
+
+    def test_next_preset(self):
+        output = self._click(10)
+
+        self.assertEqual('review 30:00', output['full_text'])
+        self.assertEqual('stopped', output['timer_state'])
+        self.output = output
+        self.assertEqual('standup 15:00', self._click(10)['full_text'])
+
+    def test_toggle_format(self):
+        output = self._click(120)
+
+        self.assertEqual('standup 15m', output['full_text'])
+        self.assertEqual('stopped', output['timer_state'])
+
+    def test_outside_zones(self):
+        output = self._click(75)
+
+        self.assertEqual('running', output['timer_state'])
+        self.assertEqual('standup 15:00', output['full_text'])
+
+    def test_input_action(self):
+        output = self._click(
+            10, text_format='{#input:+5m}{remaining_time:clock}{/}'
+        )
+
+        self.assertEqual('20:00', output['full_text'])
+
+    def test_unknown_actions_fail_when_loaded(self):
+        for action in ('launch', 'input:soon'):
+            with self.subTest(action=action):
+                output = timer.run(
+                    {**self.env, 'text_format': f'{{#{action}}}x{{/}}'},
+                    clock=lambda: 1000,
+                )
+
+                self.assertEqual(
+                    f"unknown zone action '{action}'", output['error_message']
+                )
+
+
+class ResidentClickTest(unittest.TestCase):
+    def test_click_reader(self):
+        read_fd, write_fd = os.pipe()
+        reader = resident.ClickReader(read_fd)
+
+        os.write(
+            write_fd,
+            b'{"button": 1, "relative_x": 25, "width": 100}\n{"button": 4}\n',
+        )
+        self.assertEqual(
+            [(state.Button.LEFT, 0.25), (state.Button.SCROLL_UP, None)],
+            reader.read_clicks(),
+        )
+        os.close(write_fd)
+        os.close(read_fd)
+
+    def test_zone_clicks_are_not_coalesced(self):
+        instance = resident.Resident(
+            {
+                'text_format': '{#reset}{elapsed_time:clock}{/}',
+                'stopped_label': '',
+            },
+            clock=lambda: 1000,
+        )
+        instance.step(state.Button.NONE)
+
+        serialized = instance.step_clicks(
+            [state.Button.LEFT, state.Button.LEFT, state.Button.LEFT],
+            [None, 0.5, None],
+        )
+
+        # started, reset (and stopped), started again.
+        self.assertEqual('running', serialized['timer_state'])
+        self.assertIsNone(instance.state.click_x)
+
+
+if __name__ == '__main__':
+    unittest.main()